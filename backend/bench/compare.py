@@ -0,0 +1,45 @@
+"""Compara dos archivos de resultados de run_benchmarks.py (p. ej. de dos commits).
+
+Uso:
+    uv run python bench/compare.py bench/antes.json bench/despues.json [--metric p50_ms]
+"""
+import argparse
+import json
+
+METRICS = ['cold_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'cached_p50_ms', 'peak_memory_bytes']
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report['meta'], {(r['rows'], r['endpoint']): r for r in report['results']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--metric', action='append', choices=METRICS,
+                        help='Métricas a comparar (por defecto p50_ms y p95_ms)')
+    args = parser.parse_args()
+    metrics = args.metric or ['p50_ms', 'p95_ms']
+
+    base_meta, base = load(args.baseline)
+    cand_meta, cand = load(args.candidate)
+    print(f"base:      {base_meta.get('commit')} ({base_meta.get('timestamp')})")
+    print(f"candidato: {cand_meta.get('commit')} ({cand_meta.get('timestamp')})")
+
+    for metric in metrics:
+        print(f"\n{metric}")
+        print(f"{'filas':>10} {'endpoint':<22} {'base':>12} {'candidato':>12} {'cambio':>9}")
+        for key in sorted(base.keys() & cand.keys()):
+            before = base[key].get(metric)
+            after = cand[key].get(metric)
+            if before is None or after is None:
+                continue
+            change = f"{100 * (after - before) / before:+.1f}%" if before else 'n/a'
+            print(f"{key[0]:>10,} {key[1]:<22} {before:>12,.2f} {after:>12,.2f} {change:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Mide el tiempo de arranque del backend (import de src/main.py).
+
+Cada corrida es un proceso nuevo con `python -X importtime`, así se mide
+un arranque en frío real. Reporta el tiempo total (mediana y máximo), los
+módulos más costosos y si las dependencias pesadas quedaron sin cargar.
+
+Uso:
+    uv run python bench/import_time.py [--runs 5] [--top 15] [--output bench/import.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BACKEND_DIR, 'src')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run_benchmarks import git_commit  # noqa: E402
+
+# Deben cargarse solo cuando un endpoint las necesita
+LAZY_MODULES = ['matplotlib', 'scipy']
+
+PROBE = (
+    "import sys, main; "
+    "print(','.join(m for m in %r if m in sys.modules))" % (LAZY_MODULES,)
+)
+
+
+def parse_importtime(stderr):
+    """Tiempo acumulado (µs) por módulo de primer nivel según -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Cada nivel de anidamiento agrega dos espacios al nombre
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        # Solo main y los módulos que importa directamente
+        if name.strip() == 'main' or depth == 1:
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def run_once(workdir):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    env.pop('FINSIGHT_WARMUP', None)
+    env.pop('FINSIGHT_WARMUP_IMPORTS', None)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE],
+                          cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+    return wall, parse_importtime(proc.stderr), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    walls, modules, loaded = [], {}, set()
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.runs):
+            wall, cumulative, lazy_loaded = run_once(workdir)
+            walls.append(wall)
+            loaded.update(lazy_loaded)
+            for name, us in cumulative.items():
+                modules.setdefault(name, []).append(us)
+
+    medians = {name: statistics.median(values) for name, values in modules.items()}
+    top = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    print(f"Arranque (proceso completo): mediana {statistics.median(walls) * 1000:.0f} ms, "
+          f"máximo {max(walls) * 1000:.0f} ms en {args.runs} corridas")
+    print(f"\n{'módulo':<32} {'acumulado (ms)':>15}")
+    for name, us in top:
+        print(f"{name:<32} {us / 1000:>15.1f}")
+    print(f"\nDependencias diferidas cargadas al importar main: {', '.join(sorted(loaded)) or 'ninguna'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'timestamp': datetime.now().isoformat(timespec='seconds'),
+                    'python': sys.version.split()[0],
+                    'runs': args.runs,
+                },
+                'wall_ms_median': round(statistics.median(walls) * 1000, 1),
+                'wall_ms_max': round(max(walls) * 1000, 1),
+                'modules_ms': {name: round(us / 1000, 1) for name, us in top},
+                'lazy_modules_loaded': sorted(loaded),
+            }, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
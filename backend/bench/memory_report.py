@@ -0,0 +1,40 @@
+"""Compara la memoria del ledger antes y después de la codificación compacta.
+
+Uso:
+    uv run python bench/memory_report.py [filas]
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402  (también agrega src/ al path)
+import ledger  # noqa: E402
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'transactions.csv')
+        synthetic.write_ledger(path, rows, months=12)
+
+        # Antes: como lo cargaba load_data() originalmente
+        before = pd.read_csv(path)
+        before['date'] = pd.to_datetime(before['date'])
+        after = ledger.encode(before)
+
+    report_before = ledger.memory_report(before)
+    report_after = ledger.memory_report(after)
+    print(f"Filas: {rows:,}")
+    print(f"{'columna':<12} {'antes (bytes)':>15} {'después (bytes)':>17} {'dtype':>16}")
+    for col in ledger.COLUMNS + ['total']:
+        dtype = str(after[col].dtype) if col in after else ''
+        print(f"{col:<12} {report_before[col]:>15,} {report_after[col]:>17,} {dtype:>16}")
+    print(f"Reducción: {100 * (1 - report_after['total'] / report_before['total']):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
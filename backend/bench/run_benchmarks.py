@@ -0,0 +1,215 @@
+"""Benchmark en proceso de todos los endpoints usando el test client de Flask.
+
+Genera ledgers sintéticos de varios tamaños directamente en el almacenamiento
+de un tenant y mide, por endpoint:
+  - cold_ms: primera petición con el tenant fuera de memoria (incluye la carga)
+  - p50/p95/p99/mean: latencia sin caché de respuestas (se limpia cada vez)
+  - cached_p50_ms: latencia con la caché de respuestas activa
+  - throughput_rps y peak_memory_bytes (tracemalloc)
+
+POST /transaction reescribe el CSV completo, así que además se mide en un
+ledger de tamaño realista (--post-rows) aunque no esté entre las escalas.
+
+Uso:
+    uv run python bench/run_benchmarks.py --scales 1000,10000,100000 --output bench/results.json
+    uv run python bench/run_benchmarks.py --scales 1000000,10000000 --requests 5 --endpoints /alerts,/analysis
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic  # noqa: E402  (también agrega src/ al path)
+
+GET_ENDPOINTS = [
+    '/transactions', '/transactions/search?q=super', '/analysis', '/analysis?from=2000-01-01', '/analysis?granularity=week', '/prediction', '/alerts',
+    '/reports/monthly', '/reports/monthly-12', '/reports/comparative', '/reports/habits',
+    '/graphs/bar', '/graphs/pie', '/graphs/line',
+]
+POST_ENDPOINT = 'POST /transaction'
+# Tamaño de un ledger con varios años de movimientos de una empresa mediana
+POST_ROWS = 200_000
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentiles(samples):
+    values = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+    }
+
+
+def timed(call):
+    start = time.perf_counter()
+    response = call()
+    return time.perf_counter() - start, response
+
+
+def bench_get(main, client, tenant_id, endpoint, requests_count, max_seconds):
+    headers = {'X-Tenant-ID': tenant_id}
+
+    tracemalloc.start()
+    # Petición en frío: ledger fuera de memoria y caché vacía
+    with main.tenants.use(tenant_id) as state:
+        state.release()
+    main.response_cache.clear()
+    cold, response = timed(lambda: client.get(endpoint, headers=headers))
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        main.response_cache.clear()
+        elapsed, response = timed(lambda: client.get(endpoint, headers=headers))
+        samples.append(elapsed)
+        if time.perf_counter() - started > max_seconds:
+            break
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cached = [timed(lambda: client.get(endpoint, headers=headers))[0] for _ in range(min(requests_count, 20))]
+
+    return {
+        'status': response.status_code,
+        'response_bytes': len(response.get_data()),
+        'cold_ms': round(cold * 1000, 3),
+        **percentiles(samples),
+        'cached_p50_ms': round(float(np.percentile(np.asarray(cached) * 1000, 50)), 3),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / total, 2) if total > 0 else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def bench_post(client, tenant_id, requests_count, max_seconds):
+    headers = {'X-Tenant-ID': tenant_id}
+    today = datetime.now().strftime('%Y-%m-%d')
+    payload = {'type': 'gasto', 'amount': 25.5, 'description': 'Uber al trabajo', 'date': today}
+
+    tracemalloc.start()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        elapsed, response = timed(lambda: client.post('/transaction', json=payload, headers=headers))
+        samples.append(elapsed)
+        if time.perf_counter() - started > max_seconds:
+            break
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        **percentiles(samples),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / total, 2) if total > 0 else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def generate(tenant_id, rows, seed):
+    from tenants import tenant_paths
+
+    csv_file, _ = tenant_paths(tenant_id)
+    started = time.perf_counter()
+    synthetic.write_ledger(csv_file, rows, seed=seed)
+    print(f"\n== {rows:,} filas (generadas en {time.perf_counter() - started:.1f}s) ==")
+
+
+def run(scales, endpoints, requests_count, max_seconds, include_post, post_rows, seed):
+    import main
+
+    client = main.app.test_client()
+    results = []
+    for rows in scales:
+        tenant_id = f'bench-{rows}'
+        generate(tenant_id, rows, seed)
+        for endpoint in endpoints:
+            result = bench_get(main, client, tenant_id, endpoint, requests_count, max_seconds)
+            results.append({'rows': rows, 'endpoint': endpoint, **result})
+            print(f"{endpoint:<22} cold {result['cold_ms']:>10.1f} ms  p50 {result['p50_ms']:>9.2f} ms  "
+                  f"p95 {result['p95_ms']:>9.2f} ms  cached {result['cached_p50_ms']:>7.2f} ms  "
+                  f"peak {result['peak_memory_bytes'] / 1e6:>8.1f} MB")
+        if include_post:
+            result = bench_post(client, tenant_id, requests_count, max_seconds)
+            results.append({'rows': rows, 'endpoint': POST_ENDPOINT, **result})
+            print(f"{POST_ENDPOINT:<22} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms")
+        with main.tenants.use(tenant_id) as state:
+            state.release()
+    if include_post and post_rows and post_rows not in scales:
+        tenant_id = f'bench-post-{post_rows}'
+        generate(tenant_id, post_rows, seed)
+        result = bench_post(client, tenant_id, requests_count, max_seconds)
+        results.append({'rows': post_rows, 'endpoint': POST_ENDPOINT, **result})
+        print(f"{POST_ENDPOINT:<22} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms")
+        with main.tenants.use(tenant_id) as state:
+            state.release()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000',
+                        help='Tamaños de ledger separados por coma (p. ej. 1000,10000,1000000,10000000)')
+    parser.add_argument('--endpoints', default=','.join(GET_ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=30, help='Peticiones medidas por endpoint')
+    parser.add_argument('--max-seconds', type=float, default=30.0, help='Tiempo máximo por endpoint')
+    parser.add_argument('--no-post', action='store_true', help='No medir POST /transaction')
+    parser.add_argument('--post-rows', type=int, default=POST_ROWS,
+                        help='Tamaño del ledger en que se mide POST /transaction además de --scales (0 = no)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(',') if s]
+    endpoints = [e for e in args.endpoints.split(',') if e]
+
+    # Sin tareas de fondo: no deben correr (ni tomar locks) entre las mediciones
+    os.environ['FINSIGHT_SCHEDULER'] = '0'
+    # Todo el almacenamiento del benchmark vive en un directorio temporal
+    output = os.path.abspath(args.output) if args.output else None
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        results = run(scales, endpoints, args.requests, args.max_seconds, not args.no_post, args.post_rows,
+                      args.seed)
+
+    import pandas as pd
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados guardados en {output}")
+
+
+if __name__ == '__main__':
+    main_cli()
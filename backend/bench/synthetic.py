@@ -0,0 +1,64 @@
+"""Generador de ledgers sintéticos reproducibles para benchmarks.
+
+Usa el mismo vocabulario que los scripts de datos de prueba
+(DESCRIPTIONS / INCOME_DESCRIPTIONS de tests/test_fake_reportes.py) y
+escribe directamente el CSV del tenant, sin pasar por la API.
+"""
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'src'))
+sys.path.insert(0, BACKEND_DIR)
+
+import ledger  # noqa: E402
+from tests.test_fake_reportes import DESCRIPTIONS, INCOME_DESCRIPTIONS  # noqa: E402
+
+INCOME_RATIO = 0.2
+
+
+def generate_frame(rows, months=24, seed=42, end=None):
+    """DataFrame con `rows` transacciones repartidas en los últimos `months` meses"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or datetime.now()).floor('s')
+    start = (end - pd.DateOffset(months=months - 1)).replace(day=1, hour=0, minute=0, second=0)
+    span = int((end - start).total_seconds())
+    dates = start + pd.to_timedelta(rng.integers(0, span, rows), unit='s')
+
+    expense_vocab = [d for descriptions in DESCRIPTIONS.values() for d in descriptions]
+    is_income = rng.random(rows) < INCOME_RATIO
+    expense_idx = rng.integers(0, len(expense_vocab), rows)
+    income_idx = rng.integers(0, len(INCOME_DESCRIPTIONS), rows)
+    description = np.where(is_income,
+                           np.asarray(INCOME_DESCRIPTIONS, dtype=object)[income_idx],
+                           np.asarray(expense_vocab, dtype=object)[expense_idx])
+
+    # La categoría se calcula una vez por descripción del vocabulario
+    expense_categories = np.asarray([ledger.categorize(d) for d in expense_vocab], dtype=object)
+    category = np.where(is_income, 'Ingreso', expense_categories[expense_idx])
+
+    # Montos: muchos gastos pequeños, algunos grandes; ingresos mayores
+    expense_amount = np.round(rng.lognormal(mean=4.5, sigma=1.0, size=rows), 2) + 1
+    income_amount = np.round(rng.uniform(1000, 15000, rows), 2)
+    amount = np.where(is_income, income_amount, expense_amount)
+
+    df = pd.DataFrame({
+        'date': dates,
+        'type': np.where(is_income, 'ingreso', 'gasto'),
+        'amount': amount,
+        'description': description,
+        'category': category,
+    })
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+
+def write_ledger(path, rows, months=24, seed=42):
+    """Escribe el CSV de un ledger sintético en `path` (formato de save_data)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df = generate_frame(rows, months=months, seed=seed)
+    df.to_csv(path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    return df
@@ -0,0 +1,557 @@
+from datetime import datetime
+import math
+
+import pandas as pd
+
+from formatting import get_formatter
+from ledger import (
+    TIPO_GASTO, TIPO_INGRESO, is_expense, is_income, month_key, month_period, month_slice,
+    recent_months,
+)
+
+# Gastos menores a este monto cuentan como "gastos hormiga"
+SMALL_EXPENSE_LIMIT = 100
+
+SEVERITY_ORDER = {"critica": 0, "alta": 1, "media": 2, "baja": 3}
+
+
+# Función de ayuda para formatear moneda: $#,###.## (símbolo y locale configurables, ver formatting.py)
+def format_currency(amount):
+    """Formatea un número a la cadena de moneda $#,###.##"""
+    return get_formatter().money(amount)
+
+
+def alert_key(alert):
+    """Identidad de una alerta para saber si es nueva o ya se había enviado"""
+    parts = [alert.get('type'), alert.get('category'), alert.get('description'), alert.get('date')]
+    return '|'.join('' if p is None else str(p) for p in parts)
+
+
+def normalize_description(description):
+    # Normalizar descripción: minúsculas y sin espacios extra
+    return str(description).lower().strip()
+
+
+def facts_from_frame(df, now):
+    """Valores que necesitan las reglas, calculados desde cero sobre el ledger"""
+    current_month = month_key(now)
+
+    # Definir ventana de análisis: últimos 3 meses incluyendo el actual
+    analysis_months = recent_months(df, 3)
+    previous_months = [m for m in analysis_months if m < current_month]
+
+    # Filtrar datos para la ventana de análisis
+    # (los meses sin datos entre ellos no aportan filas, así que basta un rango)
+    df_analysis = month_slice(df, analysis_months[0], analysis_months[-1])
+    window_expenses = df_analysis[is_expense(df_analysis)]
+
+    # Gastos del mes actual, usados por varias reglas
+    current_df = month_slice(df, current_month)
+    current_expense_df = current_df[is_expense(current_df)]
+
+    prev_avg = {}
+    prev_month_avg_expense = float('nan')
+    if previous_months:
+        previous_df = month_slice(df, previous_months[0], previous_months[-1])
+        previous_expenses = previous_df[is_expense(previous_df)]
+        prev_avg = previous_expenses.groupby('category', observed=True)['amount'].mean().to_dict()
+        prev_month_avg_expense = previous_expenses.groupby('month')['amount'].sum().mean()
+
+    small_expenses = window_expenses[window_expenses['amount'] < SMALL_EXPENSE_LIMIT]
+
+    duplicates = []
+    if not current_expense_df.empty:
+        current_expenses = current_expense_df.assign(
+            desc_normalized=current_expense_df['description'].str.lower().str.strip())
+        groups = current_expenses.groupby(['date', 'amount', 'desc_normalized'], observed=True)
+        firsts = groups.agg({'description': 'first', 'category': 'first'})
+        counts = groups.size()
+        for (date, amount, desc_norm), count in counts[counts > 1].items():
+            first = firsts.loc[(date, amount, desc_norm)]
+            duplicates.append((date, amount, int(count), first['description'], first['category']))
+
+    return {
+        "current_month": current_month,
+        "analysis_months": analysis_months,
+        "previous_months": previous_months,
+        "prev_avg": prev_avg,
+        "current_by_category": current_expense_df.groupby('category', observed=True)['amount'].sum().to_dict(),
+        "current_income": current_df[is_income(current_df)]['amount'].sum(),
+        "current_expense": current_expense_df['amount'].sum(),
+        "window_income": df_analysis[is_income(df_analysis)]['amount'].sum(),
+        "window_expense": window_expenses['amount'].sum(),
+        "window_expense_count": len(window_expenses),
+        "window_expenses": lambda: window_expenses,
+        "small_count": len(small_expenses),
+        "small_total": small_expenses['amount'].sum(),
+        "monthly_expenses": [
+            window_expenses[window_expenses['month'] == m]['amount'].sum() for m in analysis_months
+        ],
+        "window_by_category": window_expenses.groupby('category', observed=True)['amount'].sum().to_dict(),
+        "duplicates": duplicates,
+        "prev_month_avg_expense": prev_month_avg_expense,
+    }
+
+
+def evaluate_alerts(facts, now, formatter=None):
+    """Aplica las reglas de alerta sobre los valores ya agregados"""
+    formatter = formatter or get_formatter()
+    money = formatter.money
+    message = formatter.message
+    current_month = facts["current_month"]
+    analysis_months = facts["analysis_months"]
+    previous_months = facts["previous_months"]
+    period_str = f"{month_period(analysis_months[0]).strftime('%b')} - {month_period(analysis_months[-1]).strftime('%b %Y')}"
+
+    alerts = []
+
+    # 1. ALERTA: Gasto elevado por categoría vs promedio histórico de últimos 3 meses
+    # (se compara el mes actual vs promedio de los meses anteriores en la ventana)
+    if len(analysis_months) >= 2 and previous_months:
+        prev_avg = facts["prev_avg"]
+        current = facts["current_by_category"]
+
+        for cat in current:
+            if cat in prev_avg and current[cat] > prev_avg[cat] * 1.5:
+                increase_pct = ((current[cat] - prev_avg[cat]) / prev_avg[cat]) * 100
+                months_str = ', '.join([month_period(m).strftime('%b %Y') for m in previous_months])
+
+                current_amount_str, average_amount_str = formatter.money_many([current[cat], prev_avg[cat]])
+
+                alerts.append({
+                    "type": "gasto_elevado_categoria",
+                    "severity": "alta",
+                    "category": cat,
+                    "current_amount": round(current[cat], 2),
+                    "average_amount": round(prev_avg[cat], 2),
+                    "increase_percentage": round(increase_pct, 1),
+                    "message": message('gasto_elevado_categoria', category=cat, current_amount=current_amount_str,
+                                       average_amount=average_amount_str, months=months_str,
+                                       increase_pct=increase_pct)
+                })
+
+    # 2. ALERTA: Déficit mensual en el mes actual
+    current_income = facts["current_income"]
+    current_expense = facts["current_expense"]
+
+    if current_expense > current_income and current_income > 0:
+        deficit = current_expense - current_income
+        deficit_pct = (deficit / current_income) * 100
+
+        current_income_str, current_expense_str, deficit_str = formatter.money_many(
+            [current_income, current_expense, deficit])
+
+        alerts.append({
+            "type": "deficit_mensual",
+            "severity": "critica",
+            "income": round(current_income, 2),
+            "expense": round(current_expense, 2),
+            "deficit": round(deficit, 2),
+            "deficit_percentage": round(deficit_pct, 1),
+            "message": message('deficit_mensual', expense=current_expense_str, income=current_income_str,
+                               deficit=deficit_str, deficit_pct=deficit_pct)
+        })
+
+    # 3. ALERTA: Tasa de ahorro baja en últimos 3 meses
+    total_income_period = facts["window_income"]
+    total_expense_period = facts["window_expense"]
+
+    if total_income_period > 0:
+        savings = total_income_period - total_expense_period
+        savings_rate = (savings / total_income_period) * 100
+
+        if 0 < savings_rate < 20:
+            savings_str = money(savings)
+            alerts.append({
+                "type": "ahorro_bajo",
+                "severity": "media",
+                "savings_rate": round(savings_rate, 1),
+                "savings_amount": round(savings, 2),
+                "period": period_str,
+                "message": message('ahorro_bajo', savings_rate=savings_rate, period=period_str, savings=savings_str)
+            })
+        elif savings_rate < 0:
+            deficit_amount_str = money(abs(savings))
+            alerts.append({
+                "type": "ahorro_negativo",
+                "severity": "critica",
+                "savings_rate": round(savings_rate, 1),
+                "deficit_amount": round(abs(savings), 2),
+                "period": period_str,
+                "message": message('ahorro_negativo', deficit=deficit_amount_str, period=period_str)
+            })
+
+    # 4. ALERTA: Transacciones inusualmente grandes en últimos 3 meses
+    # (los cuantiles necesitan los montos: solo aquí se leen las filas de la ventana)
+    if facts["window_expense_count"] > 10:
+        expense_df = facts["window_expenses"]()
+        q75 = expense_df['amount'].quantile(0.75)
+        q25 = expense_df['amount'].quantile(0.25)
+        iqr = q75 - q25
+        threshold = q75 + (1.5 * iqr)
+
+        large_transactions = expense_df[expense_df['amount'] > threshold].sort_values('amount', ascending=False).head(3)
+        # Montos de todos los atípicos en un solo lote; el umbral es el mismo para todos
+        amount_strs = formatter.money_many(large_transactions['amount'].to_numpy())
+        threshold_str = money(threshold)
+
+        for (_, tx), amount_str in zip(large_transactions.iterrows(), amount_strs):
+            alerts.append({
+                "type": "transaccion_inusual",
+                "severity": "media",
+                "amount": round(tx['amount'], 2),
+                "description": tx['description'],
+                "category": tx['category'],
+                "date": tx['date'].strftime('%d/%m/%Y'),
+                "threshold": round(threshold, 2),
+                "message": message('transaccion_inusual', amount=amount_str, description=tx['description'],
+                                   category=tx['category'], date=tx['date'].strftime('%d/%m/%Y'),
+                                   threshold=threshold_str)
+            })
+
+    # 5. ALERTA: Gastos hormiga en últimos 3 meses
+    small_count = facts["small_count"]
+    if small_count > 0:
+        small_total = facts["small_total"]
+        total_expenses = facts["window_expense"]
+
+        if small_count > 15 and total_expenses > 0:
+            small_pct = (small_total / total_expenses) * 100
+            avg_small = small_total / small_count
+
+            small_total_str, avg_small_str = formatter.money_many([small_total, avg_small])
+
+            alerts.append({
+                "type": "gastos_hormiga",
+                "severity": "media",
+                "transaction_count": small_count,
+                "total_amount": round(small_total, 2),
+                "average_amount": round(avg_small, 2),
+                "percentage_of_total": round(small_pct, 1),
+                "period": period_str,
+                "message": message('gastos_hormiga', count=small_count, average=avg_small_str, total=small_total_str,
+                                   pct=small_pct, period=period_str)
+            })
+
+    # 6. ALERTA: Tendencia creciente en últimos 3 meses
+    if len(analysis_months) >= 3:
+        monthly_expenses = facts["monthly_expenses"]
+        month_names = [month_period(month).strftime('%b %Y') for month in analysis_months]
+
+        if all(monthly_expenses[i] < monthly_expenses[i+1] for i in range(len(monthly_expenses)-1)):
+            increase = ((monthly_expenses[-1] - monthly_expenses[0]) / monthly_expenses[0]) * 100
+
+            m0_str, m1_str, m2_str = formatter.money_many(monthly_expenses[:3])
+
+            alerts.append({
+                "type": "tendencia_creciente",
+                "severity": "alta",
+                "months": month_names,
+                "amounts": [round(x, 2) for x in monthly_expenses],
+                "increase_percentage": round(increase, 1),
+                "message": message('tendencia_creciente', month0=month_names[0], amount0=m0_str,
+                                   month1=month_names[1], amount1=m1_str, month2=month_names[2], amount2=m2_str,
+                                   increase=increase)
+            })
+
+    # 7. ALERTA: Sin ingresos en mes actual
+    if current_income == 0 and current_expense > 0:
+        current_expense_str = money(current_expense)
+        alerts.append({
+            "type": "sin_ingresos",
+            "severity": "alta",
+            "expense_amount": round(current_expense, 2),
+            "message": message('sin_ingresos', month=month_period(current_month).strftime('%B %Y'),
+                               expense=current_expense_str)
+        })
+
+    # 8. ALERTA: Categoría dominante en últimos 3 meses
+    category_expenses = facts["window_by_category"]
+    total_expenses_period = sum(category_expenses.values())
+
+    if total_expenses_period > 0:
+        # Cada monto por categoría se formatea una sola vez y se reutiliza en la lista de "otras"
+        category_items = [
+            message('categoria_dominante_otra', category=c, amount=amount_str)
+            for c, amount_str in zip(category_expenses, formatter.money_many(list(category_expenses.values())))
+        ]
+        for position, (cat, amount) in enumerate(category_expenses.items()):
+            percentage = (amount / total_expenses_period) * 100
+            if percentage > 40:
+                # Formatear montos de otras categorías
+                other_categories = ', '.join(category_items[:position] + category_items[position + 1:])
+
+                amount_str = money(amount)
+
+                alerts.append({
+                    "type": "categoria_dominante",
+                    "severity": "media",
+                    "category": cat,
+                    "amount": round(amount, 2),
+                    "percentage": round(percentage, 1),
+                    "total_expenses": round(total_expenses_period, 2),
+                    "period": period_str,
+                    "message": message('categoria_dominante', category=cat, amount=amount_str, pct=percentage,
+                                       period=period_str, others=other_categories)
+                })
+
+    # 9. ALERTA: Gastos duplicados (mejorado con normalización)
+    for date, amount, count, original_desc, category in facts["duplicates"]:
+        total_duplicated = amount * count
+
+        amount_str, total_duplicated_str = formatter.money_many([amount, total_duplicated])
+
+        alerts.append({
+            "type": "posible_duplicado",
+            "severity": "media",
+            "amount": round(amount, 2),
+            "description": original_desc,
+            "category": category,
+            "date": date.strftime('%d/%m/%Y'),
+            "count": int(count),
+            "total_amount": round(total_duplicated, 2),
+            "message": message('posible_duplicado', amount=amount_str, description=original_desc, category=category,
+                               count=count, date=date.strftime('%d/%m/%Y'), total=total_duplicated_str)
+        })
+
+    # 10. ALERTA: Proyección de gastos para fin de mes
+    days_in_month = pd.Timestamp(now).days_in_month
+    current_day = now.day
+
+    if current_day >= 7 and current_day < days_in_month and current_expense > 0:
+        daily_avg = current_expense / current_day
+        projected_expense = daily_avg * days_in_month
+
+        # Comparar con promedio de meses anteriores en la ventana
+        if previous_months:
+            avg_prev_months = facts["prev_month_avg_expense"]
+
+            if projected_expense > avg_prev_months * 1.15:
+                excess = projected_expense - avg_prev_months
+                excess_pct = ((projected_expense - avg_prev_months) / avg_prev_months) * 100
+                months_str = ', '.join([month_period(m).strftime('%b') for m in previous_months])
+
+                (current_expense_str, daily_avg_str, projected_expense_str, avg_prev_months_str,
+                 excess_str) = formatter.money_many(
+                    [current_expense, daily_avg, projected_expense, avg_prev_months, excess])
+
+                alerts.append({
+                    "type": "proyeccion_excesiva",
+                    "severity": "alta",
+                    "current_expense": round(current_expense, 2),
+                    "days_elapsed": current_day,
+                    "daily_average": round(daily_avg, 2),
+                    "projected_expense": round(projected_expense, 2),
+                    "average_previous_months": round(avg_prev_months, 2),
+                    "excess_amount": round(excess, 2),
+                    "excess_percentage": round(excess_pct, 1),
+                    "message": message('proyeccion_excesiva', current=current_expense_str, days=current_day,
+                                       daily=daily_avg_str, projected=projected_expense_str,
+                                       average=avg_prev_months_str, months=months_str, excess=excess_str,
+                                       excess_pct=excess_pct)
+                })
+
+    # Ordenar alertas por severidad
+    alerts.sort(key=lambda x: SEVERITY_ORDER.get(x["severity"], 4))
+
+    return {
+        "alerts": alerts,
+        "total": len(alerts),
+        "analysis_period": {
+            "start": month_period(analysis_months[0]).strftime('%B %Y'),
+            "end": month_period(analysis_months[-1]).strftime('%B %Y'),
+            "months_analyzed": len(analysis_months)
+        }
+    }
+
+
+def build_alerts(df, now=None, formatter=None):
+    """Recalcula todas las alertas desde cero (ledger no vacío)"""
+    now = now or datetime.now()
+    return evaluate_alerts(facts_from_frame(df, now), now, formatter)
+
+
+class AlertState:
+    """Acumuladores por regla, actualizados con cada transacción.
+
+    Con ellos GET /alerts no recorre el ledger: las reglas se evalúan sobre
+    sumas y conteos por mes. Solo la regla de transacciones atípicas lee las
+    filas de la ventana de 3 meses, porque necesita los cuantiles.
+    """
+
+    def __init__(self):
+        self.month_rows = {}    # mes -> número de filas
+        self.months = []        # meses con datos, ordenados
+        self.totals = {}        # (mes, código de tipo) -> [suma, conteo]
+        self.by_category = {}   # mes -> {categoría: [suma, conteo]} (solo gastos)
+        self.small = {}         # mes -> [suma, conteo] de gastos hormiga
+        # Claves de duplicados del mes actual:
+        # (fecha, monto, descripción normalizada) -> [conteo, descripción, categoría]
+        self.duplicate_month = None
+        self.duplicates = {}
+        self.materialized = {}  # (fecha de evaluación, locale, símbolo) -> payload
+
+    @classmethod
+    def from_frame(cls, df):
+        state = cls()
+        if df.empty:
+            return state
+        for month, rows in df.groupby('month').size().items():
+            state.month_rows[int(month)] = int(rows)
+        state.months = sorted(state.month_rows)
+        totals = df.groupby(['month', df['type'].cat.codes])['amount'].agg(['sum', 'count'])
+        for (month, code), row in totals.iterrows():
+            state.totals[(int(month), int(code))] = [float(row['sum']), int(row['count'])]
+        expenses = df[is_expense(df)]
+        by_category = expenses.groupby(['month', 'category'], observed=True)['amount'].agg(['sum', 'count'])
+        for (month, cat), row in by_category.iterrows():
+            state.by_category.setdefault(int(month), {})[cat] = [float(row['sum']), int(row['count'])]
+        small = expenses[expenses['amount'] < SMALL_EXPENSE_LIMIT].groupby('month')['amount'].agg(['sum', 'count'])
+        for month, row in small.iterrows():
+            state.small[int(month)] = [float(row['sum']), int(row['count'])]
+        return state
+
+    def add_rows(self, df, rows):
+        """Actualiza los acumuladores con filas recién confirmadas"""
+        self._apply(rows, 1)
+        # Se materializa de inmediato: GET /alerts solo lee el resultado
+        self.materialized = {}
+        self.alerts(df)
+
+    def remove_rows(self, df, rows):
+        """Descuenta las filas corregidas o borradas"""
+        self._apply(rows, -1)
+        self.materialized = {}
+        if not df.empty:
+            self.alerts(df)
+
+    def _apply(self, rows, count):
+        for row in rows.itertuples(index=False):
+            date = pd.Timestamp(row.date)
+            month = month_key(date)
+            code = TIPO_GASTO if row.type == 'gasto' else TIPO_INGRESO
+            self.month_rows[month] = self.month_rows.get(month, 0) + count
+            if not self.month_rows[month]:
+                del self.month_rows[month]
+            if len(self.month_rows) != len(self.months):
+                self.months = sorted(self.month_rows)
+            self._accumulate(self.totals, (month, code), row.amount, count)
+            if code == TIPO_GASTO:
+                self._accumulate(self.by_category.setdefault(month, {}), row.category, row.amount, count)
+                if row.amount < SMALL_EXPENSE_LIMIT:
+                    self._accumulate(self.small, month, row.amount, count)
+                if month == self.duplicate_month:
+                    self._add_duplicate(date, row.amount, row.description, row.category, count)
+
+    @staticmethod
+    def _accumulate(target, key, amount, count=1):
+        entry = target.setdefault(key, [0.0, 0])
+        entry[0] += float(amount) * count
+        entry[1] += count
+        if entry[1] <= 0:
+            del target[key]
+
+    def _add_duplicate(self, date, amount, description, category, count=1):
+        key = (date, float(amount), normalize_description(description))
+        entry = self.duplicates.setdefault(key, [0, str(description), str(category)])
+        entry[0] += count
+        if entry[0] <= 0:
+            del self.duplicates[key]
+
+    def _load_duplicates(self, df, month):
+        """Las claves de duplicados solo se guardan para el mes actual"""
+        self.duplicate_month = month
+        self.duplicates = {}
+        current_df = month_slice(df, month)
+        for row in current_df[is_expense(current_df)].itertuples(index=False):
+            self._add_duplicate(pd.Timestamp(row.date), row.amount, row.description, row.category)
+
+    def facts(self, df, now):
+        current_month = month_key(now)
+        if self.duplicate_month != current_month:
+            self._load_duplicates(df, current_month)
+        analysis_months = self.months[-3:]
+        previous_months = [m for m in analysis_months if m < current_month]
+
+        def total(month, code):
+            return self.totals.get((month, code), (0.0, 0))
+
+        prev_sums = {}
+        for month in previous_months:
+            for cat, (amount, count) in self.by_category.get(month, {}).items():
+                entry = prev_sums.setdefault(cat, [0.0, 0])
+                entry[0] += amount
+                entry[1] += count
+        window_by_category = {}
+        for month in analysis_months:
+            for cat, (amount, _) in self.by_category.get(month, {}).items():
+                window_by_category[cat] = window_by_category.get(cat, 0.0) + amount
+        prev_month_expenses = [total(m, TIPO_GASTO)[0] for m in previous_months if total(m, TIPO_GASTO)[1] > 0]
+
+        def window_expenses():
+            window = month_slice(df, analysis_months[0], analysis_months[-1])
+            return window[is_expense(window)]
+
+        duplicates = [
+            (date, amount, count, description, category)
+            for (date, amount, _), (count, description, category) in sorted(self.duplicates.items())
+            if count > 1
+        ]
+        return {
+            "current_month": current_month,
+            "analysis_months": analysis_months,
+            "previous_months": previous_months,
+            "prev_avg": {cat: amount / count for cat, (amount, count) in sorted(prev_sums.items()) if count},
+            "current_by_category": {
+                cat: amount for cat, (amount, count) in sorted(self.by_category.get(current_month, {}).items()) if count
+            },
+            "current_income": total(current_month, TIPO_INGRESO)[0],
+            "current_expense": total(current_month, TIPO_GASTO)[0],
+            "window_income": sum(total(m, TIPO_INGRESO)[0] for m in analysis_months),
+            "window_expense": sum(total(m, TIPO_GASTO)[0] for m in analysis_months),
+            "window_expense_count": sum(total(m, TIPO_GASTO)[1] for m in analysis_months),
+            "window_expenses": window_expenses,
+            "small_count": sum(self.small.get(m, (0.0, 0))[1] for m in analysis_months),
+            "small_total": sum(self.small.get(m, (0.0, 0))[0] for m in analysis_months),
+            "monthly_expenses": [total(m, TIPO_GASTO)[0] for m in analysis_months],
+            "window_by_category": dict(sorted(window_by_category.items())),
+            "duplicates": duplicates,
+            "prev_month_avg_expense": (
+                sum(prev_month_expenses) / len(prev_month_expenses) if prev_month_expenses else float('nan')
+            ),
+        }
+
+    def alerts(self, df, now=None, formatter=None):
+        """Conjunto de alertas materializado por locale; se reevalúa al cambiar el día"""
+        now = now or datetime.now()
+        formatter = formatter or get_formatter()
+        # Los resultados de días anteriores ya no sirven
+        if any(date != now.date() for date, _, _ in self.materialized):
+            self.materialized = {}
+        key = (now.date(), formatter.locale, formatter.symbol)
+        if key not in self.materialized:
+            self.materialized[key] = evaluate_alerts(self.facts(df, now), now, formatter)
+        return self.materialized[key]
+
+
+def compare_alerts(expected, actual, tolerance=0.01):
+    """Diferencias entre dos conjuntos de alertas (montos con tolerancia)"""
+    expected = {alert_key(a): a for a in expected}
+    actual = {alert_key(a): a for a in actual}
+    differences = []
+    for key in sorted(set(expected) | set(actual)):
+        if key not in actual:
+            differences.append({"key": key, "problem": "missing_incremental"})
+        elif key not in expected:
+            differences.append({"key": key, "problem": "missing_full"})
+        else:
+            for field, value in expected[key].items():
+                other = actual[key].get(field)
+                if field == 'message':
+                    continue
+                if isinstance(value, float) and isinstance(other, float):
+                    if not math.isclose(value, other, abs_tol=tolerance):
+                        differences.append({"key": key, "field": field, "full": value, "incremental": other})
+                elif value != other:
+                    differences.append({"key": key, "field": field, "full": value, "incremental": other})
+    return differences
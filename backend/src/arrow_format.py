@@ -0,0 +1,62 @@
+import io
+import json
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow es opcional; sin él los endpoints responden 406 al pedir Arrow
+    pa = None
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+# Códecs de compresión de buffers admitidos por el formato IPC
+ARROW_CODECS = ('lz4', 'zstd')
+# Filas por record batch: el cliente puede empezar a procesar antes de recibir todo
+RECORD_BATCH_ROWS = 64 * 1024
+METADATA_KEY = b'finsight'
+
+
+def arrow_available():
+    return pa is not None
+
+
+def codec_available(codec):
+    return codec is None or (pa is not None and pa.Codec.is_available(codec))
+
+
+def iter_ipc_stream(df, metadata=None, compression=None):
+    """DataFrame en formato Arrow IPC stream, un record batch por vez.
+
+    Las columnas numéricas y de fechas se pasan sin copiar y las categóricas
+    se envían como arreglos de diccionario (códigos + categorías), así que
+    el cliente reconstruye el DataFrame con `pa.ipc.open_stream(...).read_pandas()`.
+    Lo que no es tabular (totales, período) viaja como JSON en los metadatos
+    del esquema bajo la clave `finsight`.
+
+    La tabla se arma al llamarla (los errores salen en la petición); el
+    generador devuelto entrega cada batch ya serializado (el primero con el esquema),
+    así la respuesta se envía mientras se escribe y nunca hay una copia
+    completa del stream en memoria.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata is not None:
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode()
+        table = table.replace_schema_metadata(schema_metadata)
+    return _write_batches(table, pa.ipc.IpcWriteOptions(compression=compression))
+
+
+def _write_batches(table, options):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        # El esquema se escribe junto con el primer batch
+        for batch in table.to_batches(max_chunksize=RECORD_BATCH_ROWS):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    # Marca de fin del stream
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
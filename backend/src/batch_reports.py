@@ -0,0 +1,100 @@
+"""Genera el reporte PDF (/reports/pdf) de muchos tenants en paralelo.
+
+Cada proceso del pool importa la app una vez y renderiza los tenants que
+le tocan de a uno, con el mismo código (y las mismas cachés) que el
+endpoint. La memoria queda acotada: cada proceso mantiene un solo ledger
+residente y una caché de respuestas chica, y se reemplaza por uno nuevo
+cada --max-tasks-per-child reportes.
+
+Uso:
+    uv run python src/batch_reports.py --all --output reports/2026-10
+    uv run python src/batch_reports.py --tenants acme,globex --workers 4 --locale en --output reports
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from formatting import is_supported_locale  # noqa: E402
+from tenants import is_valid_tenant_id, stored_tenant_ids  # noqa: E402
+
+# La app del proceso trabajador (se importa una vez por proceso)
+_main = None
+
+
+def init_worker(cache_mb):
+    """Configura el proceso antes de importar la app: sin tareas de fondo y memoria acotada"""
+    os.environ['FINSIGHT_SCHEDULER'] = '0'
+    os.environ['FINSIGHT_MAX_TENANTS'] = '1'
+    os.environ['FINSIGHT_CACHE_MAX_MB'] = str(cache_mb)
+    os.environ.pop('FINSIGHT_WARMUP', None)
+
+
+def render(task):
+    """Escribe <output_dir>/<tenant>.pdf; devuelve un resumen para el reporte final"""
+    global _main
+    tenant_id, output_dir, locale = task
+    if _main is None:
+        import main
+        _main = main
+    start = time.perf_counter()
+    try:
+        pdf = _main.report_pdf(tenant_id, locale)
+    except Exception as exc:
+        return {'tenant': tenant_id, 'status': 'error', 'error': repr(exc)}
+    if pdf is None:
+        return {'tenant': tenant_id, 'status': 'empty'}
+    path = os.path.join(output_dir, f"{tenant_id}.pdf")
+    with open(path, 'wb') as f:
+        f.write(pdf)
+    return {'tenant': tenant_id, 'status': 'ok', 'path': path, 'bytes': len(pdf),
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+def run_batch(tenant_ids, output_dir, workers=None, max_tasks_per_child=50, cache_mb=16, locale=None):
+    os.makedirs(output_dir, exist_ok=True)
+    # multiprocessing.Pool y no ProcessPoolExecutor: con max_tasks_per_child este
+    # se bloquea al reemplazar procesos (visto en Python 3.12.1). Con 'spawn'
+    # cada reemplazo arranca sin heredar la memoria del padre.
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=init_worker, initargs=(cache_mb,),
+                      maxtasksperchild=max_tasks_per_child) as pool:
+        results = list(pool.imap_unordered(render, [(tenant_id, output_dir, locale) for tenant_id in tenant_ids]))
+    return sorted(results, key=lambda result: result['tenant'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', help='Tenants separados por coma')
+    parser.add_argument('--all', action='store_true', help='Todos los tenants con archivo en disco')
+    parser.add_argument('--output', default='reports', help='Carpeta de los PDF')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, uno por CPU)')
+    parser.add_argument('--max-tasks-per-child', type=int, default=50,
+                        help='Reportes por proceso antes de reemplazarlo')
+    parser.add_argument('--cache-mb', type=int, default=16, help='Caché de respuestas por proceso')
+    parser.add_argument('--locale', help='Locale de los montos y alertas (es, en, es_ES)')
+    args = parser.parse_args()
+
+    tenant_ids = stored_tenant_ids() if args.all else []
+    if args.tenants:
+        tenant_ids += [tenant_id.strip() for tenant_id in args.tenants.split(',') if tenant_id.strip()]
+    invalid = [tenant_id for tenant_id in tenant_ids if not is_valid_tenant_id(tenant_id)]
+    if invalid or not tenant_ids:
+        parser.error(f"Tenants inválidos: {', '.join(invalid)}" if invalid else 'Indicar --tenants o --all')
+    if args.locale is not None and not is_supported_locale(args.locale):
+        parser.error(f"Locale no soportado: {args.locale}")
+
+    start = time.perf_counter()
+    results = run_batch(list(dict.fromkeys(tenant_ids)), args.output, args.workers, args.max_tasks_per_child,
+                        args.cache_mb, args.locale)
+    summary = {status: sum(result['status'] == status for result in results) for status in ('ok', 'empty', 'error')}
+    print(json.dumps({'seconds': round(time.perf_counter() - start, 2), **summary, 'results': results}, indent=2))
+    return 1 if summary['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MAX_BYTES = int(os.environ.get('FINSIGHT_CACHE_MAX_MB', '64')) * 1024 * 1024
+CACHE_TTL_SECONDS = float(os.environ.get('FINSIGHT_CACHE_TTL', '300'))
+
+
+def strong_etag(body):
+    """ETag fuerte: depende solo de los bytes exactos de la respuesta"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class CacheEntry:
+    """Respuesta ya generada, lista para volver a servirse"""
+
+    def __init__(self, body, mimetype, etag, last_modified):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        self.created = time.monotonic()
+        # Cuerpo ya comprimido por codificación (gzip, br, zstd)
+        self.encoded = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(body) for body in self.encoded.values())
+
+
+class ResponseCache:
+    """Caché LRU de respuestas con límite de tamaño total y TTL"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        # Una respuesta más grande que toda la caché no se guarda
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def add_encoding(self, key, entry, encoding, body):
+        """Guarda la versión comprimida de una entrada y ajusta el tamaño de la caché"""
+        with self._lock:
+            if encoding in entry.encoded:
+                return entry.encoded[encoding]
+            entry.encoded[encoding] = body
+            # La entrada pudo haber sido expulsada mientras se comprimía
+            if self._entries.get(key) is entry:
+                self.total_bytes += len(body)
+                while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                    self._remove(next(iter(self._entries)))
+            return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class _Flight:
+    """Cálculo en curso: los que llegan después esperan `done`"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Agrupa cálculos idénticos simultáneos (single-flight).
+
+    La primera petición con una clave calcula; las que llegan con la misma
+    clave mientras tanto esperan y reciben el mismo resultado (o la misma
+    excepción) en lugar de repetir el cálculo. La clave se libera al
+    terminar: lo que llegue después ya encuentra la respuesta en la caché.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        """(resultado, compartido): compartido es True si se esperó el cálculo de otra petición"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'waiting': sum(flight.waiters for flight in self._flights.values()),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,63 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli y zstandard son opcionales; gzip siempre está disponible
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Respuestas más chicas que esto se envían sin comprimir (no vale la pena el costo)
+MIN_SIZE = int(os.environ.get('FINSIGHT_COMPRESS_MIN_BYTES', '1024'))
+LEVELS = {
+    'gzip': int(os.environ.get('FINSIGHT_GZIP_LEVEL', '6')),
+    'br': int(os.environ.get('FINSIGHT_BROTLI_LEVEL', '5')),
+    'zstd': int(os.environ.get('FINSIGHT_ZSTD_LEVEL', '3')),
+}
+# Orden de preferencia del servidor cuando el cliente acepta varias con la misma calidad
+PREFERENCE = ['zstd', 'br', 'gzip']
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/vnd.apache.arrow.stream', 'text/plain', 'text/html', 'text/csv',
+}
+
+
+def available_encodings():
+    encodings = []
+    for encoding in os.environ.get('FINSIGHT_COMPRESSION', ','.join(PREFERENCE)).split(','):
+        if encoding == 'zstd' and zstandard is None or encoding == 'br' and brotli is None:
+            continue
+        if encoding in LEVELS:
+            encodings.append(encoding)
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def is_compressible(mimetype, size):
+    return mimetype in COMPRESSIBLE_MIMETYPES and size >= MIN_SIZE
+
+
+def choose_encoding(accept_encodings):
+    """Mejor codificación para la cabecera Accept-Encoding (objeto Accept de werkzeug)"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    level = LEVELS[encoding]
+    if encoding == 'gzip':
+        # mtime fijo: mismos bytes de entrada, mismos bytes comprimidos
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
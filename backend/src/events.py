@@ -0,0 +1,155 @@
+import collections
+import json
+import queue
+import threading
+
+from alerts import alert_key
+from serialization import default
+
+# Segundos sin eventos antes de mandar un comentario para mantener viva la conexión
+HEARTBEAT_SECONDS = 15
+# Eventos pendientes por suscriptor; si un cliente no lee, se descartan los nuevos
+SUBSCRIBER_QUEUE_SIZE = 100
+# Eventos recientes por tenant que se reenvían a un cliente que se reconecta con Last-Event-ID
+HISTORY_SIZE = 256
+
+
+def format_sse(event, data, event_id=None):
+    """Serializa un evento en el formato de Server-Sent Events.
+
+    Los valores se codifican como en las respuestas JSON (fechas en formato
+    http_date), así una fila del evento es igual a la de /transactions.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    for line in json.dumps(data, default=default, ensure_ascii=False).splitlines():
+        lines.append(f"data: {line}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def diff_alerts(previous, current):
+    """Alertas nuevas o modificadas (raised) y alertas que desaparecieron (cleared)"""
+    previous = {alert_key(a): a for a in previous}
+    current = {alert_key(a): a for a in current}
+    raised = [dict(a, key=k) for k, a in current.items() if previous.get(k) != a]
+    cleared = [k for k in previous if k not in current]
+    return raised, cleared
+
+
+def parse_event_id(value):
+    """Valor de la cabecera Last-Event-ID; None si falta o no es un id de este servidor"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class EventHistory:
+    """Últimos eventos publicados de un tenant.
+
+    `since` es la versión a partir de la cual la historia está completa: todo
+    cambio con versión mayor está en `entries` (si no se descartó por tamaño).
+    """
+
+    def __init__(self, since):
+        self.since = since
+        self.entries = collections.deque()
+
+    def append(self, event_id, message):
+        self.entries.append((event_id, message))
+        while len(self.entries) > HISTORY_SIZE:
+            # Los eventos de esa versión quedan incompletos: solo se puede reenviar lo posterior
+            self.since = max(self.since, self.entries.popleft()[0])
+
+    def after(self, last_event_id, version):
+        """Eventos posteriores a last_event_id, o None si la historia no alcanza para reconstruirlos"""
+        if last_event_id < self.since:
+            return None
+        latest = self.entries[-1][0] if self.entries else self.since
+        if latest < version:
+            # El ledger cambió sin publicar eventos (p. ej. se editó el CSV en disco)
+            return None
+        return [message for event_id, message in self.entries if event_id > last_event_id]
+
+
+class EventBus:
+    """Suscriptores SSE por tenant, eventos recientes y último conjunto de alertas publicado"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._history = {}
+        self._last_alerts = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, tenant_id, version, last_event_id=None):
+        """Registra un suscriptor y devuelve su cola y los eventos que debe recibir antes.
+
+        Con last_event_id (reconexión) se reenvían los eventos posteriores de
+        la historia; si no alcanza, un único 'resync' para que el cliente
+        vuelva a pedir los datos. Se hace bajo el mismo lock que publish(),
+        así ningún evento se pierde ni se repite entre lo reenviado y la cola.
+        """
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        backlog = []
+        with self._lock:
+            history = self._history.get(tenant_id)
+            if last_event_id is not None and last_event_id < version:
+                backlog = history.after(last_event_id, version) if history is not None else None
+                if backlog is None:
+                    backlog = [format_sse('resync', {"version": version}, version)]
+            if history is None:
+                self._history[tenant_id] = EventHistory(version)
+            self._subscribers.setdefault(tenant_id, set()).add(q)
+        return q, backlog
+
+    def unsubscribe(self, tenant_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(tenant_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[tenant_id]
+                    self._last_alerts.pop(tenant_id, None)
+
+    def has_subscribers(self, tenant_id):
+        """Si hay suscriptores; si no, la historia se descarta porque el cambio no se publicará"""
+        with self._lock:
+            if self._subscribers.get(tenant_id):
+                return True
+            self._history.pop(tenant_id, None)
+            return False
+
+    def publish(self, tenant_id, event, data, event_id=None):
+        message = format_sse(event, data, event_id)
+        with self._lock:
+            history = self._history.get(tenant_id)
+            if history is not None and event_id is not None:
+                history.append(event_id, message)
+            subscribers = list(self._subscribers.get(tenant_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def swap_alerts(self, tenant_id, alerts):
+        """Guarda el conjunto actual y devuelve el anterior (None si no había)"""
+        with self._lock:
+            previous = self._last_alerts.get(tenant_id)
+            self._last_alerts[tenant_id] = alerts
+            return previous
+
+    def stream(self, tenant_id, q, backlog=()):
+        """Generador para la respuesta text/event-stream de un suscriptor"""
+        try:
+            yield 'retry: 3000\n\n'
+            yield from backlog
+            while True:
+                try:
+                    yield q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(tenant_id, q)
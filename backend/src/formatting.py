@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+
+# Idioma de los mensajes y formato de números; el símbolo de moneda se configura aparte
+DEFAULT_LOCALE = os.environ.get('FINSIGHT_LOCALE', 'es')
+CURRENCY_SYMBOL = os.environ.get('FINSIGHT_CURRENCY_SYMBOL', '$')
+# A partir de este tamaño se formatea una vez por monto distinto
+DEDUPLICATE_FROM = 64
+
+MESSAGES = {
+    'es': {
+        'gasto_elevado_categoria': "⚠️ Gasto elevado en {category}: {current_amount} este mes vs promedio de {average_amount} ({months}). Aumento del {increase_pct:.1f}%",
+        'deficit_mensual': "🚨 DÉFICIT: Gastos ({expense}) superan ingresos ({income}) por {deficit} ({deficit_pct:.1f}% extra)",
+        'ahorro_bajo': "📉 Tasa de ahorro baja: {savings_rate:.1f}% ({period}). Has ahorrado {savings}. Meta recomendada: 20%",
+        'ahorro_negativo': "🚨 AHORRO NEGATIVO: Estás gastando {deficit} más de lo que ganas ({period})",
+        'transaccion_inusual': "💰 Gasto atípico: {amount} en '{description}' ({category}) el {date}. Supera el umbral de {threshold}",
+        'gastos_hormiga': "🐜 Gastos hormiga: {count} transacciones pequeñas (promedio {average}) suman {total} ({pct:.1f}% del total) en {period}",
+        'tendencia_creciente': "📈 Tendencia creciente: Gastos aumentando consistentemente: {month0} ({amount0}) → {month1} ({amount1}) → {month2} ({amount2}). Aumento total: {increase:.1f}%",
+        'sin_ingresos': "⚠️ No hay ingresos registrados en {month} pero sí gastos por {expense}. ¿Olvidaste registrar ingresos?",
+        'categoria_dominante': "📊 Categoría dominante: '{category}' representa {amount} ({pct:.1f}%) de tus gastos en {period}. Otras: {others}",
+        'categoria_dominante_otra': "{category} ({amount})",
+        'posible_duplicado': "🔄 Posible duplicado: {amount} en '{description}' ({category}) registrado {count} veces el {date}. Total: {total}",
+        'proyeccion_excesiva': "⚡ Proyección alta: Llevas {current} en {days} días ({daily}/día). Proyección fin de mes: {projected} vs promedio de {average} ({months}). Exceso proyectado: {excess} (+{excess_pct:.1f}%)",
+    },
+    'en': {
+        'gasto_elevado_categoria': "⚠️ High spending on {category}: {current_amount} this month vs an average of {average_amount} ({months}). Up {increase_pct:.1f}%",
+        'deficit_mensual': "🚨 DEFICIT: Expenses ({expense}) exceed income ({income}) by {deficit} ({deficit_pct:.1f}% over)",
+        'ahorro_bajo': "📉 Low savings rate: {savings_rate:.1f}% ({period}). You have saved {savings}. Recommended goal: 20%",
+        'ahorro_negativo': "🚨 NEGATIVE SAVINGS: You are spending {deficit} more than you earn ({period})",
+        'transaccion_inusual': "💰 Unusual expense: {amount} on '{description}' ({category}) on {date}. Above the {threshold} threshold",
+        'gastos_hormiga': "🐜 Small expenses: {count} small transactions (average {average}) add up to {total} ({pct:.1f}% of the total) in {period}",
+        'tendencia_creciente': "📈 Rising trend: Expenses increasing steadily: {month0} ({amount0}) → {month1} ({amount1}) → {month2} ({amount2}). Total increase: {increase:.1f}%",
+        'sin_ingresos': "⚠️ No income recorded in {month} but there are expenses of {expense}. Did you forget to record your income?",
+        'categoria_dominante': "📊 Dominant category: '{category}' accounts for {amount} ({pct:.1f}%) of your expenses in {period}. Others: {others}",
+        'categoria_dominante_otra': "{category} ({amount})",
+        'posible_duplicado': "🔄 Possible duplicate: {amount} on '{description}' ({category}) recorded {count} times on {date}. Total: {total}",
+        'proyeccion_excesiva': "⚡ High projection: You have spent {current} in {days} days ({daily}/day). Month-end projection: {projected} vs an average of {average} ({months}). Projected excess: {excess} (+{excess_pct:.1f}%)",
+    },
+}
+
+# Separadores decimal y de miles, y posición del símbolo, por locale
+NUMBER_FORMATS = {
+    'es': ('.', ',', 'prefix'),
+    'en': ('.', ',', 'prefix'),
+    'es_ES': (',', '.', 'suffix'),
+}
+
+
+class Formatter:
+    """Montos y mensajes de un locale, preparados una sola vez.
+
+    Las plantillas quedan como métodos `format` ya resueltos y el patrón
+    del monto (símbolo, separadores) se arma al crear el formateador, así
+    cada mensaje no vuelve a buscar el locale ni a armar cadenas.
+    """
+
+    def __init__(self, locale=DEFAULT_LOCALE, symbol=CURRENCY_SYMBOL):
+        self.locale = locale
+        self.symbol = symbol
+        language = locale.split('_')[0]
+        messages = MESSAGES.get(locale) or MESSAGES.get(language) or MESSAGES['es']
+        self._messages = {name: template.format for name, template in messages.items()}
+        decimal_sep, thousands_sep, position = NUMBER_FORMATS.get(locale) or NUMBER_FORMATS.get(language, NUMBER_FORMATS['es'])
+        # '.' y ',' de Python se intercambian con una sola pasada de translate
+        self._separators = (None if (decimal_sep, thousands_sep) == ('.', ',')
+                            else str.maketrans({'.': decimal_sep, ',': thousands_sep}))
+        self._pattern = f"{symbol}{{}}" if position == 'prefix' else f"{{}} {symbol}"
+
+    def money(self, amount):
+        """Un monto: $#,###.## con la configuración por defecto"""
+        text = f"{amount:,.2f}"
+        if self._separators is not None:
+            text = text.translate(self._separators)
+        return self._pattern.format(text)
+
+    def money_many(self, amounts):
+        """Todos los montos de un arreglo de una vez, en el mismo orden"""
+        values = np.asarray(amounts, dtype=np.float64)
+        if values.size >= DEDUPLICATE_FROM:
+            unique, inverse = np.unique(values, return_inverse=True)
+            if unique.size < values.size:
+                return np.asarray(self._format_batch(unique), dtype=object)[inverse].tolist()
+        return self._format_batch(values)
+
+    def _format_batch(self, values):
+        if not values.size:
+            return []
+        # Un solo translate para todo el lote en vez de uno por monto
+        text = '\n'.join(f"{value:,.2f}" for value in values.tolist())
+        if self._separators is not None:
+            text = text.translate(self._separators)
+        pattern = self._pattern
+        return [pattern.format(part) for part in text.split('\n')]
+
+    def message(self, name, **values):
+        return self._messages[name](**values)
+
+
+_formatters = {}
+
+
+def get_formatter(locale=None, symbol=None):
+    """Formateador compartido por (locale, símbolo); se crea la primera vez que se pide"""
+    key = (locale or DEFAULT_LOCALE, symbol or CURRENCY_SYMBOL)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        formatter = _formatters[key] = Formatter(*key)
+    return formatter
+
+
+def is_supported_locale(locale):
+    return locale in MESSAGES or locale in NUMBER_FORMATS
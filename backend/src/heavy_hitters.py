@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from alerts import normalize_description
+from ledger import TIPO_GASTO, TYPE_LABELS, is_expense, month_key
+
+# Contadores por resumen; mientras un mes tenga menos descripciones distintas el conteo es exacto
+CAPACITY = int(os.environ.get('FINSIGHT_HABITS_CAPACITY', '256'))
+# Ventanas con menos filas que esto se cuentan de forma exacta sobre el ledger
+EXACT_MAX_ROWS = int(os.environ.get('FINSIGHT_HABITS_EXACT_ROWS', '20000'))
+
+
+class SpaceSaving:
+    """Resumen SpaceSaving: los `capacity` elementos más frecuentes con cota de error.
+
+    `counts[item]` nunca subestima la frecuencia real y la sobreestima como
+    mucho en `errors[item]`. Mientras haya lugar para todos los elementos
+    el resumen es exacto. Dos resúmenes se combinan con merge() sin volver
+    a ver los datos (ver Agarwal et al., "Mergeable Summaries").
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.exact = True
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        # Lleno: el nuevo elemento reemplaza al de menor conteo y hereda ese conteo como error
+        victim = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+        self.exact = False
+
+    def remove(self, item, count=1):
+        """Descuenta apariciones de un elemento (transacción corregida o borrada).
+
+        Si el elemento ya no está en el resumen su frecuencia real es a lo
+        sumo floor(), que sigue siendo cota válida: no hay nada que ajustar.
+        Un contador solo se elimina mientras el resumen es exacto; si no,
+        dejar un lugar libre bajaría floor() a cero para los desalojados.
+        """
+        if item not in self.counts:
+            return
+        self.counts[item] -= count
+        if self.exact and self.counts[item] <= 0:
+            del self.counts[item]
+            del self.errors[item]
+
+    def floor(self):
+        """Cota de la frecuencia de cualquier elemento que no está en el resumen"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """Resumen nuevo con los conteos de self y other"""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        own_floor, other_floor = self.floor(), other.floor()
+        for item in self.counts.keys() | other.counts.keys():
+            merged.counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            merged.errors[item] = self.errors.get(item, own_floor) + other.errors.get(item, other_floor)
+        merged.exact = self.exact and other.exact
+        if len(merged.counts) > merged.capacity:
+            keep = sorted(merged.counts, key=lambda item: (-merged.counts[item], item))[:merged.capacity]
+            merged.counts = {item: merged.counts[item] for item in keep}
+            merged.errors = {item: merged.errors[item] for item in keep}
+            merged.exact = False
+        return merged
+
+    def top(self, n):
+        """[(elemento, conteo, error)] de los n más frecuentes"""
+        ranked = sorted(self.counts, key=lambda item: (-self.counts[item], item))[:n]
+        return [(item, self.counts[item], self.errors[item]) for item in ranked]
+
+
+class HabitIndex:
+    """Un resumen SpaceSaving por mes de las descripciones de gastos normalizadas"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.months = {}
+        self.rows = {}  # mes -> gastos del mes, para decidir el conteo exacto
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        expenses = df[is_expense(df)]
+        if expenses.empty:
+            return index
+        # Cada descripción distinta se normaliza una vez y las filas se cuentan por código
+        normalized = pd.Series(expenses['description'].cat.categories).map(normalize_description)
+        labels, codes = np.unique(normalized.to_numpy(dtype=object)[expenses['description'].cat.codes.to_numpy()],
+                                  return_inverse=True)
+        counts = pd.DataFrame({'month': expenses['month'].to_numpy(), 'code': codes}).value_counts()
+        for (month, code), count in counts.items():
+            index._summary(int(month)).add(labels[code], int(count))
+        for month, rows in expenses.groupby('month').size().items():
+            index.rows[int(month)] = int(rows)
+        return index
+
+    def _summary(self, month):
+        summary = self.months.get(month)
+        if summary is None:
+            summary = self.months[month] = SpaceSaving(self.capacity)
+        return summary
+
+    def add_rows(self, df, rows):
+        for row in rows.itertuples(index=False):
+            if row.type != TYPE_LABELS[TIPO_GASTO]:
+                continue
+            month = month_key(pd.Timestamp(row.date))
+            self._summary(month).add(normalize_description(row.description))
+            self.rows[month] = self.rows.get(month, 0) + 1
+
+    def remove_rows(self, df, rows):
+        for row in rows.itertuples(index=False):
+            if row.type != TYPE_LABELS[TIPO_GASTO]:
+                continue
+            month = month_key(pd.Timestamp(row.date))
+            self._summary(month).remove(normalize_description(row.description))
+            self.rows[month] -= 1
+            if not self.rows[month]:
+                del self.rows[month], self.months[month]
+
+    def window(self, start_month=None, end_month=None):
+        """Resumen combinado de los meses start_month..end_month (inclusive)"""
+        merged = SpaceSaving(self.capacity)
+        for month, summary in self.months.items():
+            if (start_month is None or month >= start_month) and (end_month is None or month <= end_month):
+                merged = merged.merge(summary)
+        return merged
+
+    def window_rows(self, start_month=None, end_month=None):
+        return sum(rows for month, rows in self.rows.items()
+                   if (start_month is None or month >= start_month) and (end_month is None or month <= end_month))
+
+
+def exact_top(expenses, n):
+    """Conteo exacto de descripciones normalizadas, mismo formato que SpaceSaving.top()"""
+    counts = expenses['description'].astype(str).map(normalize_description).value_counts()
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+    return [(item, int(count), 0) for item, count in ranked]
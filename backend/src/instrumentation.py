@@ -0,0 +1,212 @@
+import contextlib
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+
+from flask import g, has_request_context
+
+# Límites (en segundos) de los buckets de los histogramas, como los de Prometheus
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Funciones que se muestran en el volcado de texto de ?profile=1
+PROFILE_LIMIT = 60
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{n}="{escape_label(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Métrica con etiquetas; los valores se guardan por tupla de etiquetas"""
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def _samples(self, key, value):
+        return [f'{self.name}{format_labels(self.labels, key)} {value}']
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((key, value) for key, value in self._values.items())
+            for key, value in items:
+                lines += self._samples(key, value)
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [conteo por bucket (acumulado), suma, total de observaciones]
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self, key, series):
+        buckets, total, count = series
+        lines = [f'{self.name}_bucket{format_labels(self.labels, key, [("le", bound)])} {n}'
+                 for bound, n in zip(self.buckets, buckets)]
+        lines.append(f'{self.name}_bucket{format_labels(self.labels, key, [("le", "+Inf")])} {count}')
+        lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {total}')
+        lines.append(f'{self.name}_count{format_labels(self.labels, key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expuestas en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, labels=(), **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help_text, labels, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+class SpanRecorder:
+    """Tiempos por etapa de una petición.
+
+    Cada span guarda su tiempo exclusivo: lo que tarda un span anidado
+    (p. ej. parse dentro de load) se descuenta del span que lo contiene,
+    así la suma de las etapas no cuenta dos veces el mismo tiempo.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            children = self._stack.pop()
+            elapsed = time.perf_counter() - start
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed - children
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos)"""
+        entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.totals.items()]
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Mide una etapa de la petición actual; fuera de una petición no hace nada"""
+    recorder = g.get('spans') if has_request_context() else None
+    if recorder is None:
+        yield
+    else:
+        with recorder.span(name):
+            yield
+
+
+# cProfile no admite dos perfiles activos a la vez
+profiler_lock = threading.Lock()
+
+
+def start_profile():
+    """Inicia cProfile para la petición actual; None si ya hay otro perfil en curso"""
+    if not profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler):
+    profiler.disable()
+    profiler_lock.release()
+
+
+def profile_report(profiler, fmt):
+    """Volcado del perfil: texto ordenado por tiempo acumulado o pstats binario.
+
+    El formato binario se abre con `python -m pstats` o se convierte en
+    flamegraph con herramientas como snakeviz o flameprof.
+    """
+    stats = pstats.Stats(profiler)
+    if fmt == 'pstats':
+        return marshal.dumps(stats.stats), 'application/octet-stream'
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(PROFILE_LIMIT)
+    return out.getvalue(), 'text/plain'
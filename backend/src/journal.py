@@ -0,0 +1,121 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+import ledger
+from ledger import ID_COLUMN, STORED_COLUMNS
+from timestamps import to_local
+
+# Registros del journal: 'update' (fila completa nueva), 'delete' (tombstone)
+# y 'reserve' (último id asignado, para no reutilizar ids de filas borradas)
+UPDATE, DELETE, RESERVE = 'update', 'delete', 'reserve'
+JOURNAL_COLUMNS = ['op'] + STORED_COLUMNS
+
+
+def append_record(path, op, transaction_id, fields=None):
+    """Agrega un registro al final del journal: una línea, sin reescribir el ledger"""
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(JOURNAL_COLUMNS)
+        fields = dict(fields or {}, id=transaction_id)
+        writer.writerow([op] + [fields.get(col, '') for col in STORED_COLUMNS])
+
+
+def reset(path, reserved_id=0):
+    """Vacía el journal después de escribir el ledger completo; conserva el último id asignado"""
+    if reserved_id <= 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(JOURNAL_COLUMNS)
+        writer.writerow([RESERVE] + ['' if col != ID_COLUMN else reserved_id for col in STORED_COLUMNS])
+
+
+def read_records(path):
+    """Registros del journal en orden; vacío si no existe"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=JOURNAL_COLUMNS)
+    return pd.read_csv(path, dtype={'op': str, ID_COLUMN: 'int64', 'description': str})
+
+
+def pending(records):
+    """El journal tiene cambios que todavía no están en el archivo del ledger"""
+    return bool(records['op'].isin([UPDATE, DELETE]).any())
+
+
+def max_id(records):
+    return int(records[ID_COLUMN].max()) if not records.empty else 0
+
+
+def replay(df, records, timezone):
+    """Aplica al ledger leído del archivo los cambios del journal (el último registro de cada id gana)"""
+    changes = records[records['op'].isin([UPDATE, DELETE])]
+    if changes.empty:
+        return df
+    last = changes.drop_duplicates(ID_COLUMN, keep='last')
+    present = last[ID_COLUMN].isin(df[ID_COLUMN])
+    base = df[~df[ID_COLUMN].isin(last[ID_COLUMN])].reset_index(drop=True)
+    patches = last[present & (last['op'] == UPDATE)]
+    if patches.empty:
+        return base
+    rows = patches[STORED_COLUMNS].reset_index(drop=True)
+    rows['date'] = to_local(rows['date'], timezone).to_numpy()
+    rows['amount'] = rows['amount'].astype(float)
+    return ledger.append(base, rows)
+
+
+def row_frame(df, position):
+    """Fila del ledger como las filas nuevas que reciben los índices (tipo y categoría como texto)"""
+    row = df.iloc[[position]]
+    return pd.DataFrame({
+        ID_COLUMN: row[ID_COLUMN].to_numpy(),
+        'date': row['date'].to_numpy(),
+        'type': row['type'].astype(str).to_numpy(),
+        'amount': row['amount'].to_numpy(),
+        'description': row['description'].astype(str).to_numpy(),
+        'category': row['category'].astype(str).to_numpy(),
+    })
+
+
+class PrimaryKeyIndex:
+    """id -> fecha de cada transacción.
+
+    El ledger está ordenado por fecha, así que con la fecha la fila se
+    ubica por búsqueda binaria y solo se revisan las filas de ese mismo
+    instante. A diferencia de un mapa id -> posición, no hay que
+    recalcular nada cuando una inserción atrasada desplaza las filas.
+    """
+
+    def __init__(self):
+        self.dates = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index.dates = dict(zip(df[ID_COLUMN].tolist(), df['date'].to_numpy()))
+        return index
+
+    def add_rows(self, df, rows):
+        for transaction_id, date in zip(rows[ID_COLUMN].tolist(), rows['date'].to_numpy(dtype='datetime64[s]')):
+            self.dates[transaction_id] = date
+
+    def remove_rows(self, df, rows):
+        for transaction_id in rows[ID_COLUMN].tolist():
+            self.dates.pop(transaction_id, None)
+
+    def position(self, df, transaction_id):
+        """Posición de la fila en df; None si el id no existe"""
+        date = self.dates.get(transaction_id)
+        if date is None:
+            return None
+        dates = df['date'].to_numpy()
+        lo = int(np.searchsorted(dates, date, side='left'))
+        hi = int(np.searchsorted(dates, date, side='right'))
+        matches = np.flatnonzero(df[ID_COLUMN].to_numpy()[lo:hi] == transaction_id)
+        return lo + int(matches[0]) if len(matches) else None
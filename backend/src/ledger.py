@@ -0,0 +1,262 @@
+import sys
+import types
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from timestamps import DEFAULT_TIMEZONE, to_local
+
+COLUMNS = ['date', 'type', 'amount', 'description', 'category']
+# Identificador estable de cada transacción (PUT/DELETE /transaction/<id>)
+ID_COLUMN = 'id'
+# Columnas en disco y en las respuestas: el id y los datos
+STORED_COLUMNS = COLUMNS + [ID_COLUMN]
+
+CATEGORIES = {
+    "Transporte": ["uber", "taxi", "gasolina", "bus", "combustible"],
+    "Alimentacion": ["supermercado", "restaurante", "comida", "almuerzo", "cena", "desayuno"],
+    "Entretenimiento": ["cine", "netflix", "spotify", "bar", "juego", "musica"],
+    "Servicios": ["agua", "luz", "internet", "telefono", "electricidad"],
+    "Otros": []
+}
+
+# === Representación compacta del ledger en memoria ===
+# 'type' y 'category' se guardan como categóricos (códigos int8) y las rutas
+# comparan códigos enteros en lugar de cadenas. 'description' también es
+# categórico: cada texto distinto se guarda una sola vez.
+# Orden alfabético para que los groupby devuelvan el mismo orden que con cadenas
+TYPE_LABELS = ['gasto', 'ingreso']
+TIPO_GASTO = 0
+TIPO_INGRESO = 1
+TYPE_DTYPE = pd.CategoricalDtype(TYPE_LABELS)
+
+CATEGORY_LABELS = sorted(list(CATEGORIES) + ['Ingreso'])
+
+DATE_DTYPE = 'datetime64[s]'
+
+# Columnas derivadas que se calculan una sola vez al cargar o insertar:
+# 'month' es un índice entero year*12+month y 'day' el día del mes.
+DERIVED_COLUMNS = ['month', 'day']
+
+
+def categorize(description):
+    desc_lower = description.lower()
+    for cat, keywords in CATEGORIES.items():
+        if any(kw in desc_lower for kw in keywords):
+            return cat
+    return "Otros"
+
+
+def month_key(value):
+    """Índice entero del mes (year*12+month) de una fecha o de una serie de fechas"""
+    if isinstance(value, pd.Series):
+        return (value.dt.year * 12 + value.dt.month).astype('int32')
+    return value.year * 12 + value.month
+
+
+def current_month_key():
+    return month_key(datetime.now())
+
+
+def month_period(key):
+    """Convierte el índice entero a pd.Period, útil para strftime"""
+    year, month = divmod(int(key) - 1, 12)
+    return pd.Period(year=year, month=month + 1, freq='M')
+
+
+def month_str(key):
+    year, month = divmod(int(key) - 1, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def with_derived_columns(df):
+    return df.assign(month=month_key(df['date']), day=df['date'].dt.day.astype('int8'))
+
+
+def empty_frame():
+    return pd.DataFrame({
+        'date': pd.Series(dtype=DATE_DTYPE),
+        'type': pd.Series(dtype=TYPE_DTYPE),
+        'amount': pd.Series(dtype=float),
+        'description': pd.Series(dtype='category'),
+        'category': pd.Series(dtype=pd.CategoricalDtype(CATEGORY_LABELS)),
+        ID_COLUMN: pd.Series(dtype='int64'),
+        'month': pd.Series(dtype='int32'),
+        'day': pd.Series(dtype='int8'),
+    })
+
+
+def encode(df, timezone=DEFAULT_TIMEZONE):
+    """Convierte un DataFrame de cadenas (p. ej. recién leído del CSV) a la forma compacta.
+
+    Las fechas quedan en hora local de `timezone` y sin zona (ver timestamps.to_local).
+    Un archivo sin columna 'id' (formato anterior) recibe 1..n en el orden del archivo.
+    """
+    if df.empty:
+        return empty_frame()
+    # Categorías que no conocemos (CSV editado a mano) se agregan al diccionario
+    category_values = df['category'].astype(str)
+    extra = set(category_values.unique()) - set(CATEGORY_LABELS)
+    ids = df[ID_COLUMN].astype('int64') if ID_COLUMN in df.columns else np.arange(1, len(df) + 1)
+    encoded = pd.DataFrame({
+        'date': to_local(df['date'], timezone).to_numpy(),
+        'type': pd.Categorical(df['type'], dtype=TYPE_DTYPE),
+        'amount': df['amount'].astype(float),
+        'description': df['description'].astype(str).astype('category'),
+        'category': pd.Categorical(category_values, categories=sorted(set(CATEGORY_LABELS) | extra)),
+        ID_COLUMN: np.asarray(ids, dtype=np.int64),
+    })
+    # Ordenado por fecha (estable) para poder filtrar meses con búsqueda binaria
+    encoded = encoded.sort_values('date', kind='stable', ignore_index=True)
+    return with_derived_columns(encoded)
+
+
+def append(df, new_rows):
+    """Agrega filas al ledger conservando los diccionarios existentes.
+
+    Los códigos ya asignados no cambian; solo se agregan al diccionario las
+    descripciones o categorías nuevas.
+    """
+    new_rows = new_rows[STORED_COLUMNS]
+    # Un ledger que quedó vacío por borrados conserva sus diccionarios: los
+    # índices incrementales (p. ej. el de búsqueda) guardan los códigos viejos
+    if df.empty and df['description'].cat.categories.empty:
+        return encode(new_rows)
+    columns = {
+        ID_COLUMN: new_rows[ID_COLUMN].astype('int64').to_numpy(),
+        'date': pd.to_datetime(new_rows['date']).astype(DATE_DTYPE).to_numpy(),
+        'type': pd.Categorical(new_rows['type'], dtype=TYPE_DTYPE),
+        'amount': new_rows['amount'].astype(float).to_numpy(),
+    }
+    for col in ('description', 'category'):
+        values = new_rows[col].astype(str)
+        missing = [v for v in values.unique() if v not in df[col].cat.categories]
+        if missing:
+            # Se respeta el orden alfabético del diccionario de categorías
+            if col == 'category':
+                df = df.assign(category=df['category'].cat.set_categories(
+                    sorted(set(df['category'].cat.categories) | set(missing))))
+            else:
+                df = df.assign(description=df['description'].cat.add_categories(missing))
+        columns[col] = pd.Categorical(values, dtype=df[col].dtype)
+    new_rows = with_derived_columns(pd.DataFrame(columns))
+    return merge_sorted(df, new_rows)
+
+
+def merge_sorted(df, new_rows):
+    """Inserta new_rows en df manteniendo el orden por fecha sin reordenar todo.
+
+    Cada fila nueva se ubica con búsqueda binaria después de las que tienen la
+    misma fecha (inserción estable). El caso común, fechas de hoy, es un simple
+    concat al final; las fechas atrasadas solo cuestan una copia con take().
+    """
+    new_rows = new_rows.sort_values('date', kind='stable')
+    combined = pd.concat([df, new_rows], ignore_index=True)
+    if df.empty or new_rows['date'].iloc[0] >= df['date'].iloc[-1]:
+        return combined
+    positions = np.searchsorted(df['date'].to_numpy(), new_rows['date'].to_numpy(), side='right')
+    order = np.insert(np.arange(len(df)), positions, np.arange(len(df), len(combined)))
+    return combined.take(order).reset_index(drop=True)
+
+
+def max_id(df):
+    return int(df[ID_COLUMN].max()) if not df.empty else 0
+
+
+def remove_row(df, position):
+    """Ledger sin la fila en `position`; el orden y los diccionarios no cambian"""
+    return df.drop(index=df.index[position]).reset_index(drop=True)
+
+
+def month_slice(df, start_key, end_key=None):
+    """Filas de los meses start_key..end_key (inclusive) con búsqueda binaria.
+
+    Requiere que df esté ordenado por fecha, como lo dejan encode() y append().
+    """
+    if end_key is None:
+        end_key = start_key
+    months = df['month'].to_numpy()
+    lo = np.searchsorted(months, start_key, side='left')
+    hi = np.searchsorted(months, end_key, side='right')
+    return df.iloc[lo:hi]
+
+
+def date_slice(df, start=None, end=None):
+    """Filas con start <= date < end usando búsqueda binaria sobre la fecha"""
+    dates = df['date'].to_numpy()
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 's'), side='left')
+    hi = len(df) if end is None else np.searchsorted(dates, np.datetime64(end, 's'), side='left')
+    return df.iloc[lo:hi]
+
+
+def recent_months(df, count):
+    """Últimos `count` meses distintos con datos, en orden ascendente.
+
+    Recorre hacia atrás con búsqueda binaria, así el costo depende del número
+    de meses pedidos y no del tamaño del historial.
+    """
+    months = df['month'].to_numpy()
+    result = []
+    end = len(months)
+    while end > 0 and len(result) < count:
+        key = months[end - 1]
+        result.append(int(key))
+        end = np.searchsorted(months, key, side='left')
+    return result[::-1]
+
+
+def type_codes(df):
+    return df['type'].cat.codes.to_numpy()
+
+
+def is_income(df):
+    return type_codes(df) == TIPO_INGRESO
+
+
+def is_expense(df):
+    return type_codes(df) == TIPO_GASTO
+
+
+def memory_report(df):
+    """Bytes en memoria por columna (incluye el contenido de las cadenas)"""
+    usage = df.memory_usage(deep=True, index=False)
+    report = {col: int(usage[col]) for col in df.columns}
+    report['total'] = int(usage.sum())
+    return report
+
+
+# Objetos que object_bytes() no recorre: no pertenecen a la estructura medida
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def object_bytes(value):
+    """Estimación de los bytes de una estructura en memoria (índices y agregados del tenant).
+
+    Recorre dicts, listas, tuplas, conjuntos y los atributos de los objetos,
+    contando cada objeto una vez; los arreglos de NumPy y los objetos de
+    pandas se cuentan por sus buffers. Es para el presupuesto de memoria,
+    no una medida exacta.
+    """
+    seen = set()
+    total = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, _SHARED_TYPES):
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += max(sys.getsizeof(item), item.nbytes)
+        elif isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            total += int(np.sum(item.memory_usage(deep=True)))
+        else:
+            total += sys.getsizeof(item)
+            if isinstance(item, dict):
+                pending.extend(item.keys())
+                pending.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                pending.extend(item)
+            elif hasattr(item, '__dict__'):
+                pending.append(vars(item))
+    return total
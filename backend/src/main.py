@@ -1,133 +1,756 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, g, make_response
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from datetime import datetime
+from datetime import datetime, timezone
+import contextlib
+import functools
+import importlib
 import os
 import shutil
 import io
-from scipy.stats import linregress
-import numpy as np
+import threading
+# matplotlib y scipy se importan al usarse por primera vez (ver pyplot() y get_prediction)
 from flask_cors import CORS
-# Importar pytz para manejar zonas horarias
-import pytz
+import ledger
+from cache import CacheEntry, ResponseCache, SingleFlight, strong_etag
+from compression import choose_encoding, compress, is_compressible
+from alerts import AlertState, build_alerts, compare_alerts
+from events import EventBus, diff_alerts, parse_event_id
+from formatting import get_formatter, is_supported_locale
+from arrow_format import ARROW_CODECS, ARROW_STREAM_MIMETYPE, arrow_available, codec_available, iter_ipc_stream
+from serialization import FastJSONProvider, frame_columns, frame_records
+from instrumentation import (
+    PROMETHEUS_CONTENT_TYPE, MetricsRegistry, SpanRecorder, profile_report, span, start_profile,
+    stop_profile,
+)
+from heavy_hitters import EXACT_MAX_ROWS, HabitIndex, exact_top
+import snapshots
+from snapshots import SnapshotStore
+import journal
+from journal import PrimaryKeyIndex
+from pdf_report import render_pdf
+from scheduler import SCHEDULER_ENABLED, Scheduler
+import shared_ledger
+from search import SearchIndex, description_mask, tokenize
+import rollups
+from rollups import LEVELS as GRANULARITIES, RollupCube
+from prefix_sums import PrefixSumIndex, day_numbers, day_str, month_days
+from timestamps import format_stored, has_offsets, local_now, stamp, stamp_many, zone_label
+from ledger import (
+    COLUMNS, ID_COLUMN, STORED_COLUMNS, categorize, current_month_key, is_expense, is_income, month_period, month_slice,
+    month_str,
+)
+from tenants import (
+    DEFAULT_TENANT, TENANT_HEADER, TenantRegistry, TenantPrefixMiddleware,
+    backup_dir, is_valid_tenant_id, stored_tenant_ids, tenant_paths,
+)
 
 app = Flask(__name__)
+# jsonify con orjson si está instalado (mismo formato de salida que el encoder estándar)
+app.json = FastJSONProvider(app)
 CORS(app)
+# Seleccionar tenant también con el prefijo /t/<tenant>/...
+app.wsgi_app = TenantPrefixMiddleware(app.wsgi_app)
+# ?profile=1 devuelve el perfil de cProfile de la petición; solo si se habilita explícitamente
+app.config['PROFILING'] = os.environ.get('FINSIGHT_PROFILING', '0') == '1'
+# Tenants cuyo ledger se carga en memoria al arrancar (p. ej. "default,acme")
+app.config['WARMUP_TENANTS'] = [t for t in os.environ.get('FINSIGHT_WARMUP', '').split(',') if t]
+# Precargar también matplotlib y scipy durante el calentamiento
+app.config['WARMUP_IMPORTS'] = os.environ.get('FINSIGHT_WARMUP_IMPORTS', '0') == '1'
 
-CSV_FILE = 'transactions.csv'
-BACKUP_FILE = 'transactions_backup.csv'
+# Ledgers en memoria de todos los tenants, con expulsión LRU
+tenants = TenantRegistry()
 
-CATEGORIES = {
-    "Transporte": ["uber", "taxi", "gasolina", "bus", "combustible"],
-    "Alimentacion": ["supermercado", "restaurante", "comida", "almuerzo", "cena", "desayuno"],
-    "Entretenimiento": ["cine", "netflix", "spotify", "bar", "juego", "musica"],
-    "Servicios": ["agua", "luz", "internet", "telefono", "electricidad"],
-    "Otros": []
-}
+# Respuestas ya generadas de los endpoints de lectura (ETag / 304)
+response_cache = ResponseCache()
 
-def load_data():
-    if os.path.exists(CSV_FILE):
+# Cálculos de respuestas en curso: las peticiones idénticas simultáneas esperan el mismo
+in_flight = SingleFlight()
+
+# Suscriptores del canal de eventos (/events)
+event_bus = EventBus()
+
+# Métricas de latencia por ruta y por etapa (/metrics)
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    'finsight_request_duration_seconds', 'Duración total de la petición',
+    ('method', 'route', 'status'))
+span_duration = metrics.histogram(
+    'finsight_span_duration_seconds', 'Tiempo exclusivo por etapa de la petición',
+    ('route', 'span'))
+coalesced_requests = metrics.counter(
+    'finsight_coalesced_requests_total', 'Peticiones que esperaron un cálculo idéntico en curso en lugar de repetirlo',
+    ('route',))
+warm_failures = metrics.counter(
+    'finsight_warm_failures_total', 'Respuestas que no se pudieron precalcular al cambiar el día', ('path',))
+
+# Tareas en segundo plano: cambio de mes, precálculo y mantenimiento (/jobs)
+scheduler = Scheduler()
+# Marca de las peticiones internas (tareas y reportes PDF): no cuentan como actividad
+INTERNAL_ENVIRON_KEY = 'finsight.internal'
+# Rutas que se precalculan al cambiar de día (la clave de caché incluye el día)
+WARM_PATHS = ['/alerts', '/analysis', '/reports/monthly-12', '/graphs/bar', '/graphs/line', '/graphs/pie']
+# Respaldos mensuales que se conservan por tenant
+BACKUP_KEEP = int(os.environ.get('FINSIGHT_BACKUP_KEEP', '12'))
+
+@app.before_request
+def start_request_timing():
+    g.spans = SpanRecorder()
+    if not request.environ.get(INTERNAL_ENVIRON_KEY):
+        scheduler.touch()
+        if not scheduler.alive:
+            start_background_tasks()
+
+@app.before_request
+def resolve_tenant():
+    tenant_id = request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+    if not is_valid_tenant_id(tenant_id):
+        return jsonify({"error": "Invalid tenant id"}), 400
+    g.tenant_id = tenant_id
+    # Un solo estado por petición: mientras la petición lo usa no se expulsa (ver TenantRegistry)
+    g.tenant = tenants.checkout(tenant_id)
+
+@app.before_request
+def start_profiling():
+    if not app.config['PROFILING'] or not request.args.get('profile'):
+        return None
+    profiler = start_profile()
+    if profiler is None:
+        return jsonify({"error": "Another request is being profiled"}), 409
+    g.profiler = profiler
+
+@app.after_request
+def record_request_metrics(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        stop_profile(profiler)
+        body, mimetype = profile_report(profiler, request.args.get('profile'))
+        response = app.response_class(body, mimetype=mimetype)
+    recorder = g.get('spans')
+    if recorder is None:
+        return response
+    total = recorder.elapsed()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_duration.observe(total, method=request.method, route=route, status=response.status_code)
+    for name, seconds in recorder.totals.items():
+        span_duration.observe(seconds, route=route, span=name)
+    response.headers['Server-Timing'] = recorder.server_timing(total)
+    response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Comprime las respuestas que no pasan por la caché (las cacheadas guardan su versión comprimida)"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if not is_compressible(response.mimetype, len(body)):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        with span('compress'):
+            response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.teardown_request
+def release_tenant(exc):
+    state = g.pop('tenant', None)
+    if state is not None:
+        tenants.checkin(state)
+
+@app.teardown_request
+def release_profiler(exc):
+    # Si la vista lanzó una excepción after_request no corre: liberar el perfilador aquí
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        stop_profile(profiler)
+
+def current_tenant():
+    return g.tenant
+
+def read_csv(path, timezone):
+    """Ledger del archivo y si conviene reescribirlo en el formato actual (ver job_compact)"""
+    if os.path.exists(path):
         try:
-            df = pd.read_csv(CSV_FILE)
-            # Asegurar que 'date' se lee como datetime
-            df['date'] = pd.to_datetime(df['date']) 
-            return df
+            with span('parse'):
+                df = pd.read_csv(path)
+                # Fechas como datetime64[s] y columnas de texto como códigos (ver ledger.py)
+                return ledger.encode(df, timezone), not has_offsets(df['date']) or ID_COLUMN not in df.columns
         except Exception:
-            return pd.DataFrame(columns=['date', 'type', 'amount', 'description', 'category'])
-    return pd.DataFrame(columns=['date', 'type', 'amount', 'description', 'category'])
+            return ledger.empty_frame(), False
+    return ledger.empty_frame(), False
 
-def save_data(df):
-    df.to_csv(CSV_FILE, index=False)
-    shutil.copy(CSV_FILE, BACKUP_FILE)
+def load_data():
+    state = current_tenant()
+    with span('load'), state.lock:
+        # Solo se vuelve a leer el CSV si cambió en disco (o fue expulsado de memoria)
+        signature = state.disk_signature()
+        if state.df is None or signature != state.signature:
+            state.set_frame(read_ledger(state, signature), signature)
+            tenants.account(state.tenant_id)
+        # Copia superficial: las rutas pueden agregar columnas sin tocar la caché
+        return state.df.copy(deep=False)
 
-def categorize(description):
-    desc_lower = description.lower()
-    for cat, keywords in CATEGORIES.items():
-        if any(kw in desc_lower for kw in keywords):
-            return cat
-    return "Otros"
+def read_ledger(state, signature):
+    """Ledger del tenant: la versión compartida si otro proceso ya la publicó, si no el CSV y el journal"""
+    if shared_ledger.ENABLED:
+        df, info = shared_ledger.attach(state.tenant_id, signature)
+        if df is not None:
+            state.next_id, state.needs_compaction = info['next_id'], info['needs_compaction']
+            return df
+    df, state.needs_compaction = read_csv(state.csv_file, state.timezone)
+    # Cambios de PUT/DELETE que todavía no se compactaron en el archivo
+    records = journal.read_records(state.journal_file)
+    df = journal.replay(df, records, state.timezone)
+    state.needs_compaction = state.needs_compaction or journal.pending(records)
+    state.next_id = max(ledger.max_id(df), journal.max_id(records)) + 1
+    return share_frame(state, df, signature)
 
-# Función de ayuda para formatear moneda: $#,###.##
-def format_currency(amount):
-    """Formatea un número a la cadena de moneda $#,###.##"""
-    return f"${amount:,.2f}"
+def share_frame(state, df, signature):
+    """Publica el ledger para los demás procesos y devuelve la versión mapeada.
 
-@app.route('/transaction', methods=['POST'])
-def add_transaction():
-    data = request.json
+    Sin FINSIGHT_SHARED_LEDGER (o si no se pudo escribir) devuelve df tal cual.
+    """
+    if not shared_ledger.ENABLED or df.empty:
+        return df
+    try:
+        with span('share'):
+            return shared_ledger.publish(state.tenant_id, df, signature,
+                                         next_id=state.next_id, needs_compaction=state.needs_compaction)
+    except OSError:
+        return df
+
+def save_data(df, new_rows=None):
+    """Guarda el ledger; con new_rows los índices se actualizan de forma incremental"""
+    state = current_tenant()
+    with span('store'), state.lock:
+        write_csv(state, df)
+        signature = state.disk_signature()
+        state.set_frame(share_frame(state, df, signature), signature, rows=new_rows)
+        tenants.account(state.tenant_id)
+
+def write_csv(state, df):
+    """Escribe el ledger completo en el archivo del tenant, copia el respaldo y vacía el journal"""
+    os.makedirs(os.path.dirname(state.csv_file) or '.', exist_ok=True)
+    # En disco solo las columnas originales; month/day se derivan al cargar.
+    # Las fechas se guardan con su offset para no depender de la zona del servidor
+    df[STORED_COLUMNS].assign(date=format_stored(df['date'], state.timezone)).to_csv(state.csv_file, index=False)
+    shutil.copy(state.csv_file, state.backup_file)
+    # El archivo ya incluye los cambios del journal; solo se conserva el último id si fue borrado
+    last_id = state.next_id - 1
+    journal.reset(state.journal_file, last_id if last_id > ledger.max_id(df) else 0)
+    state.needs_compaction = False
+
+def tenant_aggregate(name, compute):
+    """Agregado cacheado por tenant; se recalcula solo cuando cambia el ledger"""
+    state = current_tenant()
+    with state.lock:
+        df = load_data()
+        if name not in state.aggregates:
+            state.aggregates[name] = compute(df)
+            state.account_derived()
+            tenants.account(state.tenant_id)
+        return state.aggregates[name]
+
+def cached_response(view):
+    """Cachea la respuesta de un endpoint de lectura y responde 304 si no cambió.
+
+    La clave incluye tenant, ruta, parámetros, versión del ledger y el día
+    actual: los reportes dependen de datetime.now() (mes actual y, en las
+    alertas, días transcurridos del mes).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Un perfil debe medir el cálculo completo, no una respuesta cacheada; un stream
+        # Arrow se envía por batches y guardarlo obligaría a tenerlo completo en memoria
+        if g.get('profiler') is not None or wants_arrow():
+            with span('aggregate'):
+                return view(*args, **kwargs)
+        state = current_tenant()
+        load_data()  # asegura que state.version corresponde al archivo en disco
+        today = datetime.now().date()
+        key = (g.tenant_id, request.path, tuple(sorted(request.args.items(multi=True))),
+               state.version, today.isoformat())
+        with span('cache'):
+            entry = response_cache.get(key)
+
+        def compute():
+            with span('aggregate'):
+                response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return None, response
+            response.direct_passthrough = False
+            body = response.get_data()
+            # Última modificación: el archivo o el inicio del día (por datetime.now())
+            start_of_day = datetime.combine(today, datetime.min.time()).astimezone(timezone.utc)
+            mtimes = [signature[0] for signature in state.signature or () if signature]
+            modified = datetime.fromtimestamp(max(mtimes) / 1e9, timezone.utc) if mtimes else start_of_day
+            with span('cache'):
+                return response_cache.put(key, CacheEntry(
+                    body, response.mimetype, strong_etag(body), max(modified, start_of_day).replace(microsecond=0))), None
+
+        if entry is None:
+            # Peticiones idénticas simultáneas (varias pestañas, recarga después de un POST) esperan un solo cálculo
+            with span('coalesce'):
+                (entry, response), shared = in_flight.do(key, compute)
+            if shared:
+                coalesced_requests.inc(route=request.path)
+                if entry is None:
+                    # El cálculo compartido terminó con error: cada petición arma su propia respuesta
+                    entry, response = compute()
+            if entry is None:
+                return response
+        body, etag, encoding = entry.body, entry.etag, None
+        if is_compressible(entry.mimetype, len(entry.body)):
+            encoding = choose_encoding(request.accept_encodings)
+        if encoding is not None:
+            # Se comprime una vez por codificación y se reutiliza en los siguientes hits
+            body = entry.encoded.get(encoding)
+            if body is None:
+                with span('compress'):
+                    body = response_cache.add_encoding(key, entry, encoding, compress(entry.body, encoding))
+            etag = f"{entry.etag}-{encoding}"
+        response = app.response_class(body, mimetype=entry.mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.last_modified = entry.last_modified
+        # El navegador puede guardar la respuesta pero debe revalidarla siempre
+        response.cache_control.no_cache = True
+        response.vary.add(TENANT_HEADER)
+        response.vary.add('Accept')
+        response.vary.add('Accept-Encoding')
+        return response.make_conditional(request)
+    return wrapper
+
+def tenant_index(name, build):
+    """Índice incremental del tenant; se construye con build(df) la primera vez"""
+    state = current_tenant()
+    with state.lock:
+        df = load_data()
+        if name not in state.indexes:
+            state.indexes[name] = build(df)
+            # El presupuesto de memoria incluye los índices (ver TenantState.account_derived)
+            state.account_derived()
+            tenants.account(state.tenant_id)
+        return state.indexes[name], df
+
+def snapshot_store():
+    """Snapshots de meses cerrados del tenant; congela los meses que se cerraron desde el último uso.
+
+    Debe llamarse con state.lock tomado y usarse dentro del mismo bloque.
+    """
+    store, df = tenant_index('snapshots', SnapshotStore.from_frame)
+    store.rollover(df)
+    return store, df
+
+def materialized_alerts(formatter=None):
+    state = current_tenant()
+    with state.lock:
+        alert_state, df = tenant_index('alerts', AlertState.from_frame)
+        return alert_state.alerts(df, formatter=formatter)
+
+@functools.cache
+def pyplot():
+    """matplotlib (backend Agg, sin pantalla) se carga con la primera gráfica"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def json_response(payload):
+    with span('serialize'):
+        return jsonify(payload)
+
+def wants_arrow():
+    """El cliente pidió Arrow con ?format=arrow o con la cabecera Accept"""
+    if request.args.get('format') == 'arrow':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', ARROW_STREAM_MIMETYPE])
+    return best == ARROW_STREAM_MIMETYPE
+
+def arrow_response(table, metadata=None):
+    """Stream Arrow IPC con las columnas de table, enviado por batches (opcionalmente comprimido con ?compression=)"""
+    if not arrow_available():
+        return jsonify({"error": "Arrow format requires pyarrow on the server"}), 406
+    codec = request.args.get('compression')
+    if codec is not None and codec not in ARROW_CODECS:
+        return jsonify({"error": f"Invalid compression: must be one of {', '.join(ARROW_CODECS)}"}), 400
+    if not codec_available(codec):
+        return jsonify({"error": f"Compression codec not available: {codec}"}), 406
+    with span('serialize'):
+        chunks = iter_ipc_stream(table, metadata, codec)
+    response = Response(chunks, mimetype=ARROW_STREAM_MIMETYPE)
+    response.vary.add(TENANT_HEADER)
+    response.vary.add('Accept')
+    return response
+
+def expenses_by_month(df):
+    return df[is_expense(df)].groupby('month')['amount'].sum()
+
+def parse_transaction(data):
+    """Valida una transacción del body; devuelve (campos, None) o (None, mensaje de error)"""
     required_fields = ['type', 'amount', 'description', 'date']
-    if not all(field in data for field in required_fields):
-        return jsonify({"error": "Missing required fields"}), 400
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
+        return None, "Missing required fields"
     
     transaction_type = data['type']
     if transaction_type not in ['ingreso', 'gasto']:
-        return jsonify({"error": "Invalid type: must be 'ingreso' or 'gasto'"}), 400
+        return None, "Invalid type: must be 'ingreso' or 'gasto'"
     
     try:
         amount = float(data['amount'])
         if amount <= 0:
-            return jsonify({"error": "Amount must be positive"}), 400
-    except ValueError:
-        return jsonify({"error": "Invalid amount format"}), 400
-    
-    try:
-        # Se sigue esperando YYYY-MM-DD para la fecha de la transacción
-        input_date = data['date']
-    except ValueError:
-        return jsonify({"error": "Invalid date format, use YYYY-MM-DD"}), 400
+            return None, "Amount must be positive"
+    except (TypeError, ValueError):
+        # TypeError: null, listas u objetos en lugar de un número
+        return None, "Invalid amount format"
     
     description = data['description']
+    if not isinstance(description, str):
+        return None, "Invalid description format"
     
     if transaction_type == 'gasto':
         category = categorize(description)
     else:
         category = 'Ingreso'
     
-    # === CAMBIO: OBTENER FECHA Y HORA DE GUATEMALA (UTC-6) ===
-    tz_guatemala = pytz.timezone('America/Guatemala')
-    # Combinar la fecha del input con la hora actual de Guatemala
-    now_gt = datetime.now(tz_guatemala)
-    # Crear el objeto datetime con la fecha del input y la hora actual de Guatemala
-    date_with_time = pd.to_datetime(f"{input_date} {now_gt.strftime('%H:%M:%S')}", format='%Y-%m-%d %H:%M:%S', errors='coerce')
-    
-    if pd.isna(date_with_time):
-        return jsonify({"error": "Invalid date format or combination with current time"}), 400
-    
-    df = load_data()
-    new_row = pd.DataFrame({
-        'date': [date_with_time], # Usar el datetime con hora de Guatemala
-        'type': [transaction_type],
-        'amount': [amount],
-        'description': [description],
-        'category': [category]
-    })
-    df = pd.concat([df, new_row], ignore_index=True)
-    save_data(df)
-    return jsonify({"message": f"Transaction added successfully with Guatemala time ({now_gt.strftime('%H:%M:%S')})"}), 201
+    # Se sigue esperando YYYY-MM-DD para la fecha de la transacción
+    return {'date': data['date'], 'type': transaction_type, 'amount': amount,
+            'description': description, 'category': category}, None
+
+@app.route('/transaction', methods=['POST'])
+def add_transaction():
+    """Agrega una transacción, o varias si el body es una lista.
+
+    La fecha del input se combina con la hora actual en la zona del tenant
+    (ver timestamps.py); con una lista todas las fechas se resuelven juntas.
+    """
+    data = request.json
+    state = current_tenant()
+    now = local_now(state.timezone)
+    if isinstance(data, list):
+        if not data:
+            return jsonify({"error": "Missing required fields"}), 400
+        fields = []
+        for position, item in enumerate(data):
+            parsed, error = parse_transaction(item)
+            if error is not None:
+                return jsonify({"error": error, "index": position}), 400
+            fields.append(parsed)
+        new_rows = pd.DataFrame(fields, columns=COLUMNS)
+        dates = stamp_many(new_rows['date'], now)
+        invalid = pd.isna(dates)
+        if invalid.any():
+            return jsonify({"error": "Invalid date format or combination with current time",
+                            "index": int(invalid.argmax())}), 400
+        new_rows['date'] = dates
+    else:
+        parsed, error = parse_transaction(data)
+        if error is not None:
+            return jsonify({"error": error}), 400
+        # Fecha del input con la hora actual de la zona, sin pasar por cadenas
+        date_with_time = stamp(parsed['date'], now)
+        if date_with_time is None:
+            return jsonify({"error": "Invalid date format or combination with current time"}), 400
+        new_rows = pd.DataFrame([dict(parsed, date=date_with_time)], columns=COLUMNS)
+    # Leer-modificar-escribir bajo el lock del tenant para no perder inserciones concurrentes
+    with state.lock:
+        previous_df = load_data()
+        new_rows.insert(0, ID_COLUMN, range(state.next_id, state.next_id + len(new_rows)))
+        state.next_id += len(new_rows)
+        with span('aggregate'):
+            df = ledger.append(previous_df, new_rows)
+        save_data(df, new_rows=new_rows)
+        with span('publish'):
+            publish_changes(previous_df, df, new_rows)
+    local_time = f"{zone_label(state.timezone)} time ({now.strftime('%H:%M:%S')})"
+    if isinstance(data, list):
+        return jsonify({"message": f"{len(new_rows)} transactions added successfully with {local_time}",
+                        "count": len(new_rows), "ids": new_rows[ID_COLUMN].tolist()}), 201
+    return jsonify({"message": f"Transaction added successfully with {local_time}",
+                    "id": int(new_rows[ID_COLUMN].iloc[0])}), 201
+
+def parse_update(data, current):
+    """Campos de la transacción después de aplicar el body de PUT sobre la fila actual.
+
+    Los campos que faltan conservan su valor; la categoría se recalcula. Una
+    fecha nueva conserva la hora del día de la transacción.
+    """
+    if not isinstance(data, dict) or not any(field in data for field in ('type', 'amount', 'description', 'date')):
+        return None, "Missing fields to update"
+    date = pd.Timestamp(current['date'])
+    merged = {'type': current['type'], 'amount': current['amount'], 'description': current['description'],
+              'date': date.strftime('%Y-%m-%d')}
+    merged.update((field, data[field]) for field in merged if field in data)
+    fields, error = parse_transaction(merged)
+    if error is not None:
+        return None, error
+    fields['date'] = stamp(fields['date'], date)
+    if fields['date'] is None:
+        return None, "Invalid date format"
+    return fields, None
+
+def transaction_position(transaction_id):
+    """(df, posición de la fila) buscando por id; la posición es None si no existe"""
+    index, df = tenant_index('ids', PrimaryKeyIndex.from_frame)
+    return df, index.position(df, transaction_id)
+
+@app.route('/transaction/<int:transaction_id>', methods=['PUT'])
+def update_transaction(transaction_id):
+    """Corrige una transacción; los campos del body reemplazan a los actuales.
+
+    El archivo no se reescribe: el cambio se agrega al journal del tenant y
+    la tarea compact lo incorpora al archivo más tarde (ver journal.py). El
+    ledger en memoria sí se copia (sin la fila y con la nueva en su lugar) y
+    se vuelve a publicar completo para los demás procesos: O(n) por cambio.
+    """
+    data = request.json
+    state = current_tenant()
+    with state.lock:
+        previous_df, position = transaction_position(transaction_id)
+        if position is None:
+            return jsonify({"error": "Transaction not found"}), 404
+        removed = journal.row_frame(previous_df, position)
+        fields, error = parse_update(data, removed.iloc[0])
+        if error is not None:
+            return jsonify({"error": error}), 400
+        rows = pd.DataFrame([dict(fields, id=transaction_id)], columns=STORED_COLUMNS)
+        with span('store'):
+            journal.append_record(state.journal_file, journal.UPDATE, transaction_id,
+                                  dict(fields, date=format_stored(rows['date'], state.timezone).iloc[0]))
+        state.needs_compaction = True
+        with span('aggregate'):
+            df = ledger.append(ledger.remove_row(previous_df, position), rows)
+            signature = state.disk_signature()
+            df = share_frame(state, df, signature)
+            state.set_frame(df, signature, rows=rows, removed=removed)
+        tenants.account(state.tenant_id)
+        with span('publish'):
+            publish_changes(previous_df, df, rows, removed=removed)
+    return jsonify({"message": "Transaction updated successfully",
+                    "transaction": frame_records(rows, STORED_COLUMNS)[0]}), 200
+
+@app.route('/transaction/<int:transaction_id>', methods=['DELETE'])
+def delete_transaction(transaction_id):
+    """Borra una transacción: un tombstone en el journal (ver update_transaction)"""
+    state = current_tenant()
+    with state.lock:
+        previous_df, position = transaction_position(transaction_id)
+        if position is None:
+            return jsonify({"error": "Transaction not found"}), 404
+        removed = journal.row_frame(previous_df, position)
+        with span('store'):
+            journal.append_record(state.journal_file, journal.DELETE, transaction_id)
+        state.needs_compaction = True
+        with span('aggregate'):
+            df = ledger.remove_row(previous_df, position)
+            signature = state.disk_signature()
+            df = share_frame(state, df, signature)
+            state.set_frame(df, signature, removed=removed)
+        tenants.account(state.tenant_id)
+        with span('publish'):
+            publish_changes(previous_df, df, removed.iloc[:0], removed=removed)
+    return jsonify({"message": "Transaction deleted successfully", "id": transaction_id}), 200
+
+def month_summary(df, key):
+    """Ingresos, gastos, ahorro y categoría principal de un mes"""
+    month_df = month_slice(df, key)
+    expenses = month_df[is_expense(month_df)]
+    income = month_df[is_income(month_df)]['amount'].sum()
+    expense = expenses['amount'].sum()
+    by_category = expenses.groupby('category', observed=True)['amount'].sum()
+    return {
+        "month": month_str(key),
+        "income": round(income, 2),
+        "expense": round(expense, 2),
+        "savings": round(income - expense, 2),
+        "top_category": by_category.idxmax() if not by_category.empty else None,
+    }
+
+def publish_changes(previous_df, df, rows, removed=None):
+    """Envía a los suscriptores de /events lo que cambió con las transacciones nuevas, corregidas o borradas"""
+    state = current_tenant()
+    if not event_bus.has_subscribers(state.tenant_id):
+        return
+    event = 'transaction' if removed is None else 'transaction_updated'
+    # Mismos registros que /transactions: columnas en orden y fechas ya formateadas
+    for row in frame_records(rows, STORED_COLUMNS):
+        event_bus.publish(state.tenant_id, event, row, event_id=state.version)
+    dates = rows['date']
+    if removed is not None:
+        if rows.empty:
+            for transaction_id in removed[ID_COLUMN].tolist():
+                event_bus.publish(state.tenant_id, 'transaction_deleted', {"id": transaction_id},
+                                  event_id=state.version)
+        dates = pd.concat([dates, removed['date']])
+    for key in sorted(set(ledger.month_key(dates).tolist())):
+        event_bus.publish(state.tenant_id, 'monthly', month_summary(df, key), event_id=state.version)
+    # Las alertas publicadas antes sirven de base; la primera vez se parte del ledger anterior
+    current = materialized_alerts()['alerts'] if not df.empty else []
+    previous = event_bus.swap_alerts(state.tenant_id, current)
+    if previous is None:
+        previous = build_alerts(previous_df)['alerts'] if not previous_df.empty else []
+    raised, cleared = diff_alerts(previous, current)
+    if raised or cleared:
+        event_bus.publish(state.tenant_id, 'alerts', {"raised": raised, "cleared": cleared},
+                          event_id=state.version)
+
+@app.route('/events', methods=['GET'])
+def get_events():
+    """Canal Server-Sent Events con los cambios del ledger del tenant"""
+    tenant_id = g.tenant_id
+    load_data()  # state.version del archivo en disco, para comparar con Last-Event-ID
+    q, backlog = event_bus.subscribe(tenant_id, current_tenant().version,
+                                     parse_event_id(request.headers.get('Last-Event-ID')))
+    response = Response(event_bus.stream(tenant_id, q, backlog), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-# ... [Otras funciones como get_transactions, get_analysis, get_prediction permanecen igual]
 
 @app.route('/transactions', methods=['GET'])
+@cached_response
 def get_transactions():
+    orient = request.args.get('orient', 'records')
+    if orient not in ('records', 'columns'):
+        return jsonify({"error": "Invalid orient: must be 'records' or 'columns'"}), 400
     df = load_data()
+    if wants_arrow():
+        return arrow_response(df[STORED_COLUMNS])
+    # orient=columns: {columna: [valores]}, sin construir un diccionario por fila
+    if orient == 'columns':
+        return json_response(frame_columns(df, STORED_COLUMNS))
     if df.empty:
         return jsonify([]), 200
-    # Convertir a lista de diccionarios para JSON
-    transactions = df.to_dict('records')
-    return jsonify(transactions)
+    # Convertir a lista de diccionarios para JSON (columna por columna, ver serialization.py)
+    transactions = frame_records(df, STORED_COLUMNS)
+    return json_response(transactions)
+
+@app.route('/transactions/search', methods=['GET'])
+@cached_response
+def search_transactions():
+    """Transacciones cuya descripción coincide con ?q=, opcionalmente filtradas por fecha, categoría y tipo"""
+    query = request.args.get('q', '')
+    if not tokenize(query):
+        return jsonify({"error": "Missing search query"}), 400
+    mode = request.args.get('mode', 'substring')
+    if mode not in ('substring', 'prefix', 'token'):
+        return jsonify({"error": "Invalid mode: must be 'substring', 'prefix' or 'token'"}), 400
+    try:
+        start = parse_range_bound(request.args.get('from'))
+        end = parse_range_bound(request.args.get('to'), end=True)
+    except ValueError:
+        return jsonify({"error": "Invalid date format, use YYYY-MM-DD or YYYY-MM"}), 400
+    limit = request.args.get('limit')
+    if limit is not None and (not limit.isdigit() or int(limit) == 0):
+        return jsonify({"error": "Invalid limit: must be a positive integer"}), 400
+    transaction_type = request.args.get('type')
+    if transaction_type is not None and transaction_type not in ('ingreso', 'gasto'):
+        return jsonify({"error": "Invalid type: must be 'ingreso' or 'gasto'"}), 400
+    state = current_tenant()
+    with state.lock:
+        index, df = tenant_index('search', SearchIndex.from_frame)
+        codes = index.match(query, mode)
+    # El rango de fechas se resuelve con búsqueda binaria; el resto compara códigos enteros
+    df = ledger.date_slice(df, None if start is None else day_str(start),
+                           None if end is None else day_str(end + 1))
+    mask = description_mask(df, codes)
+    category = request.args.get('category')
+    if category is not None:
+        categories = df['category'].cat.categories
+        mask &= df['category'].cat.codes.to_numpy() == (categories.get_loc(category) if category in categories else -2)
+    if transaction_type is not None:
+        mask &= ledger.type_codes(df) == ledger.TYPE_LABELS.index(transaction_type)
+    result = df[mask]
+    if limit is not None:
+        # Las más recientes
+        result = result.iloc[max(len(result) - int(limit), 0):]
+    if wants_arrow():
+        return arrow_response(result[STORED_COLUMNS])
+    return json_response(frame_records(result, STORED_COLUMNS))
+
+def parse_range_bound(value, end=False):
+    """Día (desde 1970-01-01) de un límite de ?from=/?to=: YYYY-MM-DD o YYYY-MM (mes completo)"""
+    if value is None:
+        return None
+    for fmt in ('%Y-%m-%d', '%Y-%m'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == '%Y-%m':
+            return month_days(ledger.month_key(parsed))[1 if end else 0]
+        return int(day_numbers([parsed])[0])
+    raise ValueError(value)
+
+def range_analysis(start, end):
+    """Análisis de un rango de fechas con las sumas acumuladas del tenant (sin recorrer filas)"""
+    state = current_tenant()
+    with state.lock:
+        index, df = tenant_index('prefix_sums', PrefixSumIndex.from_frame)
+        if df.empty:
+            return jsonify({"error": "No data available"}), 404
+        analysis = index.summary(start, end)
+    analysis["from"] = None if start is None else day_str(start)
+    analysis["to"] = None if end is None else day_str(end)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame([analysis]))
+    return json_response(analysis)
+
+def rollup_cube():
+    """Cubo de totales por día/semana/mes/trimestre/año del tenant (debe llamarse con state.lock)"""
+    return tenant_index('rollups', RollupCube.from_frame)
+
+def invalid_granularity(granularity):
+    """Respuesta 400 si ?granularity= no es uno de los niveles; None si es válido o no se indicó"""
+    if granularity is None or granularity in GRANULARITIES:
+        return None
+    return jsonify({"error": f"Invalid granularity: must be one of {', '.join(GRANULARITIES)}"}), 400
+
+def period_analysis(granularity, start, end):
+    """Totales por período del nivel pedido, recortados a from/to, desde el cubo de rollups"""
+    state = current_tenant()
+    with state.lock:
+        cube, df = rollup_cube()
+        if df.empty:
+            return jsonify({"error": "No data available"}), 404
+        periods = cube.summary(granularity, start, end)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame(periods), metadata={'granularity': granularity})
+    return json_response({
+        "granularity": granularity,
+        "from": None if start is None else day_str(start),
+        "to": None if end is None else day_str(end),
+        "periods": periods,
+    })
 
 @app.route('/analysis', methods=['GET'])
+@cached_response
 def get_analysis():
+    granularity = request.args.get('granularity')
+    error = invalid_granularity(granularity)
+    if error is not None:
+        return error
+    if 'from' in request.args or 'to' in request.args or granularity is not None:
+        try:
+            start = parse_range_bound(request.args.get('from'))
+            end = parse_range_bound(request.args.get('to'), end=True)
+        except ValueError:
+            return jsonify({"error": "Invalid date format, use YYYY-MM-DD or YYYY-MM"}), 400
+        if start is not None and end is not None and start > end:
+            return jsonify({"error": "'from' must not be after 'to'"}), 400
+        if granularity is not None:
+            return period_analysis(granularity, start, end)
+        return range_analysis(start, end)
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    df['month'] = df['date'].dt.to_period('M')
-    
-    total_income = df[df['type'] == 'ingreso']['amount'].sum()
-    total_expense = df[df['type'] == 'gasto']['amount'].sum()
+    total_income = df[is_income(df)]['amount'].sum()
+    total_expense = df[is_expense(df)]['amount'].sum()
     net_gain = total_income - total_expense
     
     unique_months = df['month'].nunique()
@@ -136,17 +759,19 @@ def get_analysis():
     
     unspent_percentage = ((total_income - total_expense) / total_income * 100) if total_income > 0 else 0
     
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
+    current_month = current_month_key()
     prev_month = current_month - 1
     
-    current_expenses = df[(df['type'] == 'gasto') & (df['month'] == current_month)]['amount'].sum()
-    prev_expenses = df[(df['type'] == 'gasto') & (df['month'] == prev_month)]['amount'].sum()
+    current_df = month_slice(df, current_month)
+    prev_df = month_slice(df, prev_month)
+    current_expenses = current_df[is_expense(current_df)]['amount'].sum()
+    prev_expenses = prev_df[is_expense(prev_df)]['amount'].sum()
     expense_comparison = "aumentado" if current_expenses > prev_expenses else "disminuido"
     
-    current_month_expenses = df[(df['type'] == 'gasto') & (df['month'] == current_month)]
-    top_category = current_month_expenses.groupby('category')['amount'].sum().idxmax() if not current_month_expenses.empty else None
+    current_month_expenses = current_df[is_expense(current_df)]
+    top_category = current_month_expenses.groupby('category', observed=True)['amount'].sum().idxmax() if not current_month_expenses.empty else None
     
-    current_month_days = current_month_expenses.groupby(current_month_expenses['date'].dt.day)['amount'].sum()
+    current_month_days = current_month_expenses.groupby('day')['amount'].sum()
     top_days = current_month_days.nlargest(3).index.tolist() if not current_month_days.empty else []
     
     analysis = {
@@ -160,16 +785,18 @@ def get_analysis():
         "top_category": top_category,
         "top_days": top_days
     }
-    return jsonify(analysis)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame([analysis]))
+    return json_response(analysis)
 
 @app.route('/prediction', methods=['GET'])
+@cached_response
 def get_prediction():
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    df['month'] = df['date'].dt.to_period('M')
-    expense_monthly = df[df['type'] == 'gasto'].groupby('month')['amount'].sum().reset_index()
+    expense_monthly = tenant_aggregate('expenses_by_month', expenses_by_month).reset_index()
     expense_monthly['month_num'] = range(1, len(expense_monthly) + 1)
     
     if len(expense_monthly) < 3:
@@ -179,49 +806,51 @@ def get_prediction():
     x = last_three['month_num'].values
     y = last_three['amount'].values
     
+    from scipy.stats import linregress
     slope, intercept, _, _, _ = linregress(x, y)
     next_month_pred = slope * (x[-1] + 1) + intercept
     
-    return jsonify({"predicted_expense": next_month_pred})
+    return json_response({"predicted_expense": next_month_pred})
 
 # Agregar este nuevo endpoint después de /reports/monthly
 
 @app.route('/reports/monthly-12', methods=['GET'])
+@cached_response
 def get_monthly_12_report():
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
     # Obtener el mes actual
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
+    current_month = current_month_key()
     
     # Calcular el mes de hace 12 meses
     start_month = current_month - 11
     
-    # Filtrar datos de los últimos 12 meses
-    df['month'] = df['date'].dt.to_period('M')
-    df_12_months = df[(df['month'] >= start_month) & (df['month'] <= current_month)]
+    # Meses cerrados desde los snapshots; solo el mes abierto se calcula sobre las filas
+    state = current_tenant()
+    with state.lock:
+        store, df = snapshot_store()
+        month_snapshots = [store.month(df, start_month + i) for i in range(12)]
     
     # Crear datos mensuales
     monthly_data = []
     total_income = 0
     total_expense = 0
     
-    for i in range(12):
-        month_period = start_month + i
-        month_df = df_12_months[df_12_months['month'] == month_period]
+    for snapshot in month_snapshots:
+        month_label = month_period(snapshot.month)
         
-        income = month_df[month_df['type'] == 'ingreso']['amount'].sum()
-        expense = month_df[month_df['type'] == 'gasto']['amount'].sum()
+        income = snapshot.income
+        expense = snapshot.expense
         savings = income - expense
         
-        # Encontrar categoría con más gasto
-        expenses_by_cat = month_df[month_df['type'] == 'gasto'].groupby('category')['amount'].sum()
-        top_category = expenses_by_cat.idxmax() if not expenses_by_cat.empty else 'N/A'
+        # Categoría con más gasto
+        top_category = snapshot.top_category or 'N/A'
         
         monthly_data.append({
-            'month': month_period.strftime('%B'),
-            'year': month_period.year,
+            'month': month_label.strftime('%B'),
+            'year': month_label.year,
             'income': round(income, 2),
             'expense': round(expense, 2),
             'savings': round(savings, 2),
@@ -244,7 +873,7 @@ def get_monthly_12_report():
     worst_month = min(monthly_data, key=lambda x: x['savings']) if monthly_data else None
     
     # Categoría con más gasto en todo el período
-    all_expenses = df_12_months[df_12_months['type'] == 'gasto'].groupby('category')['amount'].sum()
+    all_expenses = snapshots.expenses_by_category(month_snapshots)
     top_category_overall = all_expenses.idxmax() if not all_expenses.empty else 'N/A'
     top_category_amount = all_expenses.max() if not all_expenses.empty else 0
     
@@ -272,337 +901,60 @@ def get_monthly_12_report():
             'top_category_amount': round(top_category_amount, 2)
         },
         'period': {
-            'start': start_month.strftime('%B %Y'),
-            'end': current_month.strftime('%B %Y')
+            'start': month_period(start_month).strftime('%B %Y'),
+            'end': month_period(current_month).strftime('%B %Y')
         }
     }
     
-    return jsonify(report)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame(monthly_data),
+                              metadata={'summary': report['summary'], 'period': report['period']})
+    return json_response(report)
 
 @app.route('/alerts', methods=['GET'])
+@cached_response
 def get_alerts():
+    # Idioma y formato de los mensajes (por defecto FINSIGHT_LOCALE)
+    locale = request.args.get('locale')
+    if locale is not None and not is_supported_locale(locale):
+        return jsonify({"error": f"Unsupported locale: {locale}"}), 400
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
-    
-    df['month'] = df['date'].dt.to_period('M')
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
-    
-    # Definir ventana de análisis: últimos 3 meses incluyendo el actual
-    all_months = sorted(df['month'].unique())
-    if len(all_months) >= 3:
-        analysis_months = all_months[-3:]
-    else:
-        analysis_months = all_months
-    
-    # Filtrar datos para la ventana de análisis
-    df_analysis = df[df['month'].isin(analysis_months)]
-    
-    # Datos históricos (antes de la ventana de análisis)
-    df_historical = df[df['month'] < analysis_months[0]]
-    
-    alerts = []
-    
-    # 1. ALERTA: Gasto elevado por categoría vs promedio histórico de últimos 3 meses
-    if len(analysis_months) >= 2:
-        # Comparar mes actual vs promedio de 2 meses anteriores en la ventana
-        previous_months = [m for m in analysis_months if m < current_month]
-        
-        if previous_months:
-            prev_avg = df[df['month'].isin(previous_months) & (df['type'] == 'gasto')].groupby('category')['amount'].mean()
-            current = df[(df['type'] == 'gasto') & (df['month'] == current_month)].groupby('category')['amount'].sum()
-            
-            for cat in current.index:
-                if cat in prev_avg.index and current[cat] > prev_avg[cat] * 1.5:
-                    increase_pct = ((current[cat] - prev_avg[cat]) / prev_avg[cat]) * 100
-                    months_str = ', '.join([m.strftime('%b %Y') for m in previous_months])
-                    
-                    current_amount_str = format_currency(current[cat])
-                    average_amount_str = format_currency(prev_avg[cat])
-                    
-                    alerts.append({
-                        "type": "gasto_elevado_categoria",
-                        "severity": "alta",
-                        "category": cat,
-                        "current_amount": round(current[cat], 2),
-                        "average_amount": round(prev_avg[cat], 2),
-                        "increase_percentage": round(increase_pct, 1),
-                        "message": f"⚠️ Gasto elevado en {cat}: {current_amount_str} este mes vs promedio de {average_amount_str} ({months_str}). Aumento del {increase_pct:.1f}%"
-                    })
-    
-    # 2. ALERTA: Déficit mensual en el mes actual
-    current_income = df[(df['type'] == 'ingreso') & (df['month'] == current_month)]['amount'].sum()
-    current_expense = df[(df['type'] == 'gasto') & (df['month'] == current_month)]['amount'].sum()
-    
-    if current_expense > current_income and current_income > 0:
-        deficit = current_expense - current_income
-        deficit_pct = (deficit / current_income) * 100
-        
-        current_income_str = format_currency(current_income)
-        current_expense_str = format_currency(current_expense)
-        deficit_str = format_currency(deficit)
-        
-        alerts.append({
-            "type": "deficit_mensual",
-            "severity": "critica",
-            "income": round(current_income, 2),
-            "expense": round(current_expense, 2),
-            "deficit": round(deficit, 2),
-            "deficit_percentage": round(deficit_pct, 1),
-            "message": f"🚨 DÉFICIT: Gastos ({current_expense_str}) superan ingresos ({current_income_str}) por {deficit_str} ({deficit_pct:.1f}% extra)"
-        })
-    
-    # 3. ALERTA: Tasa de ahorro baja en últimos 3 meses
-    total_income_period = df_analysis[df_analysis['type'] == 'ingreso']['amount'].sum()
-    total_expense_period = df_analysis[df_analysis['type'] == 'gasto']['amount'].sum()
-    
-    if total_income_period > 0:
-        savings = total_income_period - total_expense_period
-        savings_rate = (savings / total_income_period) * 100
-        period_str = f"{analysis_months[0].strftime('%b')} - {analysis_months[-1].strftime('%b %Y')}"
-
-        if 0 < savings_rate < 20:
-            savings_str = format_currency(savings)
-            alerts.append({
-                "type": "ahorro_bajo",
-                "severity": "media",
-                "savings_rate": round(savings_rate, 1),
-                "savings_amount": round(savings, 2),
-                "period": period_str,
-                "message": f"📉 Tasa de ahorro baja: {savings_rate:.1f}% ({period_str}). Has ahorrado {savings_str}. Meta recomendada: 20%"
-            })
-        elif savings_rate < 0:
-            deficit_amount_str = format_currency(abs(savings))
-            alerts.append({
-                "type": "ahorro_negativo",
-                "severity": "critica",
-                "savings_rate": round(savings_rate, 1),
-                "deficit_amount": round(abs(savings), 2),
-                "period": period_str,
-                "message": f"🚨 AHORRO NEGATIVO: Estás gastando {deficit_amount_str} más de lo que ganas ({period_str})"
-            })
-    
-    # 4. ALERTA: Transacciones inusualmente grandes en últimos 3 meses
-    expense_df = df_analysis[df_analysis['type'] == 'gasto']
-    if len(expense_df) > 10:
-        q75 = expense_df['amount'].quantile(0.75)
-        q25 = expense_df['amount'].quantile(0.25)
-        iqr = q75 - q25
-        threshold = q75 + (1.5 * iqr)
-        
-        large_transactions = expense_df[expense_df['amount'] > threshold].sort_values('amount', ascending=False)
-        
-        for idx, (_, tx) in enumerate(large_transactions.head(3).iterrows()):
-            amount_str = format_currency(tx['amount'])
-            threshold_str = format_currency(threshold)
-            
-            alerts.append({
-                "type": "transaccion_inusual",
-                "severity": "media",
-                "amount": round(tx['amount'], 2),
-                "description": tx['description'],
-                "category": tx['category'],
-                "date": tx['date'].strftime('%d/%m/%Y'),
-                "threshold": round(threshold, 2),
-                "message": f"💰 Gasto atípico: {amount_str} en '{tx['description']}' ({tx['category']}) el {tx['date'].strftime('%d/%m/%Y')}. Supera el umbral de {threshold_str}"
-            })
-    
-    # 5. ALERTA: Gastos hormiga en últimos 3 meses
-    small_expenses = df_analysis[(df_analysis['type'] == 'gasto') & (df_analysis['amount'] < 100)]
-    if not small_expenses.empty:
-        small_count = len(small_expenses)
-        small_total = small_expenses['amount'].sum()
-        total_expenses = df_analysis[df_analysis['type'] == 'gasto']['amount'].sum()
-        
-        if small_count > 15 and total_expenses > 0:
-            small_pct = (small_total / total_expenses) * 100
-            avg_small = small_total / small_count
-            period_str = f"{analysis_months[0].strftime('%b')} - {analysis_months[-1].strftime('%b %Y')}"
-            
-            small_total_str = format_currency(small_total)
-            avg_small_str = format_currency(avg_small)
-
-            alerts.append({
-                "type": "gastos_hormiga",
-                "severity": "media",
-                "transaction_count": small_count,
-                "total_amount": round(small_total, 2),
-                "average_amount": round(avg_small, 2),
-                "percentage_of_total": round(small_pct, 1),
-                "period": period_str,
-                "message": f"🐜 Gastos hormiga: {small_count} transacciones pequeñas (promedio {avg_small_str}) suman {small_total_str} ({small_pct:.1f}% del total) en {period_str}"
-            })
-    
-    # 6. ALERTA: Tendencia creciente en últimos 3 meses
-    if len(analysis_months) >= 3:
-        monthly_expenses = []
-        month_names = []
-        
-        for month in analysis_months:
-            month_expense = df[(df['type'] == 'gasto') & (df['month'] == month)]['amount'].sum()
-            monthly_expenses.append(month_expense)
-            month_names.append(month.strftime('%b %Y'))
-        
-        if all(monthly_expenses[i] < monthly_expenses[i+1] for i in range(len(monthly_expenses)-1)):
-            increase = ((monthly_expenses[-1] - monthly_expenses[0]) / monthly_expenses[0]) * 100
-            
-            m0_str = format_currency(monthly_expenses[0])
-            m1_str = format_currency(monthly_expenses[1])
-            m2_str = format_currency(monthly_expenses[2])
-
-            alerts.append({
-                "type": "tendencia_creciente",
-                "severity": "alta",
-                "months": month_names,
-                "amounts": [round(x, 2) for x in monthly_expenses],
-                "increase_percentage": round(increase, 1),
-                "message": f"📈 Tendencia creciente: Gastos aumentando consistentemente: {month_names[0]} ({m0_str}) → {month_names[1]} ({m1_str}) → {month_names[2]} ({m2_str}). Aumento total: {increase:.1f}%"
-            })
-    
-    # 7. ALERTA: Sin ingresos en mes actual
-    if current_income == 0 and current_expense > 0:
-        current_expense_str = format_currency(current_expense)
-        alerts.append({
-            "type": "sin_ingresos",
-            "severity": "alta",
-            "expense_amount": round(current_expense, 2),
-            "message": f"⚠️ No hay ingresos registrados en {current_month.strftime('%B %Y')} pero sí gastos por {current_expense_str}. ¿Olvidaste registrar ingresos?"
-        })
-    
-    # 8. ALERTA: Categoría dominante en últimos 3 meses
-    category_expenses = df_analysis[df_analysis['type'] == 'gasto'].groupby('category')['amount'].sum()
-    total_expenses_period = category_expenses.sum()
-    
-    if total_expenses_period > 0:
-        for cat, amount in category_expenses.items():
-            percentage = (amount / total_expenses_period) * 100
-            if percentage > 40:
-                period_str = f"{analysis_months[0].strftime('%b')} - {analysis_months[-1].strftime('%b %Y')}"
-                
-                # Formatear montos de otras categorías
-                other_categories_list = []
-                for c in category_expenses.index:
-                    if c != cat:
-                        other_categories_list.append(f"{c} ({format_currency(category_expenses[c])})")
-                other_categories = ', '.join(other_categories_list)
-
-                amount_str = format_currency(amount)
-                
-                alerts.append({
-                    "type": "categoria_dominante",
-                    "severity": "media",
-                    "category": cat,
-                    "amount": round(amount, 2),
-                    "percentage": round(percentage, 1),
-                    "total_expenses": round(total_expenses_period, 2),
-                    "period": period_str,
-                    "message": f"📊 Categoría dominante: '{cat}' representa {amount_str} ({percentage:.1f}%) de tus gastos en {period_str}. Otras: {other_categories}"
-                })
-    
-    # 9. ALERTA: Gastos duplicados (mejorado con normalización)
-    current_expenses = df[(df['type'] == 'gasto') & (df['month'] == current_month)].copy()
-    if not current_expenses.empty:
-        # Normalizar descripción: minúsculas y sin espacios extra
-        current_expenses['desc_normalized'] = current_expenses['description'].str.lower().str.strip()
-        
-        duplicates = current_expenses.groupby(['date', 'amount', 'desc_normalized']).agg({
-            'description': 'first',
-            'category': 'first'
-        }).reset_index()
-        
-        duplicate_counts = current_expenses.groupby(['date', 'amount', 'desc_normalized']).size()
-        duplicate_counts = duplicate_counts[duplicate_counts > 1]
-        
-        for (date, amount, desc_norm), count in duplicate_counts.items():
-            original_desc = duplicates[(duplicates['date'] == date) & 
-                                      (duplicates['amount'] == amount) & 
-                                      (duplicates['desc_normalized'] == desc_norm)]['description'].values[0]
-            category = duplicates[(duplicates['date'] == date) & 
-                                 (duplicates['amount'] == amount) & 
-                                 (duplicates['desc_normalized'] == desc_norm)]['category'].values[0]
-            
-            total_duplicated = amount * count
-            
-            amount_str = format_currency(amount)
-            total_duplicated_str = format_currency(total_duplicated)
-            
-            alerts.append({
-                "type": "posible_duplicado",
-                "severity": "media",
-                "amount": round(amount, 2),
-                "description": original_desc,
-                "category": category,
-                "date": date.strftime('%d/%m/%Y'),
-                "count": int(count),
-                "total_amount": round(total_duplicated, 2),
-                "message": f"🔄 Posible duplicado: {amount_str} en '{original_desc}' ({category}) registrado {count} veces el {date.strftime('%d/%m/%Y')}. Total: {total_duplicated_str}"
-            })
-    
-    # 10. ALERTA: Proyección de gastos para fin de mes
-    days_in_month = pd.Timestamp(datetime.now()).days_in_month
-    current_day = datetime.now().day
-    
-    if current_day >= 7 and current_day < days_in_month and current_expense > 0:
-        daily_avg = current_expense / current_day
-        projected_expense = daily_avg * days_in_month
-        
-        # Comparar con promedio de meses anteriores en la ventana
-        previous_months = [m for m in analysis_months if m < current_month]
-        if previous_months:
-            avg_prev_months = df[df['month'].isin(previous_months) & (df['type'] == 'gasto')].groupby('month')['amount'].sum().mean()
-            
-            if projected_expense > avg_prev_months * 1.15:
-                excess = projected_expense - avg_prev_months
-                excess_pct = ((projected_expense - avg_prev_months) / avg_prev_months) * 100
-                months_str = ', '.join([m.strftime('%b') for m in previous_months])
-                
-                current_expense_str = format_currency(current_expense)
-                daily_avg_str = format_currency(daily_avg)
-                projected_expense_str = format_currency(projected_expense)
-                avg_prev_months_str = format_currency(avg_prev_months)
-                excess_str = format_currency(excess)
-                
-                alerts.append({
-                    "type": "proyeccion_excesiva",
-                    "severity": "alta",
-                    "current_expense": round(current_expense, 2),
-                    "days_elapsed": current_day,
-                    "daily_average": round(daily_avg, 2),
-                    "projected_expense": round(projected_expense, 2),
-                    "average_previous_months": round(avg_prev_months, 2),
-                    "excess_amount": round(excess, 2),
-                    "excess_percentage": round(excess_pct, 1),
-                    "message": f"⚡ Proyección alta: Llevas {current_expense_str} en {current_day} días ({daily_avg_str}/día). Proyección fin de mes: {projected_expense_str} vs promedio de {avg_prev_months_str} ({months_str}). Exceso proyectado: {excess_str} (+{excess_pct:.1f}%)"
-                })
-    
-    # Ordenar alertas por severidad
-    severity_order = {"critica": 0, "alta": 1, "media": 2, "baja": 3}
-    alerts.sort(key=lambda x: severity_order.get(x["severity"], 4))
-    
-    return jsonify({
-        "alerts": alerts,
-        "total": len(alerts),
-        "analysis_period": {
-            "start": analysis_months[0].strftime('%B %Y'),
-            "end": analysis_months[-1].strftime('%B %Y'),
-            "months_analyzed": len(analysis_months)
-        }
+    # Alertas materializadas: los acumuladores se actualizan con cada transacción
+    return json_response(materialized_alerts(get_formatter(locale)))
+
+@app.route('/alerts/verify', methods=['GET'])
+def verify_alerts():
+    """Compara las alertas incrementales con un recálculo completo"""
+    df = load_data()
+    if df.empty:
+        return jsonify({"error": "No data available"}), 404
+    with span('aggregate'):
+        incremental = materialized_alerts()
+        full = build_alerts(df)
+        differences = compare_alerts(full['alerts'], incremental['alerts'])
+    return json_response({
+        "consistent": not differences,
+        "full_total": full['total'],
+        "incremental_total": incremental['total'],
+        "differences": differences
     })
 
 # ... [El resto del código como /reports/monthly, /reports/comparative, /reports/habits y /graphs/* sigue igual]
 @app.route('/reports/monthly', methods=['GET'])
+@cached_response
 def get_monthly_report():
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
-    current_df = df[df['date'].dt.to_period('M') == current_month]
+    current_df = month_slice(df, current_month_key())
     
-    income = current_df[current_df['type'] == 'ingreso']['amount'].sum()
-    expense = current_df[current_df['type'] == 'gasto']['amount'].sum()
+    income = current_df[is_income(current_df)]['amount'].sum()
+    expense = current_df[is_expense(current_df)]['amount'].sum()
     savings = income - expense
-    top_category = current_df[current_df['type'] == 'gasto'].groupby('category')['amount'].sum().idxmax() if not current_df.empty else None
+    top_category = current_df[is_expense(current_df)].groupby('category', observed=True)['amount'].sum().idxmax() if not current_df.empty else None
     
     report = {
         "income": income,
@@ -610,19 +962,24 @@ def get_monthly_report():
         "savings": savings,
         "top_category": top_category
     }
-    return jsonify(report)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame([report]))
+    return json_response(report)
 
 @app.route('/reports/comparative', methods=['GET'])
+@cached_response
 def get_comparative_report():
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
+    current_month = current_month_key()
     prev_month = current_month - 1
     
-    current_expense = df[(df['type'] == 'gasto') & (df['date'].dt.to_period('M') == current_month)]['amount'].sum()
-    prev_expense = df[(df['type'] == 'gasto') & (df['date'].dt.to_period('M') == prev_month)]['amount'].sum()
+    current_df = month_slice(df, current_month)
+    prev_df = month_slice(df, prev_month)
+    current_expense = current_df[is_expense(current_df)]['amount'].sum()
+    prev_expense = prev_df[is_expense(prev_df)]['amount'].sum()
     
     difference = current_expense - prev_expense
     
@@ -631,84 +988,423 @@ def get_comparative_report():
         "prev_expense": prev_expense,
         "difference": difference
     }
-    return jsonify(report)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame([report]))
+    return json_response(report)
+
+def parse_month_bound(value):
+    """Índice de mes de ?from=/?to= en /reports/habits (YYYY-MM)"""
+    if value is None:
+        return None
+    return ledger.month_key(datetime.strptime(value, '%Y-%m'))
+
+def habits_window(start_month, end_month, top):
+    """Gastos más repetidos de una ventana de meses con los resúmenes SpaceSaving del tenant"""
+    state = current_tenant()
+    with state.lock:
+        index, df = tenant_index('habits', HabitIndex.from_frame)
+        if df.empty:
+            return jsonify({"error": "No data available"}), 404
+        summary = index.window(start_month, end_month)
+        exact = summary.exact
+        if exact:
+            ranked = summary.top(top)
+        elif index.window_rows(start_month, end_month) <= EXACT_MAX_ROWS:
+            # Ledger chico: se cuenta directamente, sin error
+            first = start_month if start_month is not None else int(df['month'].iloc[0])
+            window_df = month_slice(df, first, end_month if end_month is not None else int(df['month'].iloc[-1]))
+            ranked = exact_top(window_df[is_expense(window_df)], top)
+            exact = True
+        else:
+            ranked = summary.top(top)
+    report = {
+        "from": None if start_month is None else month_str(start_month),
+        "to": None if end_month is None else month_str(end_month),
+        "repeated_expenses": {item: count for item, count, _ in ranked},
+        "exact": exact,
+    }
+    if not exact:
+        # Cota de sobreestimación de cada conteo
+        report["max_error"] = {item: error for item, _, error in ranked}
+    if wants_arrow():
+        return arrow_response(pd.DataFrame({'description': [item for item, _, _ in ranked],
+                                            'count': [count for _, count, _ in ranked],
+                                            'max_error': [error for _, _, error in ranked]}),
+                              metadata={'from': report['from'], 'to': report['to'], 'exact': exact})
+    return json_response(report)
 
 @app.route('/reports/habits', methods=['GET'])
+@cached_response
 def get_habits_report():
+    if any(arg in request.args for arg in ('from', 'to', 'scope', 'top')):
+        try:
+            start_month = parse_month_bound(request.args.get('from'))
+            end_month = parse_month_bound(request.args.get('to'))
+        except ValueError:
+            return jsonify({"error": "Invalid month format, use YYYY-MM"}), 400
+        if start_month is not None and end_month is not None and start_month > end_month:
+            return jsonify({"error": "'from' must not be after 'to'"}), 400
+        top = request.args.get('top', '5')
+        if not top.isdigit() or not 1 <= int(top) <= 100:
+            return jsonify({"error": "Invalid top: must be between 1 and 100"}), 400
+        if request.args.get('scope', 'all') != 'all':
+            return jsonify({"error": "Invalid scope: must be 'all'"}), 400
+        return habits_window(start_month, end_month, int(top))
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    current_month = pd.Timestamp(datetime.now()).to_period('M')
-    current_expenses = df[(df['type'] == 'gasto') & (df['date'].dt.to_period('M') == current_month)]
+    current_df = month_slice(df, current_month_key())
+    current_expenses = current_df[is_expense(current_df)]
     
-    top_days = current_expenses.groupby(current_expenses['date'].dt.day)['amount'].sum().nlargest(3).index.tolist()
+    top_days = current_expenses.groupby('day')['amount'].sum().nlargest(3).index.tolist()
     
-    repeated_expenses = current_expenses['description'].value_counts().head(5).to_dict()
+    # El diccionario de descripciones incluye las de otros meses (conteo 0)
+    repeated_expenses = current_expenses['description'].value_counts()
+    repeated_expenses = repeated_expenses[repeated_expenses > 0].head(5).to_dict()
     
     report = {
         "top_days": top_days,
         "repeated_expenses": repeated_expenses
     }
-    return jsonify(report)
+    if wants_arrow():
+        return arrow_response(pd.DataFrame({'description': list(repeated_expenses),
+                                            'count': list(repeated_expenses.values())}),
+                              metadata={'top_days': top_days})
+    return json_response(report)
+
+# Nombre del período en los títulos de las gráficas (?granularity=)
+PERIOD_NAMES = {'day': 'Día', 'week': 'Semana', 'month': 'Mes', 'quarter': 'Trimestre', 'year': 'Año'}
 
 @app.route('/graphs/bar', methods=['GET'])
+@cached_response
 def get_bar_graph():
+    granularity = request.args.get('granularity')
+    error = invalid_granularity(granularity)
+    if error is not None:
+        return error
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    df['month'] = df['date'].dt.to_period('M').astype(str)
-    monthly = df.groupby(['month', 'type'])['amount'].sum().unstack().fillna(0)
-    
-    fig, ax = plt.subplots()
-    monthly.plot(kind='bar', ax=ax)
-    ax.set_title('Ingresos vs Gastos por Mes')
-    ax.set_ylabel('Monto')
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
+    with current_tenant().lock:
+        if granularity is None:
+            store, df = snapshot_store()
+            monthly = snapshots.amounts_by_month_and_type(store.all_months(df))
+        else:
+            cube, df = rollup_cube()
+            monthly = rollups.amounts_by_period_and_type(cube, granularity)
+    
+    with span('render'):
+        plt = pyplot()
+        fig, ax = plt.subplots()
+        monthly.plot(kind='bar', ax=ax)
+        ax.set_title(f'Ingresos vs Gastos por {PERIOD_NAMES[granularity or "month"]}')
+        ax.set_ylabel('Monto')
+    
+        img = io.BytesIO()
+        plt.savefig(img, format='png')
+        img.seek(0)
+        plt.close()
     return send_file(img, mimetype='image/png')
 
 @app.route('/graphs/pie', methods=['GET'])
+@cached_response
 def get_pie_graph():
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    expenses = df[df['type'] == 'gasto'].groupby('category')['amount'].sum()
-    
-    fig, ax = plt.subplots()
-    expenses.plot(kind='pie', ax=ax, autopct='%1.1f%%')
-    ax.set_title('Distribución de Gastos por Categoría')
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
+    expenses = df[is_expense(df)].groupby('category', observed=True)['amount'].sum()
+    # Solo ingresos (o gastos en 0): no hay distribución que graficar
+    if not (expenses > 0).any():
+        return jsonify({"error": "No expenses available"}), 404
+    
+    with span('render'):
+        plt = pyplot()
+        fig, ax = plt.subplots()
+        expenses.plot(kind='pie', ax=ax, autopct='%1.1f%%')
+        ax.set_title('Distribución de Gastos por Categoría')
+    
+        img = io.BytesIO()
+        plt.savefig(img, format='png')
+        img.seek(0)
+        plt.close()
     return send_file(img, mimetype='image/png')
 
 @app.route('/graphs/line', methods=['GET'])
+@cached_response
 def get_line_graph():
+    granularity = request.args.get('granularity')
+    error = invalid_granularity(granularity)
+    if error is not None:
+        return error
     df = load_data()
     if df.empty:
         return jsonify({"error": "No data available"}), 404
     
-    df['month'] = df['date'].dt.to_period('M').astype(str)
-    monthly_expenses = df[df['type'] == 'gasto'].groupby('month')['amount'].sum()
-    
-    fig, ax = plt.subplots()
-    monthly_expenses.plot(kind='line', ax=ax)
-    ax.set_title('Evolución de Gastos Mensuales')
-    ax.set_ylabel('Monto')
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
+    with current_tenant().lock:
+        if granularity is None:
+            store, df = snapshot_store()
+            monthly_expenses = snapshots.expenses_by_month(store.all_months(df))
+        else:
+            cube, df = rollup_cube()
+            monthly_expenses = rollups.expenses_by_period(cube, granularity)
+    
+    with span('render'):
+        plt = pyplot()
+        fig, ax = plt.subplots()
+        monthly_expenses.plot(kind='line', ax=ax)
+        ax.set_title('Evolución de Gastos Mensuales' if granularity in (None, 'month')
+                     else f'Evolución de Gastos por {PERIOD_NAMES[granularity]}')
+        ax.set_ylabel('Monto')
+    
+        img = io.BytesIO()
+        plt.savefig(img, format='png')
+        img.seek(0)
+        plt.close()
     return send_file(img, mimetype='image/png')
 
+def internal_get(tenant_id, path):
+    """GET a un endpoint del tenant dentro del proceso; pasa por la caché de respuestas.
+
+    Corre en un contexto de aplicación propio: una petición anidada en otra
+    (p. ej. /reports/pdf) reusaría el contexto y el g de la de afuera, y su
+    teardown devolvería el tenant de esa petición y reemplazaría sus spans.
+    """
+    with app.app_context():
+        return app.test_client().get(path, headers={TENANT_HEADER: tenant_id},
+                                     environ_base={INTERNAL_ENVIRON_KEY: True})
+
+def report_pdf(tenant_id, locale=None):
+    """PDF mensual del tenant armado con las respuestas (cacheadas) de los reportes y gráficas"""
+    query = f"?locale={locale}" if locale else ''
+    report = internal_get(tenant_id, '/reports/monthly-12')
+    if report.status_code != 200:
+        return None
+    sections = {name: internal_get(tenant_id, path) for name, path in (
+        ('comparative', '/reports/comparative'), ('habits', '/reports/habits'), ('alerts', f'/alerts{query}'))}
+    images = {name: internal_get(tenant_id, f'/graphs/{name}') for name in ('bar', 'line', 'pie')}
+    with span('render'):
+        return render_pdf(
+            pyplot(), report.get_json(), {name: r.get_data() for name, r in images.items() if r.status_code == 200},
+            **{name: r.get_json() if r.status_code == 200 else None for name, r in sections.items()},
+            generated=datetime.now().strftime('%d/%m/%Y'), formatter=get_formatter(locale))
+
+@app.route('/reports/pdf', methods=['GET'])
+@cached_response
+def get_pdf_report():
+    locale = request.args.get('locale')
+    if locale is not None and not is_supported_locale(locale):
+        return jsonify({"error": f"Unsupported locale: {locale}"}), 400
+    pdf = report_pdf(g.tenant_id, locale)
+    if pdf is None:
+        return jsonify({"error": "No data available"}), 404
+    return send_file(io.BytesIO(pdf), mimetype='application/pdf')
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    cache_stats = response_cache.stats()
+    tenant_stats = tenants.stats()
+    for name in ('entries', 'bytes', 'hits', 'misses'):
+        metrics.gauge(f'finsight_response_cache_{name}', f'Caché de respuestas: {name}').set(cache_stats[name])
+    for name in ('resident_tenants', 'memory_bytes', 'index_bytes', 'shared_bytes', 'evictions'):
+        metrics.gauge(f'finsight_tenants_{name}', f'Ledgers en memoria: {name}').set(tenant_stats[name])
+    for name, value in in_flight.stats().items():
+        metrics.gauge(f'finsight_single_flight_{name}', f'Cálculos de respuestas compartidos: {name}').set(value)
+    job_runs = metrics.gauge('finsight_job_runs', 'Ejecuciones de cada tarea en segundo plano', ('job',))
+    job_failures = metrics.gauge('finsight_job_failures', 'Ejecuciones fallidas de cada tarea', ('job',))
+    metrics.gauge('finsight_scheduler_running', 'Si el hilo de tareas en segundo plano está activo (1) o no (0)').set(
+        int(scheduler.alive))
+    for job in scheduler.jobs.values():
+        job_runs.set(job.runs, job=job.name)
+        job_failures.set(job.failures, job=job.name)
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@contextlib.contextmanager
+def tenant_context(tenant_id):
+    """Contexto de petición del tenant para usar load_data() y compañía fuera de una petición.
+
+    Con un contexto de aplicación propio: si la tarea corre dentro de una
+    petición (POST /jobs/<nombre>/run sin el hilo de tareas) no toca su g.
+    """
+    with app.app_context(), app.test_request_context(headers={TENANT_HEADER: tenant_id}):
+        g.tenant_id = tenant_id
+        # Como en resolve_tenant(): release_tenant() lo devuelve al cerrar el contexto
+        g.tenant = tenants.checkout(tenant_id)
+        yield g.tenant
+
+def warm_up(tenant_ids, imports=False):
+    """Carga en memoria el ledger y las alertas de cada tenant antes de la primera petición"""
+    if imports:
+        pyplot()
+        importlib.import_module('scipy.stats')
+    for tenant_id in tenant_ids:
+        if not is_valid_tenant_id(tenant_id):
+            continue
+        with tenant_context(tenant_id):
+            if not load_data().empty:
+                materialized_alerts()
+
+def warm_caches(tenant_ids):
+    """Genera y cachea las respuestas de WARM_PATHS.
+
+    Devuelve cuántas quedaron listas y las que fallaron ({tenant, path,
+    error}); una ruta que falla no impide calentar las demás ni los demás tenants.
+    """
+    warmed = 0
+    failures = []
+    for tenant_id in tenant_ids:
+        try:
+            with tenant_context(tenant_id) as state, state.lock:
+                # Congela los meses que se cerraron antes de generar los reportes
+                _, df = snapshot_store()
+        except Exception as exc:
+            failures.append({'tenant': tenant_id, 'path': None, 'error': repr(exc)})
+            continue
+        if df.empty:
+            continue
+        for path in WARM_PATHS:
+            try:
+                response = internal_get(tenant_id, path)
+            except Exception as exc:
+                failures.append({'tenant': tenant_id, 'path': path, 'error': repr(exc)})
+                continue
+            if response.status_code >= 500:
+                failures.append({'tenant': tenant_id, 'path': path, 'error': f"HTTP {response.status_code}"})
+            warmed += response.status_code == 200
+    return warmed, failures
+
+def archive_month(month):
+    """Copia el archivo de cada tenant a backups/transactions-YYYY-MM.csv al cerrarse el mes"""
+    archived = []
+    for tenant_id in stored_tenant_ids():
+        target = os.path.join(backup_dir(tenant_id), f"transactions-{month_str(month)}.csv")
+        if os.path.exists(target):
+            continue
+        os.makedirs(backup_dir(tenant_id), exist_ok=True)
+        with tenants.use(tenant_id) as state, state.lock:
+            shutil.copy(tenant_paths(tenant_id)[0], target)
+        archived.append(target)
+    return archived
+
+# Último día y mes vistos por job_rollover
+rollover_state = {'day': None, 'month': None}
+
+def job_rollover():
+    """Al cambiar el día: congela meses cerrados y precalcula alertas, reportes y gráficas"""
+    today = datetime.now().date()
+    month = current_month_key()
+    previous_day, previous_month = rollover_state['day'], rollover_state['month']
+    rollover_state.update(day=today, month=month)
+    if previous_day == today:
+        return {'day': today.isoformat(), 'warmed': 0}
+    archived = archive_month(previous_month) if previous_month is not None and previous_month != month else []
+    resident = tenants.resident_ids()
+    warmed, failures = warm_caches(resident)
+    for failure in failures:
+        warm_failures.inc(path=failure['path'] or 'snapshots')
+    return {'day': today.isoformat(), 'tenants': len(resident), 'warmed': warmed, 'failed': failures,
+            'archived': archived}
+
+def job_precompute():
+    """Construye los índices incrementales que aún no existen en los tenants residentes"""
+    resident = tenants.resident_ids()
+    for tenant_id in resident:
+        with tenant_context(tenant_id) as state, state.lock:
+            # Expulsado desde que se armó la lista: no se vuelve a cargar solo para precalcular
+            if state.df is None or load_data().empty:
+                continue
+            tenant_index('prefix_sums', PrefixSumIndex.from_frame)
+            tenant_index('habits', HabitIndex.from_frame)
+            tenant_index('search', SearchIndex.from_frame)
+            rollup_cube()
+            snapshot_store()
+            materialized_alerts()
+            # Los índices crecen con cada transacción: se actualiza su estimación
+            state.account_derived()
+        tenants.account(tenant_id)
+    return {'tenants': len(resident)}
+
+def job_compact():
+    """Incorpora al archivo los cambios del journal (PUT/DELETE) y reescribe los archivos de formato anterior"""
+    compacted = []
+    for tenant_id in tenants.resident_ids():
+        with tenant_context(tenant_id) as state, state.lock:
+            # Solo si el archivo no cambió desde que se cargó (si no, manda el del disco)
+            if state.df is None or not state.needs_compaction or state.disk_signature() != state.signature:
+                continue
+            write_csv(state, state.df)
+            state.signature = state.disk_signature()
+            # Mismo contenido con la firma nueva: los demás procesos lo mapean sin leer el CSV
+            share_frame(state, state.df, state.signature)
+            compacted.append(tenant_id)
+    return {'compacted': compacted}
+
+def job_prune_backups():
+    """Borra los respaldos mensuales más antiguos; quedan los BACKUP_KEEP más recientes"""
+    removed = []
+    if BACKUP_KEEP <= 0:
+        return {'removed': removed}
+    for tenant_id in stored_tenant_ids():
+        directory = backup_dir(tenant_id)
+        if not os.path.isdir(directory):
+            continue
+        archives = sorted(name for name in os.listdir(directory)
+                          if name.startswith('transactions-') and name.endswith('.csv'))
+        for name in archives[:-BACKUP_KEEP]:
+            os.remove(os.path.join(directory, name))
+            removed.append(os.path.join(directory, name))
+    return {'removed': removed}
+
+scheduler.add('rollover', job_rollover, 60, description='Cambio de día/mes: snapshots, caché y respaldo mensual')
+scheduler.add('precompute', job_precompute, 300, description='Índices incrementales de los tenants residentes')
+scheduler.add('compact', job_compact, 600, idle_only=True, description='Incorpora el journal de PUT/DELETE al archivo y reescribe formatos anteriores')
+scheduler.add('prune_backups', job_prune_backups, 3600, idle_only=True, description='Borra respaldos mensuales antiguos')
+
+@app.route('/jobs', methods=['GET'])
+def get_jobs():
+    return jsonify(scheduler.status())
+
+@app.route('/jobs/<name>', methods=['GET'])
+def get_job(name):
+    job = scheduler.jobs.get(name)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.status())
+
+@app.route('/jobs/<name>/run', methods=['POST'])
+def run_job(name):
+    """Ejecuta una tarea ya: en el hilo de tareas si está activo, si no en esta petición"""
+    job = scheduler.jobs.get(name)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if scheduler.alive:
+        scheduler.trigger(name)
+        return jsonify(job.status()), 202
+    if not job.run():
+        return jsonify({"error": "Job is already running"}), 409
+    return jsonify(job.status()), 200
+
+if app.config['WARMUP_TENANTS'] or app.config['WARMUP_IMPORTS']:
+    # En segundo plano: el proceso acepta peticiones mientras se calienta
+    threading.Thread(target=warm_up, args=(app.config['WARMUP_TENANTS'], app.config['WARMUP_IMPORTS']),
+                     name='finsight-warmup', daemon=True).start()
+
+def start_background_tasks():
+    """Inicia el hilo de tareas (/jobs) del proceso que atiende peticiones.
+
+    No se llama al importar el módulo (el proceso maestro de gunicorn
+    importa la app antes de crear los workers) sino al arrancar con
+    python src/main.py y en la primera petición de cada proceso, con
+    cualquier servidor WSGI. Con FINSIGHT_SCHEDULER=0 no hace nada.
+    """
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Con app.run(debug=True) el proceso padre solo vigila los archivos: las tareas corren en el hijo
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
+    app.run(debug=True)
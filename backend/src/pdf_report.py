@@ -0,0 +1,163 @@
+import io
+import textwrap
+import unicodedata
+
+from formatting import get_formatter
+
+# Tamaño A4 en pulgadas
+PAGE_SIZE = (8.27, 11.69)
+PRIMARY = '#6d28d9'
+MUTED = '#6b7280'
+# Alertas que entran en la última página
+MAX_ALERTS = 8
+
+
+def plain_text(text):
+    """Sin emojis: la fuente de matplotlib no los tiene y quedarían como cuadros"""
+    return ''.join(ch for ch in str(text)
+                   if unicodedata.category(ch) not in ('So', 'Cf') and ch != '\ufe0f').strip()
+
+
+def recommendations(summary):
+    """Mismas recomendaciones que el PDF que generaban los frontends"""
+    top = summary['top_category']
+    if summary['total_savings'] < 0:
+        return ['Tus gastos superan tus ingresos. Es urgente revisar y reducir gastos.',
+                'Identifica gastos innecesarios y establece un presupuesto estricto.',
+                'Busca oportunidades para aumentar tus ingresos.']
+    if summary['savings_rate'] < 10:
+        return ['Tu tasa de ahorro es muy baja (menos del 10%).',
+                f'Intenta reducir gastos en tu categoría principal: {top}',
+                'Establece como meta alcanzar al menos 20% de ahorro.']
+    if summary['savings_rate'] < 20:
+        return ['Tu tasa de ahorro está por debajo del 20% recomendado.',
+                'Vas bien, pero hay espacio para mejorar tus finanzas.',
+                f'Analiza tus gastos en {top} para optimizar.']
+    return ['¡Excelente! Mantienes una tasa de ahorro saludable.',
+            'Continúa con tus buenos hábitos financieros.',
+            'Considera invertir tus ahorros para hacerlos crecer.']
+
+
+def _page(plt, title, subtitle):
+    fig = plt.figure(figsize=PAGE_SIZE)
+    fig.text(0.08, 0.955, 'FinSight', fontsize=20, weight='bold', color=PRIMARY)
+    fig.text(0.08, 0.93, title, fontsize=13)
+    fig.text(0.92, 0.955, subtitle, fontsize=9, color=MUTED, ha='right')
+    return fig
+
+
+def _lines(fig, x, y, lines, size=10, step=0.022, width=95):
+    """Escribe líneas de texto hacia abajo desde y; devuelve la y siguiente"""
+    for line in lines:
+        for part in textwrap.wrap(line, width) or ['']:
+            # Sin mathtext: los montos llevan '$'
+            fig.text(x, y, part, fontsize=size, parse_math=False)
+            y -= step
+    return y
+
+
+def _summary_page(plt, report, generated, money):
+    summary, period = report['summary'], report['period']
+    fig = _page(plt, 'Reporte Financiero de 12 Meses', generated)
+    fig.text(0.08, 0.895, f"Período: {period['start']} - {period['end']}", fontsize=10, color=MUTED)
+    fig.text(0.08, 0.855, 'Resumen Ejecutivo (12 meses)', fontsize=12, weight='bold', color=PRIMARY)
+    y = _lines(fig, 0.1, 0.825, [
+        f"Ingresos totales: {money(summary['total_income'])}",
+        f"Gastos totales: {money(summary['total_expense'])}",
+        f"Ahorro total: {money(summary['total_savings'])}",
+        f"Tasa de ahorro: {summary['savings_rate']:.1f}%",
+    ])
+    fig.text(0.08, y - 0.015, 'Promedios Mensuales', fontsize=12, weight='bold', color=PRIMARY)
+    y = _lines(fig, 0.1, y - 0.045, [
+        f"Ingreso promedio: {money(summary['avg_monthly_income'])}",
+        f"Gasto promedio: {money(summary['avg_monthly_expense'])}",
+        f"Ahorro promedio: {money(summary['avg_monthly_savings'])}",
+    ])
+    best, worst = summary['best_month'], summary['worst_month']
+    fig.text(0.08, y - 0.015, 'Análisis de Rendimiento', fontsize=12, weight='bold', color=PRIMARY)
+    y = _lines(fig, 0.1, y - 0.045, [
+        f"Mejor mes: {best['month']} {best['year'] or ''} ({money(best['savings'])})",
+        f"Peor mes: {worst['month']} {worst['year'] or ''} ({money(worst['savings'])})",
+        f"Categoría con mayor gasto: {summary['top_category']} ({money(summary['top_category_amount'])})",
+    ])
+    fig.text(0.08, y - 0.015, 'Recomendaciones Financieras', fontsize=12, weight='bold', color=PRIMARY)
+    _lines(fig, 0.1, y - 0.045, [f"• {line}" for line in recommendations(summary)])
+    return fig
+
+
+def _monthly_table_page(plt, report, generated, money):
+    fig = _page(plt, 'Detalle Mensual', generated)
+    ax = fig.add_axes([0.08, 0.3, 0.84, 0.58])
+    ax.axis('off')
+    rows = [[f"{m['month']} {m['year']}", money(m['income']), money(m['expense']), money(m['savings']),
+             m['top_category']] for m in report['monthly_data']]
+    table = ax.table(cellText=rows, colLabels=['Mes', 'Ingresos', 'Gastos', 'Ahorro', 'Categoría principal'],
+                     loc='upper center', cellLoc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(8)
+    table.scale(1, 1.6)
+    for (row, _), cell in table.get_celld().items():
+        cell.get_text().set_parse_math(False)
+        if row == 0:
+            cell.set_facecolor(PRIMARY)
+            cell.get_text().set_color('white')
+    return fig
+
+
+def _charts_page(plt, images, generated):
+    fig = _page(plt, 'Gráficas', generated)
+    names = [name for name in ('bar', 'line', 'pie') if images.get(name)]
+    height = 0.86 / max(len(names), 1)
+    for i, name in enumerate(names):
+        ax = fig.add_axes([0.08, 0.9 - (i + 1) * height, 0.84, height - 0.01])
+        # El PNG es el mismo que sirve /graphs/<nombre> (ya cacheado)
+        ax.imshow(plt.imread(io.BytesIO(images[name]), format='png'))
+        ax.axis('off')
+    return fig
+
+
+def _activity_page(plt, comparative, habits, alerts, generated, money):
+    fig = _page(plt, 'Comparación, Hábitos y Alertas', generated)
+    y = 0.88
+    if comparative is not None:
+        current, previous = comparative['current_expense'], comparative['prev_expense']
+        change = (comparative['difference'] / previous * 100) if previous > 0 else 0.0
+        fig.text(0.08, y, 'Comparación Mensual de Gastos', fontsize=12, weight='bold', color=PRIMARY)
+        y = _lines(fig, 0.1, y - 0.03, [
+            f"Mes anterior: {money(previous)}",
+            f"Mes actual: {money(current)}",
+            f"Diferencia: {money(abs(comparative['difference']))} ({change:+.1f}%)",
+        ]) - 0.015
+    if habits is not None:
+        fig.text(0.08, y, 'Hábitos de Gasto', fontsize=12, weight='bold', color=PRIMARY)
+        days = ', '.join(str(day) for day in habits['top_days'])
+        lines = [f"Días con mayor gasto: {days}" if days else 'No hay suficientes datos para identificar patrones de días.']
+        lines += [f"{description}: {count} veces" for description, count in habits['repeated_expenses'].items()]
+        y = _lines(fig, 0.1, y - 0.03, lines) - 0.015
+    if alerts is not None:
+        fig.text(0.08, y, f"Alertas ({alerts['total']})", fontsize=12, weight='bold', color=PRIMARY)
+        messages = [f"• {plain_text(alert['message'])}" for alert in alerts['alerts'][:MAX_ALERTS]]
+        _lines(fig, 0.1, y - 0.03, messages or ['Sin alertas.'], size=9, step=0.019, width=105)
+    return fig
+
+
+def render_pdf(plt, report, images, comparative=None, habits=None, alerts=None, generated='', formatter=None):
+    """PDF del reporte de 12 meses con las gráficas, la comparación, hábitos y alertas.
+
+    Recibe las respuestas ya calculadas de los endpoints (JSON decodificado
+    y los PNG de /graphs/*); aquí solo se maqueta. plt es matplotlib.pyplot
+    con backend Agg.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    money = (formatter or get_formatter()).money
+    output = io.BytesIO()
+    # Sin fecha de creación: el mismo ledger produce los mismos bytes (y el mismo ETag)
+    with PdfPages(output, metadata={'Title': 'FinSight - Reporte Financiero', 'CreationDate': None}) as pdf:
+        for fig in (_summary_page(plt, report, generated, money),
+                    _monthly_table_page(plt, report, generated, money),
+                    _charts_page(plt, images, generated),
+                    _activity_page(plt, comparative, habits, alerts, generated, money)):
+            pdf.savefig(fig)
+            plt.close(fig)
+    return output.getvalue()
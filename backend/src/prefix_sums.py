@@ -0,0 +1,197 @@
+import bisect
+
+import numpy as np
+
+from ledger import TIPO_GASTO, TIPO_INGRESO, TYPE_LABELS, is_expense
+
+# Columnas fijas de la matriz de sumas acumuladas; después van las categorías de gasto
+INCOME, EXPENSE, INCOME_COUNT, EXPENSE_COUNT = range(4)
+FIXED_COLUMNS = 4
+INITIAL_CAPACITY = 64
+
+
+def day_numbers(dates):
+    """Días desde 1970-01-01 de un arreglo de fechas"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def day_str(day):
+    """YYYY-MM-DD de un día desde 1970-01-01"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def month_days(key):
+    """Primer y último día (días desde 1970-01-01) del mes con índice year*12+month"""
+    first = int(key) - 1970 * 12 - 1
+    return (int(np.datetime64(first, 'M').astype('datetime64[D]').astype(np.int64)),
+            int(np.datetime64(first + 1, 'M').astype('datetime64[D]').astype(np.int64)) - 1)
+
+
+def day_month_keys(days):
+    """Índice de mes (year*12+month, como ledger.month_key) de días desde 1970-01-01"""
+    months = np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    # El mes 0 de datetime64[M] es enero de 1970: year*12+month = 1970*12 + 1 + meses
+    return months + 1970 * 12 + 1
+
+
+class PrefixSumIndex:
+    """Sumas acumuladas por día de ingresos, gastos y gastos por categoría.
+
+    `cum[i]` es la suma de los `i` primeros días con datos (`days[:i]`), así
+    el total de cualquier rango de fechas es `cum[hi] - cum[lo]` con `lo` y
+    `hi` buscados en `days` por bisección: O(log n) en el número de días
+    distintos, sin recorrer filas. Los meses se resuelven igual, con su
+    primer y último día, y `months` guarda los meses con datos para los
+    promedios mensuales.
+
+    Las inserciones del día (el caso común) solo tocan la última fila; una
+    fecha atrasada suma su monto a las filas posteriores con una operación
+    vectorizada. Quitar una fila (PUT/DELETE) es sumarla con signo negativo;
+    `month_rows` cuenta las filas por mes para sacar de `months` los meses
+    que quedan vacíos.
+    """
+
+    def __init__(self, categories=()):
+        self.categories = list(categories)
+        self.category_columns = {cat: FIXED_COLUMNS + i for i, cat in enumerate(self.categories)}
+        self.size = 0
+        self.days = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self.cum = np.zeros((INITIAL_CAPACITY + 1, FIXED_COLUMNS + len(self.categories)))
+        self.months = []
+        self.month_rows = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls(df['category'].cat.categories)
+        if df.empty:
+            return index
+        days, inverse = np.unique(day_numbers(df['date'].to_numpy()), return_inverse=True)
+        index._reserve(len(days))
+        index.size = len(days)
+        index.days[:index.size] = days
+        amounts = df['amount'].to_numpy(dtype=np.float64)
+        codes = df['type'].cat.codes.to_numpy()
+        per_day = np.zeros((len(days), index.cum.shape[1]))
+        for total, count, code in ((INCOME, INCOME_COUNT, TIPO_INGRESO), (EXPENSE, EXPENSE_COUNT, TIPO_GASTO)):
+            mask = codes == code
+            per_day[:, total] = np.bincount(inverse[mask], weights=amounts[mask], minlength=len(days))
+            per_day[:, count] = np.bincount(inverse[mask], minlength=len(days))
+        expenses = is_expense(df)
+        category_codes = df['category'].cat.codes.to_numpy()[expenses]
+        flat = inverse[expenses] * len(index.categories) + category_codes
+        per_day[:, FIXED_COLUMNS:] = np.bincount(
+            flat, weights=amounts[expenses], minlength=len(days) * len(index.categories),
+        ).reshape(len(days), len(index.categories))
+        np.cumsum(per_day, axis=0, out=index.cum[1:index.size + 1])
+        months, counts = np.unique(day_month_keys(days[inverse]), return_counts=True)
+        index.months = months.tolist()
+        index.month_rows = dict(zip(index.months, counts.tolist()))
+        return index
+
+    def add_rows(self, df, rows):
+        """Suma las filas recién confirmadas (tipo y categoría como texto)"""
+        self._apply(rows, 1)
+
+    def remove_rows(self, df, rows):
+        """Resta las filas corregidas o borradas"""
+        self._apply(rows, -1)
+
+    def _apply(self, rows, sign):
+        for row in rows.itertuples(index=False):
+            day = int(day_numbers([row.date])[0])
+            values = np.zeros(self.cum.shape[1])
+            if row.type == TYPE_LABELS[TIPO_INGRESO]:
+                values[INCOME] = sign * row.amount
+                values[INCOME_COUNT] = sign
+            else:
+                values[EXPENSE] = sign * row.amount
+                values[EXPENSE_COUNT] = sign
+                values = self._with_category(values, str(row.category), sign * row.amount)
+            self._add_day(day, values)
+            self._count_month(int(day_month_keys([day])[0]), sign)
+
+    def _count_month(self, month, delta):
+        rows = self.month_rows.get(month, 0) + delta
+        position = bisect.bisect_left(self.months, month)
+        present = position < len(self.months) and self.months[position] == month
+        if rows > 0:
+            self.month_rows[month] = rows
+            if not present:
+                self.months.insert(position, month)
+        else:
+            self.month_rows.pop(month, None)
+            if present:
+                del self.months[position]
+
+    def _with_category(self, values, category, amount):
+        if category not in self.category_columns:
+            # Categoría nueva: una columna más, en cero para los días anteriores
+            self.category_columns[category] = self.cum.shape[1]
+            self.categories.append(category)
+            self.cum = np.hstack([self.cum, np.zeros((self.cum.shape[0], 1))])
+            values = np.append(values, 0.0)
+        values[self.category_columns[category]] += amount
+        return values
+
+    def _reserve(self, size):
+        capacity = len(self.days)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        days = np.empty(capacity, dtype=np.int64)
+        days[:self.size] = self.days[:self.size]
+        cum = np.zeros((capacity + 1, self.cum.shape[1]))
+        cum[:self.size + 1] = self.cum[:self.size + 1]
+        self.days, self.cum = days, cum
+
+    def _add_day(self, day, values):
+        pos = int(np.searchsorted(self.days[:self.size], day, side='left'))
+        if pos == self.size or self.days[pos] != day:
+            # Día nuevo: se abre una fila con la misma suma acumulada que la anterior
+            self._reserve(self.size + 1)
+            self.days[pos + 1:self.size + 1] = self.days[pos:self.size].copy()
+            self.cum[pos + 2:self.size + 2] = self.cum[pos + 1:self.size + 1].copy()
+            self.cum[pos + 1] = self.cum[pos]
+            self.days[pos] = day
+            self.size += 1
+        self.cum[pos + 1:self.size + 1] += values
+
+    def bounds(self, start_day=None, end_day=None):
+        """Posiciones (lo, hi) de los días start_day..end_day (inclusive)"""
+        days = self.days[:self.size]
+        lo = 0 if start_day is None else int(np.searchsorted(days, start_day, side='left'))
+        hi = self.size if end_day is None else int(np.searchsorted(days, end_day, side='right'))
+        return lo, max(lo, hi)
+
+    def totals(self, start_day=None, end_day=None):
+        """Sumas del rango: una fila de la matriz (ver columnas al inicio del módulo)"""
+        lo, hi = self.bounds(start_day, end_day)
+        return self.cum[hi] - self.cum[lo], lo, hi
+
+    def month_count(self, lo, hi):
+        """Meses distintos con datos entre las posiciones lo y hi"""
+        if lo >= hi:
+            return 0
+        first, last = day_month_keys([self.days[lo], self.days[hi - 1]]).tolist()
+        return bisect.bisect_right(self.months, last) - bisect.bisect_left(self.months, first)
+
+    def summary(self, start_day=None, end_day=None):
+        """Totales, promedios mensuales, tasa de ahorro y gastos por categoría del rango"""
+        sums, lo, hi = self.totals(start_day, end_day)
+        income, expense = float(sums[INCOME]), float(sums[EXPENSE])
+        months = self.month_count(lo, hi)
+        by_category = {cat: round(float(sums[column]), 2)
+                       for cat, column in self.category_columns.items() if sums[column] > 0.005}
+        return {
+            "total_income": round(income, 2),
+            "total_expense": round(expense, 2),
+            "net_gain": round(income - expense, 2),
+            "avg_monthly_income": round(income / months, 2) if months > 0 else 0,
+            "avg_monthly_expense": round(expense / months, 2) if months > 0 else 0,
+            "unspent_percentage": round((income - expense) / income * 100, 2) if income > 0.005 else 0,
+            "transactions": int(round(sums[INCOME_COUNT] + sums[EXPENSE_COUNT])),
+            "months": months,
+            "expenses_by_category": by_category,
+            "top_category": max(by_category, key=by_category.get) if by_category else None,
+        }
@@ -0,0 +1,238 @@
+import bisect
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from ledger import TIPO_GASTO, TIPO_INGRESO, TYPE_LABELS, is_expense, month_str
+from prefix_sums import (
+    EXPENSE, EXPENSE_COUNT, FIXED_COLUMNS, INCOME, INCOME_COUNT, day_month_keys, day_numbers, day_str, month_days,
+)
+
+# Niveles de menor a mayor; cada uno se arma sumando filas de su nivel base
+LEVELS = ('day', 'week', 'month', 'quarter', 'year')
+BASE_LEVEL = {'week': 'day', 'month': 'day', 'quarter': 'month', 'year': 'quarter'}
+
+
+def day_period(level, day):
+    """Clave del período de `level` que contiene el día (días desde 1970-01-01)"""
+    if level == 'day':
+        return day
+    if level == 'week':
+        # 1970-01-01 fue jueves: la semana empieza el lunes anterior
+        return day - (day + 3) % 7
+    month = int(day_month_keys([day])[0])
+    if level == 'month':
+        return month
+    quarter = (month - 1) // 3
+    return quarter if level == 'quarter' else quarter // 4
+
+
+def parent_keys(level, keys):
+    """Claves de los períodos de `level` que contienen las claves de su nivel base"""
+    keys = np.asarray(keys, dtype=np.int64)
+    if level == 'week':
+        return keys - (keys + 3) % 7
+    if level == 'month':
+        return day_month_keys(keys)
+    if level == 'quarter':
+        return (keys - 1) // 3
+    if level == 'year':
+        return keys // 4
+    return keys
+
+
+def period_days(level, key):
+    """Primer y último día (días desde 1970-01-01) del período"""
+    if level == 'day':
+        return key, key
+    if level == 'week':
+        return key, key + 6
+    if level == 'month':
+        return month_days(key)
+    months = (key * 3 + 1, key * 3 + 3) if level == 'quarter' else (key * 12 + 1, key * 12 + 12)
+    return month_days(months[0])[0], month_days(months[1])[1]
+
+
+def period_label(level, key):
+    """2026-10-19, 2026-W43, 2026-10, 2026-Q4 o 2026"""
+    if level == 'day':
+        return day_str(key)
+    if level == 'week':
+        year, week, _ = date.fromisoformat(day_str(key)).isocalendar()
+        return f"{year}-W{week:02d}"
+    if level == 'month':
+        return month_str(key)
+    if level == 'quarter':
+        return f"{key // 4}-Q{key % 4 + 1}"
+    return str(key)
+
+
+class RollupCube:
+    """Totales por período en cinco niveles: día, semana, mes, trimestre y año.
+
+    Cada período guarda una fila con las mismas columnas que PrefixSumIndex
+    (ingresos, gastos, conteos y gasto por categoría). El nivel día se arma
+    desde las filas del ledger y los demás desde su nivel base (semana y mes
+    desde los días, trimestre desde los meses, año desde los trimestres),
+    así una historia larga se recorre una sola vez. Una transacción nueva
+    suma su fila a un período de cada nivel; una corregida o borrada la
+    resta.
+
+    Una consulta por rango usa los períodos completos del nivel pedido y
+    solo recorre días en los períodos de los bordes que el rango corta.
+    """
+
+    def __init__(self, categories=()):
+        self.categories = list(categories)
+        self.category_columns = {cat: FIXED_COLUMNS + i for i, cat in enumerate(self.categories)}
+        self.width = FIXED_COLUMNS + len(self.categories)
+        self.keys = {level: [] for level in LEVELS}
+        self.rows = {level: {} for level in LEVELS}
+
+    @classmethod
+    def from_frame(cls, df):
+        cube = cls(df['category'].cat.categories)
+        if df.empty:
+            return cube
+        days, inverse = np.unique(day_numbers(df['date'].to_numpy()), return_inverse=True)
+        amounts = df['amount'].to_numpy(dtype=np.float64)
+        codes = df['type'].cat.codes.to_numpy()
+        per_day = np.zeros((len(days), cube.width))
+        for total, count, code in ((INCOME, INCOME_COUNT, TIPO_INGRESO), (EXPENSE, EXPENSE_COUNT, TIPO_GASTO)):
+            mask = codes == code
+            per_day[:, total] = np.bincount(inverse[mask], weights=amounts[mask], minlength=len(days))
+            per_day[:, count] = np.bincount(inverse[mask], minlength=len(days))
+        expenses = is_expense(df)
+        flat = inverse[expenses] * len(cube.categories) + df['category'].cat.codes.to_numpy()[expenses]
+        per_day[:, FIXED_COLUMNS:] = np.bincount(
+            flat, weights=amounts[expenses], minlength=len(days) * len(cube.categories),
+        ).reshape(len(days), len(cube.categories))
+        levels = {'day': (days, per_day)}
+        for level in LEVELS[1:]:
+            base_keys, base_rows = levels[BASE_LEVEL[level]]
+            keys, parents = np.unique(parent_keys(level, base_keys), return_inverse=True)
+            rows = np.zeros((len(keys), cube.width))
+            np.add.at(rows, parents, base_rows)
+            levels[level] = (keys, rows)
+        for level, (keys, rows) in levels.items():
+            cube.keys[level] = keys.tolist()
+            cube.rows[level] = dict(zip(cube.keys[level], rows))
+        return cube
+
+    def add_rows(self, df, rows):
+        """Suma las filas recién confirmadas (tipo y categoría como texto) en cada nivel"""
+        self._apply(rows, 1)
+
+    def remove_rows(self, df, rows):
+        """Resta las filas corregidas o borradas; los períodos sin filas dejan de existir"""
+        self._apply(rows, -1)
+
+    def _apply(self, rows, sign):
+        for row in rows.itertuples(index=False):
+            values = np.zeros(self.width)
+            if row.type == TYPE_LABELS[TIPO_INGRESO]:
+                values[INCOME] = sign * row.amount
+                values[INCOME_COUNT] = sign
+            else:
+                values[EXPENSE] = sign * row.amount
+                values[EXPENSE_COUNT] = sign
+                category = str(row.category)
+                if category not in self.category_columns:
+                    # Categoría nueva: las filas existentes se completan con ceros al leerlas
+                    self.category_columns[category] = self.width
+                    self.categories.append(category)
+                    self.width += 1
+                    values = np.append(values, 0.0)
+                values[self.category_columns[category]] += sign * row.amount
+            day = int(day_numbers([row.date])[0])
+            for level in LEVELS:
+                self._add(level, day_period(level, day), values)
+
+    def _add(self, level, key, values):
+        if key not in self.rows[level]:
+            bisect.insort(self.keys[level], key)
+            self.rows[level][key] = values.copy()
+            return
+        row = self._row(level, key)
+        row[:] += values
+        if row[INCOME_COUNT] + row[EXPENSE_COUNT] < 0.5:
+            del self.rows[level][key]
+            self.keys[level].pop(bisect.bisect_left(self.keys[level], key))
+
+    def _row(self, level, key):
+        """Fila del período con todas las columnas de categoría"""
+        row = self.rows[level][key]
+        if len(row) < self.width:
+            row = self.rows[level][key] = np.concatenate([row, np.zeros(self.width - len(row))])
+        return row
+
+    def _day_sum(self, start_day, end_day):
+        keys = self.keys['day']
+        total = np.zeros(self.width)
+        for key in keys[bisect.bisect_left(keys, start_day):bisect.bisect_right(keys, end_day)]:
+            total += self._row('day', key)
+        return total
+
+    def periods(self, level, start_day=None, end_day=None):
+        """[(clave, primer día, último día, fila)] de los períodos con datos entre start_day y end_day.
+
+        Los días de un período que quedan fuera del rango no se suman: el
+        primer y último día devueltos son los del período recortado al rango.
+        """
+        keys = self.keys[level]
+        if not keys:
+            return []
+        lo = 0 if start_day is None else bisect.bisect_left(keys, day_period(level, start_day))
+        hi = len(keys) if end_day is None else bisect.bisect_right(keys, day_period(level, end_day))
+        result = []
+        for key in keys[lo:hi]:
+            first, last = period_days(level, key)
+            if (start_day is not None and first < start_day) or (end_day is not None and last > end_day):
+                first = first if start_day is None else max(first, start_day)
+                last = last if end_day is None else min(last, end_day)
+                row = self._day_sum(first, last)
+                if not row[INCOME_COUNT] + row[EXPENSE_COUNT]:
+                    continue
+            else:
+                row = self._row(level, key)
+            result.append((key, first, last, row))
+        return result
+
+    def summary(self, level, start_day=None, end_day=None):
+        """Ingresos, gastos y categoría principal de cada período (para /analysis?granularity=)"""
+        result = []
+        for key, first, last, row in self.periods(level, start_day, end_day):
+            by_category = {cat: float(row[column]) for cat, column in self.category_columns.items()
+                           if row[column] > 0.005}
+            income, expense = float(row[INCOME]), float(row[EXPENSE])
+            result.append({
+                "period": period_label(level, key),
+                "start": day_str(first),
+                "end": day_str(last),
+                "income": round(income, 2),
+                "expense": round(expense, 2),
+                "net": round(income - expense, 2),
+                "transactions": int(round(row[INCOME_COUNT] + row[EXPENSE_COUNT])),
+                "top_category": max(by_category, key=by_category.get) if by_category else None,
+            })
+        return result
+
+
+def amounts_by_period_and_type(cube, level):
+    """Montos por período y tipo; mismo formato que snapshots.amounts_by_month_and_type()"""
+    periods = cube.periods(level)
+    columns = {}
+    for label, total, count in ((TYPE_LABELS[TIPO_GASTO], EXPENSE, EXPENSE_COUNT),
+                                (TYPE_LABELS[TIPO_INGRESO], INCOME, INCOME_COUNT)):
+        if any(row[count] for _, _, _, row in periods):
+            columns[label] = [float(row[total]) if row[count] else 0.0 for _, _, _, row in periods]
+    frame = pd.DataFrame(columns, index=pd.Index([period_label(level, key) for key, _, _, _ in periods], name=level))
+    return frame.rename_axis(columns='type')
+
+
+def expenses_by_period(cube, level):
+    """Gasto por período de los períodos con gastos"""
+    periods = [(key, row) for key, _, _, row in cube.periods(level) if row[EXPENSE_COUNT]]
+    return pd.Series([float(row[EXPENSE]) for _, row in periods], name='amount', dtype=float,
+                     index=pd.Index([period_label(level, key) for key, _ in periods], name=level))
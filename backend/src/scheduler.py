@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+# Con 0 no se inicia el hilo de tareas; se pueden seguir ejecutando con POST /jobs/<nombre>/run
+SCHEDULER_ENABLED = os.environ.get('FINSIGHT_SCHEDULER', '1') == '1'
+# Segundos sin peticiones para considerar el proceso inactivo (tareas de mantenimiento)
+IDLE_SECONDS = float(os.environ.get('FINSIGHT_IDLE_SECONDS', '30'))
+
+
+def parse_schedules(value):
+    """'rollover=60,compact=600' -> {'rollover': 60.0, 'compact': 600.0}"""
+    schedules = {}
+    for item in value.split(','):
+        name, sep, seconds = item.partition('=')
+        if sep and name.strip():
+            schedules[name.strip()] = float(seconds)
+    return schedules
+
+
+# Intervalos por tarea (segundos); los que no se indiquen usan el valor por defecto de la tarea
+SCHEDULES = parse_schedules(os.environ.get('FINSIGHT_JOBS', ''))
+
+
+def utc_iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class Job:
+    """Tarea periódica y el resultado de su última ejecución"""
+
+    def __init__(self, name, func, interval, idle_only=False, description=''):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.idle_only = idle_only
+        self.description = description
+        self.lock = threading.Lock()
+        self.next_run = time.time() + interval
+        self.running = False
+        # Pedida a mano con trigger(): corre aunque el proceso no esté inactivo
+        self.forced = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+    def run(self):
+        """Ejecuta la tarea; devuelve False si ya estaba corriendo"""
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            self.running = True
+            self.forced = False
+            self.last_started = time.time()
+            start = time.perf_counter()
+            try:
+                self.last_result = self.func()
+                self.last_error = None
+            except Exception:
+                self.failures += 1
+                self.last_error = traceback.format_exc(limit=5)
+            self.runs += 1
+            self.last_duration = time.perf_counter() - start
+            self.next_run = time.time() + self.interval
+            return True
+        finally:
+            self.running = False
+            self.lock.release()
+
+    def status(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'interval_seconds': self.interval,
+            'idle_only': self.idle_only,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_started': utc_iso(self.last_started),
+            'last_duration_seconds': None if self.last_duration is None else round(self.last_duration, 4),
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+            'next_run': utc_iso(self.next_run),
+        }
+
+
+class Scheduler:
+    """Ejecuta tareas periódicas en un hilo de fondo del proceso.
+
+    Las tareas corren de a una en el hilo trabajador, así no compiten
+    entre sí por los locks de los tenants. Las marcadas idle_only esperan
+    a que el proceso pase IDLE_SECONDS sin recibir peticiones (touch()).
+    """
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, schedules=None):
+        self.idle_seconds = idle_seconds
+        self.schedules = SCHEDULES if schedules is None else schedules
+        self.jobs = {}
+        self.last_activity = time.time()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # start() puede llamarse desde varias peticiones a la vez (ver main.start_background_tasks)
+        self._start_lock = threading.Lock()
+
+    def add(self, name, func, interval, idle_only=False, description=''):
+        interval = self.schedules.get(name, interval)
+        self.jobs[name] = Job(name, func, interval, idle_only, description)
+        return self.jobs[name]
+
+    def touch(self):
+        """Registra actividad (una petición de un cliente)"""
+        self.last_activity = time.time()
+
+    def is_idle(self):
+        return time.time() - self.last_activity >= self.idle_seconds
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.alive:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='finsight-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self, name):
+        """Pide ejecutar la tarea cuanto antes (en el hilo trabajador)"""
+        job = self.jobs[name]
+        job.forced = True
+        self._wake.set()
+        return job
+
+    def _due(self, now):
+        idle = self.is_idle()
+        return [job for job in self.jobs.values()
+                if job.forced or (job.interval > 0 and job.next_run <= now and (idle or not job.idle_only))]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            for job in self._due(time.time()):
+                if self._stop.is_set():
+                    break
+                job.run()
+            pending = [job.next_run for job in self.jobs.values() if job.interval > 0]
+            # Se revisa al menos cada segundo: las tareas idle_only dependen de la actividad
+            wait = min([max(0.0, min(pending) - time.time()), 1.0]) if pending else 1.0
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def status(self):
+        return {
+            'enabled': SCHEDULER_ENABLED,
+            'running': self.alive,
+            'idle': self.is_idle(),
+            'last_activity': utc_iso(self.last_activity),
+            'jobs': [job.status() for job in self.jobs.values()],
+        }
@@ -0,0 +1,118 @@
+import re
+import unicodedata
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Panadería' -> 'panaderia'"""
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """Índice invertido de tokens y trigramas sobre las descripciones del ledger.
+
+    La columna 'description' es categórica, así que el índice se arma sobre
+    las descripciones distintas (sus códigos) y no sobre las filas: una
+    consulta resuelve qué códigos coinciden y las filas se filtran después
+    comparando códigos enteros. Como append() solo agrega descripciones al
+    final del diccionario, los códigos existentes no cambian y el índice se
+    actualiza indexando únicamente las descripciones nuevas.
+
+    - tokens: token -> códigos de las descripciones que lo contienen.
+    - grams: trigrama -> códigos de las descripciones con algún token que
+      lo contiene; reduce los candidatos de una búsqueda por subcadena o
+      prefijo antes de verificarlos sobre el texto normalizado.
+    """
+
+    def __init__(self):
+        self.folded = []
+        self.token_lists = []
+        self.tokens = {}
+        self.grams = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index._index_labels(df['description'].cat.categories)
+        return index
+
+    def add_rows(self, df, rows):
+        labels = df['description'].cat.categories
+        if len(labels) > len(self.folded):
+            self._index_labels(labels[len(self.folded):])
+
+    def remove_rows(self, df, rows):
+        # Las descripciones quedan en el diccionario aunque ya no tengan filas:
+        # las búsquedas filtran las filas actuales por código
+        pass
+
+    def _index_labels(self, labels):
+        for label in labels:
+            code = len(self.folded)
+            words = tokenize(label)
+            self.folded.append(' '.join(words))
+            self.token_lists.append(words)
+            for word in set(words):
+                self.tokens.setdefault(word, set()).add(code)
+                for gram in trigrams(word):
+                    self.grams.setdefault(gram, set()).add(code)
+
+    def _candidates(self, term):
+        """Códigos que podrían contener term; None si el término es muy corto para los trigramas"""
+        grams = trigrams(term)
+        if not grams:
+            return None
+        sets = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+        candidates = set(sets[0])
+        for other in sets[1:]:
+            candidates &= other
+            if not candidates:
+                break
+        return candidates
+
+    def _match_term(self, term, mode):
+        if mode == 'token':
+            return set(self.tokens.get(term, ()))
+        candidates = self._candidates(term)
+        if candidates is None:
+            candidates = range(len(self.folded))
+        if mode == 'prefix':
+            return {code for code in candidates if any(word.startswith(term) for word in self.token_lists[code])}
+        return {code for code in candidates if term in self.folded[code]}
+
+    def match(self, query, mode='substring'):
+        """Códigos de las descripciones que contienen todos los términos de query.
+
+        mode: 'substring' (en cualquier parte de la descripción), 'prefix'
+        (algún token empieza con el término) o 'token' (token completo).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return np.array([], dtype=np.int64)
+        codes = None
+        # Los términos más largos tienen menos candidatos: se resuelven primero
+        for term in sorted(set(terms), key=len, reverse=True):
+            matched = self._match_term(term, mode)
+            codes = matched if codes is None else codes & matched
+            if not codes:
+                break
+        return np.fromiter(sorted(codes), dtype=np.int64)
+
+
+def description_mask(df, codes):
+    """Filas de df cuya descripción está entre los códigos dados (tabla booleana por código)"""
+    selected = np.zeros(len(df['description'].cat.categories), dtype=bool)
+    selected[codes] = True
+    return selected[df['description'].cat.codes.to_numpy()]
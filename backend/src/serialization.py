@@ -0,0 +1,113 @@
+import datetime
+import decimal
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa el json de la biblioteca estándar
+    orjson = None
+
+# auto: orjson si está instalado; stdlib: siempre el encoder estándar
+JSON_ENCODER = os.environ.get('FINSIGHT_JSON_ENCODER', 'auto')
+
+WEEKDAY_NAMES = np.array(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'], dtype=object)
+MONTH_NAMES = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                        'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], dtype=object)
+SECONDS_PER_DAY = 86400
+
+
+@functools.cache
+def time_of_day_labels():
+    """'HH:MM:SS GMT' para cada segundo del día, indexado por segundos"""
+    return np.array([f"{h:02d}:{m:02d}:{s:02d} GMT"
+                     for h in range(24) for m in range(60) for s in range(60)], dtype=object)
+
+
+def http_dates(values):
+    """Fechas en el formato de http_date (el que usa jsonify), de forma vectorizada.
+
+    Las fechas sin zona se tratan como UTC, igual que werkzeug. El prefijo
+    con el día se formatea una vez por día distinto y la hora sale de una
+    tabla, así el costo no depende de construir un Timestamp por fila.
+    """
+    seconds = np.asarray(values, dtype='datetime64[s]').astype(np.int64)
+    days, time_of_day = np.divmod(seconds, SECONDS_PER_DAY)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    calendar = pd.DatetimeIndex(unique_days.astype('datetime64[D]'))
+    # El 1970-01-01 fue jueves (índice 3 contando desde el lunes)
+    weekdays = WEEKDAY_NAMES[(unique_days + 3) % 7]
+    months = MONTH_NAMES[calendar.month.to_numpy() - 1]
+    prefixes = np.array([f"{w}, {d:02d} {m} {y} " for w, d, m, y in
+                         zip(weekdays, calendar.day.tolist(), months, calendar.year.tolist())], dtype=object)
+    return prefixes[inverse] + time_of_day_labels()[time_of_day]
+
+
+def column_values(series):
+    """Valores de una columna listos para JSON sin convertir fila por fila"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Cada categoría se materializa una vez y se replica por código
+        labels = np.asarray(series.cat.categories, dtype=object)
+        return labels[series.cat.codes.to_numpy()].tolist()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return http_dates(series.to_numpy()).tolist()
+    return series.to_numpy().tolist()
+
+
+def frame_columns(df, columns):
+    """DataFrame como {columna: [valores]} (orient=columns)"""
+    return {column: column_values(df[column]) for column in columns}
+
+
+def frame_records(df, columns):
+    """DataFrame como lista de registros, igual que to_dict('records')"""
+    values = frame_columns(df, columns)
+    return [dict(zip(columns, row)) for row in zip(*(values[c] for c in columns))]
+
+
+def default(value):
+    """Tipos que el encoder estándar no conoce: NumPy, pandas, fechas y Decimal"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return DefaultJSONProvider.default(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+        return value.tolist()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que usa orjson cuando está disponible.
+
+    Conserva la salida de jsonify: claves ordenadas y fechas en formato
+    http_date. Sin orjson (o con FINSIGHT_JSON_ENCODER=stdlib) se usa el
+    encoder estándar con soporte para tipos de NumPy y pandas.
+    """
+    default = staticmethod(default)
+
+    def __init__(self, app, encoder=JSON_ENCODER):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and encoder != 'stdlib'
+
+    @property
+    def name(self):
+        return 'orjson' if self.use_orjson else 'stdlib'
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and set(kwargs) <= {'indent', 'separators'}:
+            options = (orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                       | orjson.OPT_PASSTHROUGH_DATETIME)
+            if kwargs.get('indent'):
+                options |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=default, option=options).decode()
+        kwargs.setdefault('default', default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
@@ -0,0 +1,143 @@
+"""Ledger compartido entre procesos (varios workers de gunicorn).
+
+Cada versión del ledger de un tenant se publica una vez como archivos
+.npy (columnas numéricas y códigos de las categóricas) y cada proceso
+los mapea con np.load(mmap_mode='r'): el DataFrame usa esas páginas sin
+copiarlas, así la memoria del ledger no se multiplica por el número de
+workers. Solo los diccionarios (descripciones y categorías) se copian.
+
+current.json apunta a la versión vigente junto con la firma del CSV y
+del journal que le corresponde; se reemplaza con os.replace(), así un
+proceso ve la versión anterior o la nueva completa, nunca una a medias.
+Un proceso que encuentra el archivo cambiado lee current.json y, si la
+firma coincide, mapea la versión nueva en lugar de volver a leer el CSV.
+"""
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from ledger import TYPE_DTYPE
+
+# Carpeta de las versiones publicadas; vacío = cada proceso lee el CSV por su cuenta.
+# En Linux conviene /dev/shm/<algo>: memoria compartida, sin escritura a disco
+SHARED_DIR = os.environ.get('FINSIGHT_SHARED_LEDGER', '')
+ENABLED = bool(SHARED_DIR)
+# Versiones que se conservan: un proceso puede haber leído current.json y no haber mapeado aún
+KEEP_VERSIONS = 2
+MANIFEST = 'current.json'
+DICTIONARIES = 'dictionaries.json'
+
+# Columnas que se mapean tal cual y columnas categóricas (se mapean sus códigos)
+ARRAY_COLUMNS = ('date', 'amount', 'id', 'month', 'day')
+CODED_COLUMNS = ('type', 'description', 'category')
+
+
+def tenant_dir(tenant_id):
+    return os.path.join(SHARED_DIR, tenant_id)
+
+
+def read_manifest(tenant_id):
+    """Versión vigente del tenant; None si todavía no se publicó ninguna"""
+    try:
+        with open(os.path.join(tenant_dir(tenant_id), MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _signature_key(signature):
+    # Las tuplas de la firma quedan como listas en JSON
+    return json.loads(json.dumps(signature))
+
+
+def publish(tenant_id, df, signature, **info):
+    """Escribe df como versión nueva, la vuelve la vigente y devuelve el ledger ya mapeado.
+
+    info (p. ej. next_id) se guarda en current.json y se devuelve en attach().
+    """
+    base = tenant_dir(tenant_id)
+    os.makedirs(base, exist_ok=True)
+    current = read_manifest(tenant_id)
+    version = (current['version'] if current else 0) + 1
+    # El pid evita choques si dos procesos publican a la vez; gana el último os.replace()
+    name = f"v{version:08d}-{os.getpid()}"
+    staging = os.path.join(base, f".{name}")
+    os.makedirs(staging)
+    for column in ARRAY_COLUMNS:
+        np.save(os.path.join(staging, f"{column}.npy"), df[column].to_numpy())
+    for column in CODED_COLUMNS:
+        np.save(os.path.join(staging, f"{column}.npy"), df[column].array.codes)
+    with open(os.path.join(staging, DICTIONARIES), 'w', encoding='utf-8') as f:
+        json.dump({column: df[column].cat.categories.tolist() for column in ('description', 'category')}, f)
+    os.rename(staging, os.path.join(base, name))
+    manifest = dict(info, version=version, path=name, signature=_signature_key(signature))
+    partial = os.path.join(base, f".{MANIFEST}.{os.getpid()}")
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(partial, os.path.join(base, MANIFEST))
+    _prune(base)
+    return _attach(base, manifest)
+
+
+def attach(tenant_id, signature):
+    """(ledger mapeado, info) de la versión vigente si corresponde a la firma; (None, None) si no"""
+    manifest = read_manifest(tenant_id)
+    if manifest is None or manifest['signature'] != _signature_key(signature):
+        return None, None
+    try:
+        return _attach(tenant_dir(tenant_id), manifest), manifest
+    except (OSError, ValueError):
+        # La versión se borró entre leer current.json y mapearla
+        return None, None
+
+
+def _attach(base, manifest):
+    path = os.path.join(base, manifest['path'])
+    arrays = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r').view(np.ndarray)
+              for column in ARRAY_COLUMNS + CODED_COLUMNS}
+    with open(os.path.join(path, DICTIONARIES), encoding='utf-8') as f:
+        labels = json.load(f)
+    # Mismas columnas y tipos que ledger.encode(); copy=False y from_codes no copian los arreglos
+    return pd.DataFrame({
+        'date': arrays['date'],
+        'type': pd.Categorical.from_codes(arrays['type'], dtype=TYPE_DTYPE, validate=False),
+        'amount': arrays['amount'],
+        'description': pd.Categorical.from_codes(
+            arrays['description'], dtype=pd.CategoricalDtype(pd.Index(labels['description'], dtype='str')),
+            validate=False),
+        'category': pd.Categorical.from_codes(
+            arrays['category'], dtype=pd.CategoricalDtype(labels['category']), validate=False),
+        'id': arrays['id'],
+        'month': arrays['month'],
+        'day': arrays['day'],
+    }, copy=False)
+
+
+def _prune(base):
+    """Borra las versiones más antiguas; los procesos que aún las mapean conservan sus páginas"""
+    versions = sorted(name for name in os.listdir(base) if name.startswith('v'))
+    for name in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def _is_mapped(array):
+    while array is not None:
+        if isinstance(array, mmap.mmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def mapped_bytes(df):
+    """Bytes de df que viven en versiones mapeadas (compartidos, no cuentan por proceso)"""
+    total = 0
+    for column in df.columns:
+        values = df[column].array
+        array = values.codes if isinstance(values, pd.Categorical) else df[column].to_numpy()
+        if _is_mapped(array):
+            total += array.nbytes
+    return total
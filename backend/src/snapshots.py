@@ -0,0 +1,134 @@
+import pandas as pd
+
+from ledger import (
+    TIPO_GASTO, TIPO_INGRESO, TYPE_LABELS, current_month_key, is_expense, is_income, month_key,
+    month_slice, month_str,
+)
+
+
+class MonthSnapshot:
+    """Agregados de un mes: totales por tipo y gastos por categoría.
+
+    Los de meses cerrados no se modifican; si una transacción atrasada
+    cae en el mes se reemplaza el snapshot completo por uno nuevo.
+    """
+
+    def __init__(self, month, income, expense, income_rows, expense_rows, by_category):
+        self.month = month
+        self.income = income
+        self.expense = expense
+        self.income_rows = income_rows
+        self.expense_rows = expense_rows
+        # Serie categoría -> monto, en el orden de groupby (el del diccionario de categorías)
+        self.by_category = by_category
+
+    @classmethod
+    def from_frame(cls, df, month):
+        """Mismos cálculos que hacían los reportes sobre las filas del mes"""
+        month_df = month_slice(df, month)
+        income_df = month_df[is_income(month_df)]
+        expense_df = month_df[is_expense(month_df)]
+        return cls(month, income_df['amount'].sum(), expense_df['amount'].sum(), len(income_df), len(expense_df),
+                   expense_df.groupby('category', observed=True)['amount'].sum())
+
+    @property
+    def top_category(self):
+        return self.by_category.idxmax() if not self.by_category.empty else None
+
+
+class SnapshotStore:
+    """Snapshots de los meses cerrados de un tenant.
+
+    Los meses anteriores a `open_month` se calculan una vez y se sirven
+    desde aquí; solo el mes abierto (y los posteriores, si hay fechas
+    futuras) se calcula en cada petición. Al cambiar de mes, rollover()
+    congela los meses que se cerraron. Se registra como índice del tenant,
+    así que add_rows() recibe cada inserción: una fecha atrasada reemplaza
+    el snapshot de su mes y el resto no se toca. remove_rows() hace lo mismo
+    con las transacciones corregidas o borradas.
+    """
+
+    def __init__(self, open_month):
+        self.open_month = open_month
+        self.snapshots = {}
+        self.rebuilds = 0
+
+    @classmethod
+    def from_frame(cls, df, now_month=None):
+        store = cls(now_month if now_month is not None else current_month_key())
+        if not df.empty:
+            closed = month_slice(df, int(df['month'].iloc[0]), store.open_month - 1)
+            for month in closed['month'].unique().tolist():
+                store.snapshots[int(month)] = MonthSnapshot.from_frame(closed, int(month))
+        return store
+
+    def add_rows(self, df, rows):
+        months = {month_key(pd.Timestamp(date)) for date in rows['date']}
+        for month in months:
+            if month < self.open_month:
+                self.snapshots[month] = MonthSnapshot.from_frame(df, month)
+                self.rebuilds += 1
+
+    def remove_rows(self, df, rows):
+        """Una transacción corregida o borrada reemplaza el snapshot de su mes (o lo quita si quedó vacío)"""
+        months = {month_key(pd.Timestamp(date)) for date in rows['date']}
+        for month in months:
+            if month < self.open_month:
+                snapshot = MonthSnapshot.from_frame(df, month)
+                if snapshot.income_rows + snapshot.expense_rows:
+                    self.snapshots[month] = snapshot
+                else:
+                    self.snapshots.pop(month, None)
+                self.rebuilds += 1
+
+    def rollover(self, df, now_month=None):
+        """Congela los meses que se cerraron desde la última llamada"""
+        now_month = now_month if now_month is not None else current_month_key()
+        if now_month <= self.open_month:
+            return False
+        closed = month_slice(df, self.open_month, now_month - 1)
+        for month in closed['month'].unique().tolist():
+            self.snapshots[int(month)] = MonthSnapshot.from_frame(closed, int(month))
+        self.open_month = now_month
+        return True
+
+    def month(self, df, month):
+        """Snapshot del mes: guardado si está cerrado, calculado en el momento si está abierto"""
+        snapshot = self.snapshots.get(month) if month < self.open_month else None
+        # Mes abierto, o mes cerrado sin transacciones (vacío, no se guarda)
+        return snapshot if snapshot is not None else MonthSnapshot.from_frame(df, month)
+
+    def all_months(self, df):
+        """Snapshots de todos los meses con datos, en orden"""
+        result = [self.snapshots[month] for month in sorted(self.snapshots)]
+        if not df.empty and int(df['month'].iloc[-1]) >= self.open_month:
+            open_df = month_slice(df, self.open_month, int(df['month'].iloc[-1]))
+            result.extend(MonthSnapshot.from_frame(open_df, int(month))
+                          for month in open_df['month'].unique().tolist())
+        return result
+
+
+def amounts_by_month_and_type(snapshots):
+    """Montos por mes (YYYY-MM) y tipo; mismo formato que groupby(['month', 'type']).unstack()"""
+    columns = {}
+    if any(s.expense_rows for s in snapshots):
+        columns[TYPE_LABELS[TIPO_GASTO]] = [s.expense if s.expense_rows else 0.0 for s in snapshots]
+    if any(s.income_rows for s in snapshots):
+        columns[TYPE_LABELS[TIPO_INGRESO]] = [s.income if s.income_rows else 0.0 for s in snapshots]
+    frame = pd.DataFrame(columns, index=pd.Index([month_str(s.month) for s in snapshots], name='month'))
+    return frame.rename_axis(columns='type')
+
+
+def expenses_by_month(snapshots):
+    """Gasto por mes (YYYY-MM) de los meses con gastos"""
+    with_expenses = [s for s in snapshots if s.expense_rows]
+    return pd.Series([s.expense for s in with_expenses], name='amount', dtype=float,
+                     index=pd.Index([month_str(s.month) for s in with_expenses], name='month'))
+
+
+def expenses_by_category(snapshots):
+    """Gasto por categoría sumando los meses, en orden alfabético de categoría"""
+    series = [s.by_category for s in snapshots if not s.by_category.empty]
+    if not series:
+        return pd.Series(dtype=float, name='amount')
+    return pd.concat([s.set_axis(s.index.astype(str)) for s in series]).groupby(level=0).sum()
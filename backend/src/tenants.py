@@ -0,0 +1,259 @@
+import contextlib
+import itertools
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from ledger import object_bytes
+from shared_ledger import mapped_bytes
+from timestamps import tenant_timezone
+
+# Tenant usado cuando la petición no indica ninguno. Conserva los archivos
+# históricos (transactions.csv / transactions_backup.csv) para no romper
+# instalaciones existentes de un solo emprendedor.
+DEFAULT_TENANT = 'default'
+TENANT_HEADER = 'X-Tenant-ID'
+TENANT_PREFIX = '/t/'
+
+DATA_DIR = os.environ.get('FINSIGHT_DATA_DIR', 'tenants')
+MAX_MEMORY_BYTES = int(os.environ.get('FINSIGHT_MAX_MEMORY_MB', '512')) * 1024 * 1024
+MAX_TENANTS = int(os.environ.get('FINSIGHT_MAX_TENANTS', '1000'))
+
+# Solo letras, números, guion y guion bajo: evita rutas como '../otro'
+_TENANT_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Contador global: una versión nunca se repite aunque el tenant sea expulsado
+# y vuelva a cargarse, así las claves de caché que la usan no colisionan.
+_versions = itertools.count(1)
+
+
+def is_valid_tenant_id(tenant_id):
+    return bool(tenant_id) and _TENANT_RE.match(tenant_id) is not None
+
+
+def tenant_paths(tenant_id):
+    """Devuelve (archivo CSV, archivo de backup) del tenant"""
+    if tenant_id == DEFAULT_TENANT:
+        return 'transactions.csv', 'transactions_backup.csv'
+    base = os.path.join(DATA_DIR, tenant_id)
+    return os.path.join(base, 'transactions.csv'), os.path.join(base, 'transactions_backup.csv')
+
+
+def journal_path(tenant_id):
+    """Journal de cambios (PUT/DELETE) del tenant, junto a su archivo de transacciones"""
+    if tenant_id == DEFAULT_TENANT:
+        return 'transactions_journal.csv'
+    return os.path.join(DATA_DIR, tenant_id, 'transactions_journal.csv')
+
+
+def backup_dir(tenant_id):
+    """Carpeta de los respaldos mensuales del tenant"""
+    if tenant_id == DEFAULT_TENANT:
+        return 'backups'
+    return os.path.join(DATA_DIR, tenant_id, 'backups')
+
+
+def stored_tenant_ids():
+    """Tenants con archivo de transacciones en disco"""
+    ids = [DEFAULT_TENANT] if os.path.exists(tenant_paths(DEFAULT_TENANT)[0]) else []
+    if os.path.isdir(DATA_DIR):
+        ids.extend(sorted(name for name in os.listdir(DATA_DIR)
+                          if is_valid_tenant_id(name) and os.path.exists(tenant_paths(name)[0])))
+    return ids
+
+
+def file_signature(path):
+    """Firma barata del archivo para detectar cambios hechos fuera del proceso"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class TenantState:
+    """Estado en memoria de un tenant: ledger cargado y agregados cacheados.
+
+    - aggregates: resultados que se descartan con cada cambio del ledger.
+    - indexes: estructuras incrementales que se actualizan con las filas
+      nuevas (método add_rows(df, rows)) y las quitadas por PUT/DELETE
+      (remove_rows(df, rows)); solo se descartan si el archivo cambia fuera
+      del proceso.
+    """
+
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.csv_file, self.backup_file = tenant_paths(tenant_id)
+        self.journal_file = journal_path(tenant_id)
+        # Zona horaria de las fechas del tenant (en memoria se guardan en hora local)
+        self.timezone = tenant_timezone(tenant_id)
+        self.lock = threading.RLock()
+        # Peticiones (o tareas) que están usando este estado; no se expulsa mientras sea > 0
+        self.active = 0
+        self.df = None
+        self.signature = None
+        self.version = 0
+        # Próximo id de transacción (nunca se reutiliza el de una fila borrada)
+        self.next_id = 1
+        # El archivo en disco no está en el formato actual (p. ej. fechas sin offset)
+        self.needs_compaction = False
+        self.aggregates = {}
+        self.indexes = {}
+        # Presupuesto de memoria: ledger propio del proceso más índices y agregados (estimados)
+        self.frame_bytes = 0
+        self.index_bytes = 0
+        self.aggregate_bytes = 0
+        self.memory_bytes = 0
+        # Parte del ledger mapeada desde la versión compartida (ver shared_ledger.py)
+        self.shared_bytes = 0
+
+    def disk_signature(self):
+        """Firma del archivo del ledger y de su journal"""
+        return file_signature(self.csv_file), file_signature(self.journal_file)
+
+    def set_frame(self, df, signature, rows=None, removed=None):
+        """Reemplaza el ledger en memoria e invalida los agregados.
+
+        Si se indican las filas agregadas (rows) y/o quitadas (removed), los
+        índices se actualizan de forma incremental en lugar de descartarse.
+        Una actualización es la fila anterior en removed y la nueva en rows.
+        """
+        self.df = df
+        self.signature = signature
+        self.version = next(_versions)
+        self.aggregates.clear()
+        if rows is None and removed is None:
+            self.indexes.clear()
+        else:
+            for index in self.indexes.values():
+                if removed is not None:
+                    index.remove_rows(df, removed)
+                if rows is not None:
+                    index.add_rows(df, rows)
+        # El presupuesto de memoria cuenta solo lo propio del proceso
+        self.shared_bytes = mapped_bytes(df) if df is not None else 0
+        self.frame_bytes = int(df.memory_usage(deep=True).sum()) - self.shared_bytes if df is not None else 0
+        self.aggregate_bytes = 0
+        if not self.indexes:
+            self.index_bytes = 0
+        # Los índices actualizados en forma incremental conservan su última estimación
+        self.memory_bytes = self.frame_bytes + self.index_bytes
+
+    def account_derived(self):
+        """Vuelve a estimar la memoria de índices y agregados (después de construir uno)"""
+        self.index_bytes = sum(object_bytes(index) for index in self.indexes.values())
+        self.aggregate_bytes = sum(object_bytes(value) for value in self.aggregates.values())
+        self.memory_bytes = self.frame_bytes + self.index_bytes + self.aggregate_bytes
+
+    def release(self):
+        """Libera el estado en memoria (el archivo en disco no se toca)"""
+        self.df = None
+        self.signature = None
+        self.aggregates.clear()
+        self.indexes.clear()
+        self.frame_bytes = 0
+        self.index_bytes = 0
+        self.aggregate_bytes = 0
+        self.memory_bytes = 0
+        self.shared_bytes = 0
+
+
+class TenantRegistry:
+    """Tenants residentes en memoria con expulsión LRU por presupuesto de memoria"""
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, max_tenants=MAX_TENANTS):
+        self.max_bytes = max_bytes
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def checkout(self, tenant_id):
+        """Estado del tenant para una petición; no se expulsa hasta el checkin() correspondiente.
+
+        Así todas las peticiones simultáneas de un tenant comparten el mismo
+        estado (y el mismo lock) aunque el presupuesto se haya excedido.
+        """
+        with self._lock:
+            state = self._tenants.get(tenant_id)
+            if state is None:
+                state = TenantState(tenant_id)
+                self._tenants[tenant_id] = state
+            self._tenants.move_to_end(tenant_id)
+            state.active += 1
+            self._evict(keep=tenant_id)
+            return state
+
+    def checkin(self, state):
+        with self._lock:
+            state.active -= 1
+            # Lo que no se pudo expulsar mientras estaba en uso se expulsa ahora
+            self._evict(keep=None)
+
+    @contextlib.contextmanager
+    def use(self, tenant_id):
+        state = self.checkout(tenant_id)
+        try:
+            yield state
+        finally:
+            self.checkin(state)
+
+    def account(self, tenant_id):
+        """Debe llamarse después de cargar datos para respetar el presupuesto"""
+        with self._lock:
+            self._evict(keep=tenant_id)
+
+    def resident_ids(self):
+        """Tenants con el ledger cargado en memoria"""
+        with self._lock:
+            return [tenant_id for tenant_id, state in self._tenants.items() if state.df is not None]
+
+    def total_bytes(self):
+        return sum(s.memory_bytes for s in self._tenants.values())
+
+    def _evict(self, keep):
+        # Se recorre desde el menos usado; el tenant actual y los que están en uso no se expulsan
+        for tenant_id in list(self._tenants):
+            if len(self._tenants) <= 1 or (
+                len(self._tenants) <= self.max_tenants and self.total_bytes() <= self.max_bytes
+            ):
+                break
+            state = self._tenants[tenant_id]
+            if tenant_id == keep or state.active:
+                continue
+            # Sin peticiones en curso nadie más tiene el estado: se puede vaciar
+            del self._tenants[tenant_id]
+            state.release()
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'resident_tenants': len(self._tenants),
+                'memory_bytes': self.total_bytes(),
+                'index_bytes': sum(s.index_bytes + s.aggregate_bytes for s in self._tenants.values()),
+                'shared_bytes': sum(s.shared_bytes for s in self._tenants.values()),
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+
+class TenantPrefixMiddleware:
+    """Permite seleccionar el tenant con el prefijo /t/<tenant>/ en la ruta.
+
+    El prefijo se elimina y el tenant se pasa como cabecera X-Tenant-ID,
+    así las rutas de Flask no necesitan conocer el prefijo.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(TENANT_PREFIX):
+            tenant_id, _, rest = path[len(TENANT_PREFIX):].partition('/')
+            environ['HTTP_X_TENANT_ID'] = tenant_id
+            environ['PATH_INFO'] = '/' + rest
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + TENANT_PREFIX + tenant_id
+        return self.wsgi_app(environ, start_response)
@@ -0,0 +1,166 @@
+import functools
+import os
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+# Zona horaria de las transacciones; cada tenant puede usar otra con
+# FINSIGHT_TENANT_TIMEZONES="acme=America/Mexico_City,beta=Europe/Madrid"
+DEFAULT_TIMEZONE = os.environ.get('FINSIGHT_TIMEZONE', 'America/Guatemala')
+TENANT_TIMEZONES = dict(
+    item.split('=', 1) for item in os.environ.get('FINSIGHT_TENANT_TIMEZONES', '').split(',') if '=' in item
+)
+
+INPUT_DATE_FORMAT = '%Y-%m-%d'
+DATE_DTYPE = 'datetime64[s]'
+# Lo que sigue a 'YYYY-MM-DD HH:MM:SS' en el CSV: fracción de segundo y offset opcionales
+_SUFFIX_RE = re.compile(r'^(?:\.\d+)?(?:(Z)|([+-])(\d{2}):?(\d{2}))?$')
+
+
+@functools.cache
+def get_zone(name):
+    """ZoneInfo de la zona; se construye una sola vez por nombre"""
+    return ZoneInfo(name)
+
+
+def tenant_timezone(tenant_id):
+    return TENANT_TIMEZONES.get(tenant_id, DEFAULT_TIMEZONE)
+
+
+def zone_label(name):
+    """Nombre corto para mensajes: 'America/Guatemala' -> 'Guatemala'"""
+    return name.rsplit('/', 1)[-1].replace('_', ' ')
+
+
+def is_valid_timezone(name):
+    try:
+        get_zone(name)
+    except (ValueError, LookupError):
+        return False
+    return True
+
+
+def local_now(zone_name):
+    """Hora actual en la zona, sin microsegundos"""
+    return datetime.now(get_zone(zone_name)).replace(microsecond=0)
+
+
+def seconds_of_day(now):
+    return now.hour * 3600 + now.minute * 60 + now.second
+
+
+def stamp(input_date, now):
+    """Fecha del input (YYYY-MM-DD) con la hora de `now`, sin pasar por cadenas.
+
+    Devuelve un datetime local sin zona (la forma del ledger en memoria) o
+    None si la fecha no es válida.
+    """
+    try:
+        day = datetime.strptime(input_date, INPUT_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return day.replace(hour=now.hour, minute=now.minute, second=now.second)
+
+
+def stamp_many(input_dates, now):
+    """Versión vectorizada de stamp(): un arreglo datetime64[s], NaT en las fechas inválidas"""
+    days = pd.to_datetime(pd.Series(input_dates, dtype=object), format=INPUT_DATE_FORMAT, errors='coerce')
+    return days.to_numpy(dtype=DATE_DTYPE) + np.timedelta64(seconds_of_day(now), 's')
+
+
+def localize(dates, zone_name):
+    """Fechas locales sin zona -> fechas con zona, para guardarlas en el CSV.
+
+    Las horas ambiguas (cambio de horario) se toman como horario estándar y
+    las inexistentes se corren a la primera hora válida.
+    """
+    dates = pd.Series(dates)
+    return dates.dt.tz_localize(get_zone(zone_name), ambiguous=np.zeros(len(dates), dtype=bool),
+                                nonexistent='shift_forward')
+
+
+def format_stored(dates, zone_name):
+    """Fechas locales sin zona -> texto del CSV: 'YYYY-MM-DD HH:MM:SS+HH:MM'.
+
+    Mismo texto que escribe to_csv() con las fechas de localize(), sin su
+    costo: la fecha se formatea sin zona y el offset se arma una vez por
+    valor distinto (uno o dos por zona) y se concatena por código.
+    """
+    aware = localize(dates, zone_name)
+    wall = aware.dt.tz_localize(None)
+    offsets = (wall - aware.dt.tz_convert('UTC').dt.tz_localize(None)) // pd.Timedelta(seconds=1)
+    offset_codes, distinct = pd.factorize(offsets)
+    suffixes = np.array([_offset_suffix(seconds) for seconds in distinct], dtype=object)
+    # datetime_as_string() da 'YYYY-MM-DDTHH:MM:SS'
+    text = pd.Series(np.datetime_as_string(wall.to_numpy(dtype=DATE_DTYPE), unit='s'),
+                     index=aware.index, dtype=object)
+    return text.str.replace('T', ' ', regex=False) + suffixes[offset_codes]
+
+
+def _offset_suffix(seconds):
+    sign = '+' if seconds >= 0 else '-'
+    seconds = abs(int(seconds))
+    return f"{sign}{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def has_offsets(values):
+    """Si las fechas del CSV ya traen offset (se revisan la primera y la última)"""
+    if not len(values):
+        return True
+    for value in (values.iloc[0], values.iloc[-1]):
+        match = _SUFFIX_RE.match(str(value)[19:])
+        if match is None or match.group(1, 2) == (None, None):
+            return False
+    return True
+
+
+def to_local(values, zone_name):
+    """Fechas del CSV -> datetime64[s] en hora local de la zona, sin zona.
+
+    Las fechas con offset (formato actual) se convierten a la zona del
+    tenant; las que no lo traen (CSV anteriores) ya son hora local. El
+    offset se interpreta una vez por valor distinto (suelen ser uno o dos
+    por zona), así el costo es el de parsear la parte fija de la fecha.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            values = values.dt.tz_convert(get_zone(zone_name)).dt.tz_localize(None)
+        return values.astype(DATE_DTYPE)
+    text = values.astype(str)
+    suffix_codes, suffixes = pd.factorize(text.str.slice(19))
+    offsets = np.empty(len(suffixes), dtype=np.float64)
+    for i, suffix in enumerate(suffixes):
+        match = _SUFFIX_RE.match(suffix)
+        if match is None:
+            # Formato no reconocido: parseo general, fila por fila
+            return _to_local_slow(text, zone_name)
+        utc, sign, hours, minutes = match.groups()
+        if utc:
+            offsets[i] = 0
+        elif sign:
+            offsets[i] = (1 if sign == '+' else -1) * (int(hours) * 3600 + int(minutes) * 60)
+        else:
+            offsets[i] = np.nan
+    try:
+        wall = pd.to_datetime(text.str.slice(0, 19), format='ISO8601').to_numpy(dtype=DATE_DTYPE)
+    except ValueError:
+        return _to_local_slow(text, zone_name)
+    row_offsets = offsets[suffix_codes]
+    aware = ~np.isnan(row_offsets)
+    if aware.any():
+        instants = wall[aware] - row_offsets[aware].astype('timedelta64[s]')
+        local = (pd.DatetimeIndex(instants).tz_localize('UTC').tz_convert(get_zone(zone_name))
+                 .tz_localize(None).to_numpy(dtype=DATE_DTYPE))
+        wall = wall.copy()
+        wall[aware] = local
+    return pd.Series(wall, index=values.index)
+
+
+def _to_local_slow(text, zone_name):
+    parsed = pd.Series([pd.Timestamp(value) for value in text], index=text.index, dtype=object)
+    zone = get_zone(zone_name)
+    return parsed.map(lambda ts: ts.tz_convert(zone).tz_localize(None) if ts.tzinfo else ts).astype(DATE_DTYPE)
@@ -1,6 +1,10 @@
 import pytest
 import requests
+import json
 import os
+import shutil
+import threading
+import time
 from io import BytesIO
 from PIL import Image
 from datetime import datetime
@@ -347,6 +351,833 @@ class TestBackup:
         assert os.path.exists(BACKUP_FILE), "Archivo de backup no fue creado"
 
 
+# ==================== TESTS DE MULTI-TENANT ====================
+
+class TestTenants:
+    """Tests para el aislamiento de ledgers por tenant"""
+    
+    TENANT = "pytest-tenant"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def test_tenant_header_isolated(self, sample_transactions):
+        """Las transacciones de un tenant no deben verse en otro"""
+        payload = {"type": "ingreso", "amount": 123.0, "description": "Venta tenant", "date": "2025-10-06"}
+        headers = {"X-Tenant-ID": self.TENANT}
+        response = requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers)
+        assert response.status_code == 201
+        
+        tenant_rows = requests.get(f"{BASE_URL}/transactions", headers=headers).json()
+        assert len(tenant_rows) == 1
+        assert tenant_rows[0]["description"] == "Venta tenant"
+        
+        default_rows = requests.get(f"{BASE_URL}/transactions").json()
+        assert all(row["description"] != "Venta tenant" for row in default_rows)
+    
+    def test_tenant_path_prefix(self):
+        """El prefijo /t/<tenant>/ debe seleccionar el mismo ledger que la cabecera"""
+        payload = {"type": "gasto", "amount": 45.0, "description": "Taxi centro", "date": "2025-10-06"}
+        response = requests.post(f"{BASE_URL}/t/{self.TENANT}/transaction", json=payload)
+        assert response.status_code == 201
+        
+        rows = requests.get(f"{BASE_URL}/transactions", headers={"X-Tenant-ID": self.TENANT}).json()
+        assert len(rows) == 1
+        assert rows[0]["category"] == "Transporte"
+    
+    @pytest.mark.parametrize("tenant_id", ["../etc", "con espacio", "a" * 65])
+    def test_invalid_tenant_rejected(self, tenant_id):
+        """Debe rechazar identificadores de tenant invalidos"""
+        response = requests.get(f"{BASE_URL}/transactions", headers={"X-Tenant-ID": tenant_id})
+        assert response.status_code == 400
+        assert "Invalid tenant id" in response.json()["error"]
+
+
+# ==================== TESTS DE ORDEN DEL LEDGER ====================
+
+class TestLedgerOrder:
+    """Tests para verificar que el ledger se mantiene ordenado por fecha"""
+    
+    def test_backdated_insert_keeps_order(self, sample_transactions):
+        """Una transaccion con fecha atrasada debe quedar en su lugar por fecha"""
+        payload = {"type": "gasto", "amount": 80.0, "description": "Cena atrasada", "date": "2025-07-01"}
+        response = requests.post(f"{BASE_URL}/transaction", json=payload)
+        assert response.status_code == 201
+        
+        rows = requests.get(f"{BASE_URL}/transactions").json()
+        dates = [datetime.strptime(row["date"], "%a, %d %b %Y %H:%M:%S GMT") for row in rows]
+        assert dates == sorted(dates)
+        assert rows[0]["description"] == "Cena atrasada"
+
+
+# ==================== TESTS DE CACHE HTTP ====================
+
+class TestResponseCache:
+    """Tests para ETag / If-None-Match en los endpoints de lectura"""
+    
+    @pytest.mark.parametrize("endpoint", ["/analysis", "/alerts", "/reports/monthly-12", "/prediction"])
+    def test_not_modified_with_etag(self, sample_transactions, endpoint):
+        """Debe responder 304 si el cliente ya tiene la version actual"""
+        first = requests.get(f"{BASE_URL}{endpoint}")
+        assert first.status_code == 200
+        etag = first.headers.get("ETag")
+        assert etag and not etag.startswith("W/")
+        
+        second = requests.get(f"{BASE_URL}{endpoint}", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.headers.get("ETag") == etag
+    
+    def test_etag_changes_after_insert(self, sample_transactions):
+        """Una nueva transaccion debe invalidar el ETag anterior"""
+        etag = requests.get(f"{BASE_URL}/analysis").headers["ETag"]
+        payload = {"type": "gasto", "amount": 10.0, "description": "Cafe", "date": "2025-10-06"}
+        assert requests.post(f"{BASE_URL}/transaction", json=payload).status_code == 201
+        
+        response = requests.get(f"{BASE_URL}/analysis", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+# ==================== TESTS DE EVENTOS (SSE) ====================
+
+class TestEvents:
+    """Tests para el canal Server-Sent Events"""
+    
+    def test_insert_pushes_events(self):
+        """Una insercion debe publicar la transaccion y el resumen del mes"""
+        lines = []
+        
+        def listen():
+            with requests.get(f"{BASE_URL}/events", stream=True, timeout=5) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    lines.append(line)
+                    if line.startswith("event: monthly"):
+                        break
+        
+        listener = threading.Thread(target=listen, daemon=True)
+        listener.start()
+        time.sleep(0.5)
+        
+        payload = {"type": "gasto", "amount": 33.0, "description": "Bus urbano", "date": "2025-10-06"}
+        assert requests.post(f"{BASE_URL}/transaction", json=payload).status_code == 201
+        listener.join(timeout=5)
+        
+        assert "event: transaction" in lines
+        assert "event: monthly" in lines
+        data = [line for line in lines if line.startswith("data:")]
+        assert "Bus urbano" in data[0]
+    
+    def test_event_row_matches_transactions(self):
+        """La fila del evento debe ser igual a la de /transactions (mismo formato de fecha)"""
+        lines = []
+        
+        def listen():
+            with requests.get(f"{BASE_URL}/events", stream=True, timeout=5) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    lines.append(line)
+                    if line.startswith("data:") and "Taxi aeropuerto" in line:
+                        break
+        
+        listener = threading.Thread(target=listen, daemon=True)
+        listener.start()
+        time.sleep(0.5)
+        
+        payload = {"type": "gasto", "amount": 41.0, "description": "Taxi aeropuerto", "date": "2025-10-06"}
+        response = requests.post(f"{BASE_URL}/transaction", json=payload)
+        assert response.status_code == 201
+        listener.join(timeout=5)
+        
+        event_row = json.loads(lines[-1][len("data:"):])
+        rows = [row for row in requests.get(f"{BASE_URL}/transactions").json()
+                if row["id"] == response.json()["id"]]
+        assert rows == [event_row]
+
+
+# ==================== TESTS DE ALERTAS INCREMENTALES ====================
+
+class TestIncrementalAlerts:
+    """Tests para las alertas materializadas"""
+    
+    def test_incremental_matches_full_recompute(self, sample_transactions):
+        """Las alertas incrementales deben coincidir con un recalculo completo"""
+        requests.get(f"{BASE_URL}/alerts")
+        for amount in [60.0, 60.0, 15.0]:
+            payload = {"type": "gasto", "amount": amount, "description": "Cena familiar", "date": "2025-10-06"}
+            assert requests.post(f"{BASE_URL}/transaction", json=payload).status_code == 201
+        
+        response = requests.get(f"{BASE_URL}/alerts/verify")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["consistent"], data["differences"]
+        assert data["full_total"] == data["incremental_total"]
+
+
+class TestInstrumentation:
+    """Tests para Server-Timing y /metrics"""
+    
+    def test_server_timing_header(self, sample_transactions):
+        """Las respuestas deben incluir los tiempos por etapa"""
+        response = requests.get(f"{BASE_URL}/analysis")
+        assert response.status_code == 200
+        timing = response.headers.get("Server-Timing", "")
+        assert "load;dur=" in timing
+        assert "total;dur=" in timing
+    
+    def test_metrics_histograms(self, sample_transactions):
+        """El endpoint /metrics debe exponer histogramas por ruta"""
+        requests.get(f"{BASE_URL}/reports/monthly")
+        response = requests.get(f"{BASE_URL}/metrics")
+        assert response.status_code == 200
+        body = response.text
+        assert "# TYPE finsight_request_duration_seconds histogram" in body
+        assert 'route="/reports/monthly"' in body
+        assert "finsight_span_duration_seconds_bucket" in body
+    
+    def test_metrics_ledger_memory(self, sample_transactions):
+        """/metrics separa la memoria propia del ledger de la mapeada desde la version compartida"""
+        requests.get(f"{BASE_URL}/analysis")
+        body = requests.get(f"{BASE_URL}/metrics").text
+        values = {line.split()[0]: float(line.split()[1]) for line in body.splitlines()
+                  if line.startswith("finsight_tenants_")}
+        assert values["finsight_tenants_memory_bytes"] + values["finsight_tenants_shared_bytes"] > 0
+
+
+class TestSerialization:
+    """Tests para los formatos de /transactions"""
+    
+    def test_orient_columns(self, sample_transactions):
+        """orient=columns debe devolver una lista por columna"""
+        records = requests.get(f"{BASE_URL}/transactions").json()
+        response = requests.get(f"{BASE_URL}/transactions?orient=columns")
+        assert response.status_code == 200
+        columns = response.json()
+        assert set(columns) == {"date", "type", "amount", "description", "category", "id"}
+        assert columns["description"] == [r["description"] for r in records]
+        assert columns["date"] == [r["date"] for r in records]
+    
+    def test_orient_invalid(self):
+        """Un orient desconocido debe rechazarse"""
+        response = requests.get(f"{BASE_URL}/transactions?orient=index")
+        assert response.status_code == 400
+
+
+class TestArrowFormat:
+    """Tests para la negociacion de contenido Arrow"""
+    
+    ARROW = "application/vnd.apache.arrow.stream"
+    
+    def test_arrow_or_not_acceptable(self, sample_transactions):
+        """Con pyarrow responde un stream Arrow; sin pyarrow, 406"""
+        for response in (requests.get(f"{BASE_URL}/transactions?format=arrow"),
+                         requests.get(f"{BASE_URL}/reports/monthly-12", headers={"Accept": self.ARROW})):
+            assert response.status_code in (200, 406)
+            if response.status_code == 200:
+                assert response.headers["Content-Type"] == self.ARROW
+    
+    def test_arrow_stream_rows(self, sample_transactions):
+        """El stream Arrow se decodifica con las mismas filas que el JSON"""
+        pa = pytest.importorskip("pyarrow")
+        expected = requests.get(f"{BASE_URL}/transactions").json()
+        for query in ("format=arrow", "format=arrow&compression=zstd"):
+            response = requests.get(f"{BASE_URL}/transactions?{query}")
+            assert response.status_code == 200
+            assert response.headers["Content-Type"] == self.ARROW
+            df = pa.ipc.open_stream(response.content).read_pandas()
+            rows = sorted(zip(df["id"].tolist(), df["description"].astype(str), df["amount"].tolist()))
+            assert rows == sorted((row["id"], row["description"], row["amount"]) for row in expected)
+            assert str(df["category"].dtype) == "category"
+    
+    def test_json_remains_default(self, sample_transactions):
+        """Sin pedir Arrow la respuesta sigue siendo JSON y varia segun Accept"""
+        response = requests.get(f"{BASE_URL}/transactions", headers={"Accept": "*/*"})
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("application/json")
+        assert "Accept" in response.headers.get("Vary", "")
+
+
+class TestCompression:
+    """Tests para la compresion de respuestas"""
+    
+    def test_large_response_gzip(self, sample_transactions):
+        """Respuestas grandes se comprimen si el cliente acepta gzip"""
+        for i in range(30):
+            payload = {"type": "gasto", "amount": 10 + i, "description": f"Compra en supermercado {i}", "date": "2025-10-06"}
+            requests.post(f"{BASE_URL}/transaction", json=payload)
+        plain = requests.get(f"{BASE_URL}/transactions", headers={"Accept-Encoding": "identity"})
+        compressed = requests.get(f"{BASE_URL}/transactions", headers={"Accept-Encoding": "gzip"})
+        assert plain.headers.get("Content-Encoding") is None
+        assert compressed.headers.get("Content-Encoding") == "gzip"
+        assert "Accept-Encoding" in compressed.headers.get("Vary", "")
+        assert compressed.json() == plain.json()
+        assert compressed.headers["ETag"] != plain.headers["ETag"]
+    
+    def test_small_response_not_compressed(self, sample_transactions):
+        """Respuestas bajo el umbral se envian sin comprimir"""
+        response = requests.get(f"{BASE_URL}/reports/comparative", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") is None
+
+
+class TestAlertLocale:
+    """Tests para el idioma de los mensajes de alertas"""
+    
+    def test_locale_changes_messages(self, sample_transactions):
+        """Con locale=en los mensajes cambian pero las alertas son las mismas"""
+        spanish = requests.get(f"{BASE_URL}/alerts").json()
+        english = requests.get(f"{BASE_URL}/alerts?locale=en").json()
+        assert [a["type"] for a in spanish["alerts"]] == [a["type"] for a in english["alerts"]]
+        for es, en in zip(spanish["alerts"], english["alerts"]):
+            assert es["message"] != en["message"]
+    
+    def test_invalid_locale(self, sample_transactions):
+        """Un locale no soportado debe rechazarse"""
+        response = requests.get(f"{BASE_URL}/alerts?locale=xx")
+        assert response.status_code == 400
+
+
+# ==================== TESTS DE FECHAS Y ZONA HORARIA ====================
+
+class TestTimestamps:
+    """Tests para la hora local de las transacciones y las inserciones en lote"""
+    
+    TENANT = "pytest-timestamps"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def test_bulk_insert(self):
+        """Una lista de transacciones se agrega completa en una sola peticion"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [
+            {"type": "ingreso", "amount": 500.0, "description": "Venta", "date": "2025-10-06"},
+            {"type": "gasto", "amount": 30.0, "description": "Taxi", "date": "2025-09-02"},
+        ]
+        response = requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers)
+        assert response.status_code == 201
+        assert response.json()["count"] == 2
+        
+        rows = requests.get(f"{BASE_URL}/transactions", headers=headers).json()
+        assert [row["description"] for row in rows] == ["Taxi", "Venta"]
+    
+    def test_bulk_insert_rejects_invalid_date(self):
+        """Si una fecha del lote es invalida no se agrega ninguna transaccion"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [
+            {"type": "gasto", "amount": 30.0, "description": "Taxi", "date": "2025-09-02"},
+            {"type": "gasto", "amount": 10.0, "description": "Cafe", "date": "2025-13-40"},
+        ]
+        response = requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers)
+        assert response.status_code == 400
+        assert response.json()["index"] == 1
+        assert requests.get(f"{BASE_URL}/transactions", headers=headers).json() == []
+    
+    def test_dates_stored_with_offset(self):
+        """El CSV guarda cada fecha con su offset de zona horaria"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = {"type": "gasto", "amount": 12.0, "description": "Almuerzo", "date": "2025-10-06"}
+        assert requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers).status_code == 201
+        with open(os.path.join("tenants", self.TENANT, "transactions.csv")) as f:
+            stored = f.read().splitlines()[1]
+        assert stored.startswith("2025-10-06 ")
+        assert stored.split(",")[0].endswith("-06:00")
+
+
+# ==================== TESTS DE ANALISIS POR RANGO ====================
+
+class TestRangeAnalysis:
+    """Tests para /analysis con ?from= y ?to="""
+    
+    def test_month_range(self, sample_transactions):
+        """Un mes completo (YYYY-MM) suma solo las transacciones de ese mes"""
+        data = requests.get(f"{BASE_URL}/analysis?from=2025-09&to=2025-09").json()
+        assert data["from"] == "2025-09-01"
+        assert data["to"] == "2025-09-30"
+        assert data["total_income"] == 2000.0
+        assert data["total_expense"] == 100.0
+        assert data["months"] == 1
+        assert data["expenses_by_category"] == {"Alimentacion": 100.0}
+    
+    def test_open_range_matches_full_history(self, sample_transactions):
+        """Sin limite superior el rango cubre todo el historial desde 'from'"""
+        full = requests.get(f"{BASE_URL}/analysis").json()
+        ranged = requests.get(f"{BASE_URL}/analysis?from=2000-01-01").json()
+        assert ranged["total_income"] == round(full["total_income"], 2)
+        assert ranged["total_expense"] == round(full["total_expense"], 2)
+        assert ranged["avg_monthly_expense"] == round(full["avg_monthly_expense"], 2)
+    
+    def test_day_range(self, sample_transactions):
+        """Los limites con dia son inclusivos"""
+        data = requests.get(f"{BASE_URL}/analysis?from=2025-10-04&to=2025-10-05").json()
+        assert data["total_expense"] == 70.0
+        assert data["transactions"] == 2
+    
+    @pytest.mark.parametrize("query", ["from=2025-13-01", "to=ayer", "from=2025-10&to=2025-09"])
+    def test_invalid_range(self, query):
+        """Fechas invalidas o rangos invertidos deben rechazarse"""
+        response = requests.get(f"{BASE_URL}/analysis?{query}")
+        assert response.status_code == 400
+
+
+# ==================== TESTS DE GASTOS REPETIDOS ====================
+
+class TestHabitWindows:
+    """Tests para /reports/habits con ventanas de meses"""
+    
+    TENANT = "pytest-habits"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def test_counts_normalized_descriptions(self):
+        """Descripciones que solo difieren en mayusculas o espacios se cuentan juntas"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [
+            {"type": "gasto", "amount": 5.0, "description": "Cafe ", "date": "2025-10-06"},
+            {"type": "gasto", "amount": 5.0, "description": "cafe", "date": "2025-09-05"},
+            {"type": "gasto", "amount": 90.0, "description": "Cena", "date": "2025-09-10"},
+            {"type": "ingreso", "amount": 900.0, "description": "Cafe", "date": "2025-09-11"},
+        ]
+        assert requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers).status_code == 201
+        data = requests.get(f"{BASE_URL}/reports/habits?scope=all", headers=headers).json()
+        assert data["exact"] is True
+        assert data["repeated_expenses"] == {"cafe": 2, "cena": 1}
+    
+    def test_window_updates_on_insert(self):
+        """Una transaccion nueva se refleja en la ventana que la contiene"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        tx = {"type": "gasto", "amount": 5.0, "description": "Cafe", "date": "2025-09-05"}
+        requests.post(f"{BASE_URL}/transaction", json=tx, headers=headers)
+        first = requests.get(f"{BASE_URL}/reports/habits?from=2025-09&to=2025-09", headers=headers).json()
+        requests.post(f"{BASE_URL}/transaction", json=tx, headers=headers)
+        second = requests.get(f"{BASE_URL}/reports/habits?from=2025-09&to=2025-09", headers=headers).json()
+        assert second["repeated_expenses"]["cafe"] == first["repeated_expenses"]["cafe"] + 1
+        outside = requests.get(f"{BASE_URL}/reports/habits?from=2025-10", headers=headers).json()
+        assert outside["repeated_expenses"] == {}
+    
+    @pytest.mark.parametrize("query", ["from=2025-9x", "top=0", "scope=month", "from=2025-10&to=2025-09"])
+    def test_invalid_window(self, query):
+        """Parametros invalidos deben rechazarse"""
+        response = requests.get(f"{BASE_URL}/reports/habits?{query}")
+        assert response.status_code == 400
+
+
+# ==================== TESTS DE BUSQUEDA ====================
+
+class TestSearch:
+    """Tests para GET /transactions/search"""
+    
+    def test_accent_and_case_insensitive(self, sample_transactions):
+        """La busqueda ignora mayusculas y acentos"""
+        rows = requests.get(f"{BASE_URL}/transactions/search?q=SPOTIFY").json()
+        assert len(rows) == 1
+        assert rows[0]["description"].startswith("Spotify")
+    
+    def test_substring_and_prefix(self, sample_transactions):
+        """Subcadena en cualquier parte; prefix solo al inicio de una palabra"""
+        substring = requests.get(f"{BASE_URL}/transactions/search?q=taurante").json()
+        assert [row["description"] for row in substring] == ["Cena en restaurante"]
+        prefix = requests.get(f"{BASE_URL}/transactions/search?q=taurante&mode=prefix").json()
+        assert prefix == []
+    
+    def test_combined_filters(self, sample_transactions):
+        """La busqueda se combina con fechas, categoria y tipo"""
+        rows = requests.get(f"{BASE_URL}/transactions/search?q=n&from=2025-09&to=2025-09").json()
+        assert {row["description"] for row in rows} == {"Bono", "Cena en restaurante"}
+        rows = requests.get(f"{BASE_URL}/transactions/search?q=n&from=2025-09&to=2025-09&type=gasto").json()
+        assert [row["description"] for row in rows] == ["Cena en restaurante"]
+        rows = requests.get(f"{BASE_URL}/transactions/search?q=a&category=Transporte").json()
+        assert all(row["category"] == "Transporte" for row in rows)
+    
+    def test_new_transactions_are_searchable(self, sample_transactions):
+        """Una descripcion nueva aparece en la busqueda sin reconstruir el indice"""
+        requests.get(f"{BASE_URL}/transactions/search?q=kiosco")
+        tx = {"type": "gasto", "amount": 3.0, "description": "Kiosco Café", "date": "2025-10-06"}
+        assert requests.post(f"{BASE_URL}/transaction", json=tx).status_code == 201
+        rows = requests.get(f"{BASE_URL}/transactions/search?q=kiosco CAFE").json()
+        assert [row["description"] for row in rows] == ["Kiosco Café"]
+    
+    @pytest.mark.parametrize("query", ["", "q=%20", "q=pan&mode=fuzzy", "q=pan&limit=0"])
+    def test_invalid_search(self, query):
+        """Consultas vacias o parametros invalidos deben rechazarse"""
+        response = requests.get(f"{BASE_URL}/transactions/search?{query}")
+        assert response.status_code == 400
+
+
+# ==================== TESTS DE SNAPSHOTS DE MESES CERRADOS ====================
+
+class TestClosedMonthSnapshots:
+    """Tests para los reportes servidos desde snapshots de meses cerrados"""
+    
+    TENANT = "pytest-snapshots"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def previous_month(self):
+        today = datetime.now()
+        year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        return f"{year:04d}-{month:02d}-10"
+    
+    def test_backdated_insert_updates_closed_month(self):
+        """Una transaccion atrasada reemplaza el snapshot de su mes"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        date = self.previous_month()
+        tx = {"type": "gasto", "amount": 40.0, "description": "Taxi", "date": date}
+        assert requests.post(f"{BASE_URL}/transaction", json=tx, headers=headers).status_code == 201
+        before = requests.get(f"{BASE_URL}/reports/monthly-12", headers=headers).json()
+        assert before["monthly_data"][10]["expense"] == 40.0
+        
+        tx = {"type": "gasto", "amount": 60.0, "description": "Netflix", "date": date}
+        assert requests.post(f"{BASE_URL}/transaction", json=tx, headers=headers).status_code == 201
+        after = requests.get(f"{BASE_URL}/reports/monthly-12", headers=headers).json()
+        assert after["monthly_data"][10]["expense"] == 100.0
+        assert after["monthly_data"][10]["top_category"] == "Entretenimiento"
+        assert after["summary"]["top_category"] == "Entretenimiento"
+    
+    def test_graphs_include_closed_and_open_months(self):
+        """Las graficas se generan con meses cerrados y el mes abierto"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [
+            {"type": "gasto", "amount": 40.0, "description": "Taxi", "date": self.previous_month()},
+            {"type": "ingreso", "amount": 400.0, "description": "Venta", "date": datetime.now().strftime("%Y-%m-%d")},
+        ]
+        assert requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers).status_code == 201
+        for graph in ("bar", "line"):
+            response = requests.get(f"{BASE_URL}/graphs/{graph}", headers=headers)
+            assert response.status_code == 200
+            assert response.headers["Content-Type"] == "image/png"
+
+
+class TestJobs:
+    """Tests para las tareas en segundo plano (/jobs)"""
+    
+    def wait_for_run(self, name, runs, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = requests.get(f"{BASE_URL}/jobs/{name}").json()
+            if job["runs"] > runs and not job["running"]:
+                return job
+            time.sleep(0.1)
+        pytest.fail(f"La tarea {name} no se ejecuto")
+    
+    def test_jobs_listed(self):
+        """GET /jobs lista las tareas con su intervalo"""
+        response = requests.get(f"{BASE_URL}/jobs")
+        assert response.status_code == 200
+        jobs = {job["name"]: job for job in response.json()["jobs"]}
+        assert {"rollover", "precompute", "compact", "prune_backups"} <= set(jobs)
+        assert jobs["compact"]["idle_only"] is True
+        assert jobs["precompute"]["interval_seconds"] > 0
+    
+    def test_run_job_on_demand(self):
+        """POST /jobs/<nombre>/run ejecuta la tarea y actualiza su estado"""
+        runs = requests.get(f"{BASE_URL}/jobs/precompute").json()["runs"]
+        response = requests.post(f"{BASE_URL}/jobs/precompute/run")
+        assert response.status_code in (200, 202)
+        job = self.wait_for_run("precompute", runs)
+        assert job["last_error"] is None
+        assert "tenants" in job["last_result"]
+    
+    def test_unknown_job(self):
+        """Una tarea inexistente devuelve 404"""
+        assert requests.get(f"{BASE_URL}/jobs/nope").status_code == 404
+        assert requests.post(f"{BASE_URL}/jobs/nope/run").status_code == 404
+    
+    def test_job_metrics(self):
+        """/metrics expone las ejecuciones de cada tarea"""
+        body = requests.get(f"{BASE_URL}/metrics").text
+        assert 'finsight_job_runs{job="rollover"}' in body
+
+
+class TestPdfReport:
+    """Tests para el reporte PDF generado en el servidor"""
+    
+    TENANT = "pytest-pdf"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def test_pdf_report(self):
+        """GET /reports/pdf devuelve un PDF y revalida con ETag"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [
+            {"type": "gasto", "amount": 40.0, "description": "Taxi", "date": datetime.now().strftime("%Y-%m-%d")},
+            {"type": "ingreso", "amount": 400.0, "description": "Venta", "date": datetime.now().strftime("%Y-%m-%d")},
+        ]
+        assert requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers).status_code == 201
+        response = requests.get(f"{BASE_URL}/reports/pdf", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/pdf"
+        assert response.content.startswith(b"%PDF")
+        
+        cached = requests.get(f"{BASE_URL}/reports/pdf",
+                              headers={**headers, "If-None-Match": response.headers["ETag"]})
+        assert cached.status_code == 304
+    
+    def test_pdf_report_without_data(self):
+        """Sin transacciones no hay reporte"""
+        response = requests.get(f"{BASE_URL}/reports/pdf", headers={"X-Tenant-ID": self.TENANT})
+        assert response.status_code == 404
+    
+    def test_pdf_report_invalid_locale(self):
+        """Un locale no soportado devuelve 400"""
+        response = requests.get(f"{BASE_URL}/reports/pdf?locale=xx", headers={"X-Tenant-ID": self.TENANT})
+        assert response.status_code == 400
+
+
+class TestRollups:
+    """Tests para /analysis y las graficas con ?granularity="""
+    
+    TENANT = "pytest-rollups"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def post(self, payload):
+        response = requests.post(f"{BASE_URL}/transaction", json=payload, headers={"X-Tenant-ID": self.TENANT})
+        assert response.status_code == 201
+    
+    def analysis(self, query):
+        return requests.get(f"{BASE_URL}/analysis?{query}", headers={"X-Tenant-ID": self.TENANT})
+    
+    def test_periods_by_level(self):
+        """Cada nivel agrupa las transacciones en sus periodos"""
+        self.post([
+            {"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-01-02"},
+            {"type": "gasto", "amount": 20.0, "description": "Taxi", "date": "2024-02-14"},
+            {"type": "ingreso", "amount": 100.0, "description": "Venta", "date": "2024-05-01"},
+            {"type": "gasto", "amount": 5.0, "description": "Taxi", "date": "2025-03-03"},
+        ])
+        quarters = self.analysis("granularity=quarter").json()["periods"]
+        assert [(p["period"], p["expense"], p["income"]) for p in quarters] == [
+            ("2024-Q1", 30.0, 0.0), ("2024-Q2", 0.0, 100.0), ("2025-Q1", 5.0, 0.0)]
+        years = self.analysis("granularity=year").json()["periods"]
+        assert [(p["period"], p["net"], p["transactions"]) for p in years] == [("2024", 70.0, 3), ("2025", -5.0, 1)]
+        weeks = self.analysis("granularity=week").json()["periods"]
+        assert weeks[0]["period"] == "2024-W01"
+        assert weeks[0]["start"] == "2024-01-01"
+    
+    def test_range_cuts_edge_periods(self):
+        """Con from/to los periodos de los bordes solo suman los dias del rango"""
+        self.post([
+            {"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-01-10"},
+            {"type": "gasto", "amount": 20.0, "description": "Taxi", "date": "2024-01-20"},
+            {"type": "gasto", "amount": 40.0, "description": "Taxi", "date": "2024-02-20"},
+        ])
+        data = self.analysis("granularity=month&from=2024-01-15&to=2024-02-29").json()
+        assert [(p["period"], p["start"], p["expense"]) for p in data["periods"]] == [
+            ("2024-01", "2024-01-15", 20.0), ("2024-02", "2024-02-01", 40.0)]
+    
+    def test_rollups_follow_new_transactions(self):
+        """Una transaccion nueva se suma al periodo de cada nivel"""
+        self.post({"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-01-10"})
+        assert self.analysis("granularity=year").json()["periods"][0]["expense"] == 10.0
+        self.post({"type": "gasto", "amount": 15.0, "description": "Taxi", "date": "2024-07-10"})
+        assert self.analysis("granularity=year").json()["periods"][0]["expense"] == 25.0
+        assert len(self.analysis("granularity=quarter").json()["periods"]) == 2
+    
+    def test_graphs_with_granularity(self):
+        """Las graficas de barras y lineas aceptan ?granularity="""
+        self.post({"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-01-10"})
+        headers = {"X-Tenant-ID": self.TENANT}
+        for graph in ("bar", "line"):
+            response = requests.get(f"{BASE_URL}/graphs/{graph}?granularity=week", headers=headers)
+            assert response.status_code == 200
+            assert response.headers["Content-Type"] == "image/png"
+    
+    def test_invalid_granularity(self):
+        """Un nivel desconocido devuelve 400"""
+        assert self.analysis("granularity=hour").status_code == 400
+        response = requests.get(f"{BASE_URL}/graphs/bar?granularity=hour", headers={"X-Tenant-ID": self.TENANT})
+        assert response.status_code == 400
+
+
+class TestTransactionEdits:
+    """Tests para PUT y DELETE /transaction/<id>"""
+    
+    TENANT = "pytest-edits"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def url(self, path):
+        return f"{BASE_URL}{path}"
+    
+    def headers(self):
+        return {"X-Tenant-ID": self.TENANT}
+    
+    def post(self, payload):
+        response = requests.post(self.url("/transaction"), json=payload, headers=self.headers())
+        assert response.status_code == 201
+        return response.json()
+    
+    def test_post_returns_ids(self):
+        """POST devuelve el id asignado y /transactions lo incluye"""
+        first = self.post({"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-03-01"})
+        batch = self.post([
+            {"type": "gasto", "amount": 20.0, "description": "Taxi", "date": "2024-03-02"},
+            {"type": "ingreso", "amount": 100.0, "description": "Venta", "date": "2024-03-03"},
+        ])
+        assert batch["ids"] == [first["id"] + 1, first["id"] + 2]
+        transactions = requests.get(self.url("/transactions"), headers=self.headers()).json()
+        assert [t["id"] for t in transactions] == [first["id"]] + batch["ids"]
+    
+    def test_update_transaction(self):
+        """PUT corrige los campos indicados y los reportes lo reflejan"""
+        ids = self.post([
+            {"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-03-01"},
+            {"type": "ingreso", "amount": 100.0, "description": "Venta", "date": "2024-03-03"},
+        ])["ids"]
+        requests.get(self.url("/analysis"), headers=self.headers())
+        response = requests.put(self.url(f"/transaction/{ids[0]}"), json={"amount": 30.0, "description": "Netflix"},
+                                headers=self.headers())
+        assert response.status_code == 200
+        transaction = response.json()["transaction"]
+        assert transaction["id"] == ids[0]
+        assert transaction["amount"] == 30.0
+        assert transaction["category"] == "Entretenimiento"
+        analysis = requests.get(self.url("/analysis"), headers=self.headers()).json()
+        assert analysis["total_expense"] == 30.0
+        months = requests.get(self.url("/analysis?granularity=month"), headers=self.headers()).json()["periods"]
+        assert months[0]["top_category"] == "Entretenimiento"
+    
+    def test_delete_transaction(self):
+        """DELETE quita la transacción; un segundo DELETE devuelve 404"""
+        ids = self.post([
+            {"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-03-01"},
+            {"type": "gasto", "amount": 20.0, "description": "Taxi", "date": "2024-04-01"},
+        ])["ids"]
+        months = requests.get(self.url("/analysis?granularity=month"), headers=self.headers()).json()["periods"]
+        assert len(months) == 2
+        assert requests.delete(self.url(f"/transaction/{ids[1]}"), headers=self.headers()).status_code == 200
+        months = requests.get(self.url("/analysis?granularity=month"), headers=self.headers()).json()["periods"]
+        assert [(p["period"], p["expense"]) for p in months] == [("2024-03", 10.0)]
+        assert requests.delete(self.url(f"/transaction/{ids[1]}"), headers=self.headers()).status_code == 404
+    
+    def test_invalid_update(self):
+        """Un PUT con datos inválidos o sin campos devuelve 400; un id inexistente, 404"""
+        transaction_id = self.post({"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-03-01"})["id"]
+        for payload in ({"amount": -5}, {"type": "otro"}, {"date": "2024-13-01"}, {},
+                        {"amount": None}, {"amount": [5]}, {"amount": "abc"}, {"description": 123},
+                        {"description": None}, {"date": 20240301}):
+            response = requests.put(self.url(f"/transaction/{transaction_id}"), json=payload, headers=self.headers())
+            assert response.status_code == 400
+        response = requests.put(self.url("/transaction/999999"), json={"amount": 5}, headers=self.headers())
+        assert response.status_code == 404
+    
+    def test_compaction_keeps_ids(self):
+        """La tarea compact escribe los cambios en el archivo; los ids borrados no se reutilizan"""
+        ids = self.post([
+            {"type": "gasto", "amount": 10.0, "description": "Taxi", "date": "2024-03-01"},
+            {"type": "gasto", "amount": 20.0, "description": "Taxi", "date": "2024-03-02"},
+        ])["ids"]
+        requests.put(self.url(f"/transaction/{ids[0]}"), json={"amount": 15.0}, headers=self.headers())
+        requests.delete(self.url(f"/transaction/{ids[1]}"), headers=self.headers())
+        runs = requests.get(self.url("/jobs/compact")).json()["runs"]
+        assert requests.post(self.url("/jobs/compact/run")).status_code in (200, 202)
+        TestJobs().wait_for_run("compact", runs)
+        with open(os.path.join("tenants", self.TENANT, "transactions.csv"), encoding="utf-8") as f:
+            stored = f.read()
+        assert "15.0" in stored
+        assert len(stored.strip().splitlines()) == 2
+        assert self.post({"type": "gasto", "amount": 5.0, "description": "Taxi", "date": "2024-03-03"})["id"] == ids[1] + 1
+    
+    def test_search_after_deleting_all(self):
+        """Borrar todas las transacciones no debe mezclar descripciones en la búsqueda"""
+        ids = [self.post({"type": "gasto", "amount": 10.0, "description": description, "date": "2024-03-01"})["id"]
+               for description in ("alquiler local", "pago luz")]
+        requests.get(self.url("/transactions/search?q=alquiler"), headers=self.headers())
+        for transaction_id in ids:
+            assert requests.delete(self.url(f"/transaction/{transaction_id}"), headers=self.headers()).status_code == 200
+        self.post({"type": "gasto", "amount": 30.0, "description": "zapatos nuevos", "date": "2024-03-02"})
+        found = requests.get(self.url("/transactions/search?q=zapatos"), headers=self.headers()).json()
+        assert [row["description"] for row in found] == ["zapatos nuevos"]
+        assert requests.get(self.url("/transactions/search?q=alquiler"), headers=self.headers()).json() == []
+
+
+class TestSingleFlight:
+    """Tests para el agrupamiento de peticiones identicas simultaneas"""
+    
+    TENANT = "pytest-single-flight"
+    
+    @pytest.fixture(autouse=True)
+    def clean_tenant_dir(self):
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+        yield
+        shutil.rmtree(os.path.join("tenants", self.TENANT), ignore_errors=True)
+    
+    def single_flight_stats(self):
+        body = requests.get(f"{BASE_URL}/metrics").text
+        return {line.split()[0]: float(line.split()[1]) for line in body.splitlines()
+                if line.startswith("finsight_single_flight_")}
+    
+    def test_concurrent_requests_share_result(self):
+        """Peticiones identicas simultaneas reciben la misma respuesta con un solo calculo"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        payload = [{"type": "gasto", "amount": float(i + 1), "description": "Taxi",
+                    "date": f"2024-{i % 12 + 1:02d}-10"} for i in range(120)]
+        assert requests.post(f"{BASE_URL}/transaction", json=payload, headers=headers).status_code == 201
+        before = self.single_flight_stats()
+        barrier = threading.Barrier(6)
+        etags = []
+        
+        def fetch():
+            barrier.wait()
+            response = requests.get(f"{BASE_URL}/graphs/bar", headers=headers)
+            etags.append((response.status_code, response.headers.get("ETag")))
+        
+        threads = [threading.Thread(target=fetch) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(etags) == 6
+        assert len(set(etags)) == 1
+        assert etags[0][0] == 200
+        after = self.single_flight_stats()
+        # Las que no esperaron el calculo en curso lo encontraron ya en la cache
+        assert 1 <= after["finsight_single_flight_leaders"] - before["finsight_single_flight_leaders"] <= 6
+        assert after["finsight_single_flight_in_flight"] == 0
+    
+    def test_coalesced_errors(self):
+        """Un error del calculo compartido llega a cada peticion"""
+        headers = {"X-Tenant-ID": self.TENANT}
+        barrier = threading.Barrier(4)
+        statuses = []
+        
+        def fetch():
+            barrier.wait()
+            statuses.append(requests.get(f"{BASE_URL}/alerts?locale=xx", headers=headers).status_code)
+        
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert statuses == [400] * 4
+
+
 # ==================== CONFIGURACIÃ“N DE PYTEST ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,323 @@
+"""Tests de los módulos internos que no dependen del servidor en marcha.
+
+Se ejecutan con el resto de la suite: uv run pytest tests/
+"""
+import os
+import shutil
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import events  # noqa: E402
+import ledger  # noqa: E402
+import shared_ledger  # noqa: E402
+from tenants import TenantRegistry  # noqa: E402
+from timestamps import format_stored, localize  # noqa: E402
+
+
+# ==================== TESTS DE EXPULSION DE TENANTS ====================
+
+class TestTenantEviction:
+    """Tests para la expulsion LRU con peticiones en curso"""
+
+    def test_tenant_in_use_is_not_evicted(self):
+        """Un tenant con una peticion en curso conserva su estado y su lock"""
+        registry = TenantRegistry(max_tenants=1)
+        state_a = registry.checkout('a')
+        state_a.df = object()
+        with state_a.lock:
+            other = registry.checkout('b')
+            again = registry.checkout('a')
+            assert again is state_a
+            assert state_a.df is not None
+            registry.checkin(again)
+            registry.checkin(other)
+        registry.checkin(state_a)
+
+    def test_evicted_after_checkin(self):
+        """Al terminar la ultima peticion el tenant excedente se expulsa"""
+        registry = TenantRegistry(max_tenants=1)
+        state_a = registry.checkout('a')
+        with registry.use('b'):
+            assert registry.stats()['resident_tenants'] == 2
+        registry.checkin(state_a)
+        assert registry.stats()['resident_tenants'] == 1
+        assert registry.stats()['evictions'] == 1
+
+    def test_concurrent_writers_share_lock(self):
+        """Dos escritores del mismo tenant se serializan aunque otro tenant fuerce expulsiones"""
+        registry = TenantRegistry(max_tenants=1)
+        counter = {'value': 0}
+
+        def writer():
+            for _ in range(200):
+                with registry.use('a') as state, state.lock:
+                    value = counter['value']
+                    with registry.use('b'):
+                        pass
+                    counter['value'] = value + 1
+
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counter['value'] == 800
+
+
+# ==================== TESTS DE FECHAS EN EL CSV ====================
+
+class TestStoredDates:
+    """Tests para el texto de las fechas que se guarda en el CSV"""
+
+    def test_same_text_as_localized_csv(self):
+        """format_stored() escribe lo mismo que to_csv() con fechas con zona, incluido el cambio de horario"""
+        dates = pd.Series(pd.to_datetime([
+            '2024-01-15 08:30:00', '2024-03-31 02:30:00', '2024-07-01 23:59:59',
+            '2024-10-27 02:30:00', '2024-12-31 00:00:00',
+        ])).astype('datetime64[s]')
+        for zone in ('America/Guatemala', 'Europe/Madrid', 'America/St_Johns', 'UTC'):
+            expected = pd.DataFrame({'date': localize(dates, zone)}).to_csv(index=False)
+            assert pd.DataFrame({'date': format_stored(dates, zone)}).to_csv(index=False) == expected
+
+    def test_empty_ledger(self):
+        """Un ledger vacío no tiene fechas que formatear"""
+        assert format_stored(pd.Series([], dtype='datetime64[s]'), 'Europe/Madrid').tolist() == []
+
+
+# ==================== TESTS DEL LEDGER COMPARTIDO ====================
+
+class TestSharedLedger:
+    """Tests para publish()/attach() en un FINSIGHT_SHARED_LEDGER temporal"""
+
+    TENANT = "pytest-shared"
+    SIGNATURE = ((1700000000.0, 321), None)
+
+    @pytest.fixture(autouse=True)
+    def shared_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(shared_ledger, "SHARED_DIR", str(tmp_path))
+        return tmp_path
+
+    def encoded(self):
+        return ledger.encode(pd.DataFrame({
+            "date": ["2025-09-30 18:00:00-06:00", "2025-10-01 09:15:00-06:00", "2025-10-02 12:00:00-06:00"],
+            "type": ["ingreso", "gasto", "gasto"],
+            "amount": ["1500.0", "42.5", "18.0"],
+            "description": ["Salario", "Supermercado", "Café"],
+            "category": ["Salario", "Alimentación", "Otros gastos"],
+            "id": ["1", "2", "3"],
+        }))
+
+    def test_round_trip(self):
+        """attach() devuelve el mismo ledger, con los tipos y categorías de encode()"""
+        df = self.encoded()
+        shared_ledger.publish(self.TENANT, df, self.SIGNATURE, next_id=4)
+        attached, manifest = shared_ledger.attach(self.TENANT, self.SIGNATURE)
+        pd.testing.assert_frame_equal(attached, df)
+        for column in ("type", "description", "category"):
+            assert attached[column].cat.categories.equals(df[column].cat.categories)
+        assert manifest["next_id"] == 4
+        assert shared_ledger.mapped_bytes(attached) > 0
+
+    def test_changed_signature(self):
+        """Con otra firma (el CSV cambió) no se mapea nada y el loader vuelve al CSV"""
+        shared_ledger.publish(self.TENANT, self.encoded(), self.SIGNATURE)
+        changed = ((1700000001.0, 360), None)
+        assert shared_ledger.attach(self.TENANT, changed) == (None, None)
+
+    def test_version_removed_before_mapping(self, shared_dir, monkeypatch):
+        """Una versión borrada entre leer current.json y mapearla devuelve (None, None)"""
+        shared_ledger.publish(self.TENANT, self.encoded(), self.SIGNATURE)
+        read_manifest = shared_ledger.read_manifest
+
+        def read_then_prune(tenant_id):
+            manifest = read_manifest(tenant_id)
+            shutil.rmtree(shared_dir / tenant_id / manifest["path"])
+            return manifest
+
+        monkeypatch.setattr(shared_ledger, "read_manifest", read_then_prune)
+        assert shared_ledger.attach(self.TENANT, self.SIGNATURE) == (None, None)
+
+
+# ==================== TESTS DEL CANAL DE EVENTOS ====================
+
+class TestEventReplay:
+    """Tests para la reconexión con Last-Event-ID en EventBus"""
+
+    TENANT = "pytest-events"
+
+    def test_replays_missed_events(self):
+        """Los eventos publicados mientras el cliente se reconectaba se reenvían en orden"""
+        bus = events.EventBus()
+        q, backlog = bus.subscribe(self.TENANT, 10)
+        assert backlog == []
+        bus.publish(self.TENANT, 'transaction', {"id": 1}, event_id=11)
+        bus.unsubscribe(self.TENANT, q)
+        bus.publish(self.TENANT, 'transaction_updated', {"id": 1}, event_id=12)
+        bus.publish(self.TENANT, 'monthly', {"month": "2025-10"}, event_id=12)
+        _, backlog = bus.subscribe(self.TENANT, 12, last_event_id=11)
+        assert [message.split('\n')[:2] for message in backlog] == [
+            ['id: 12', 'event: transaction_updated'], ['id: 12', 'event: monthly']]
+
+    def test_up_to_date_client(self):
+        """Un cliente que ya vio la última versión no recibe nada extra"""
+        bus = events.EventBus()
+        bus.subscribe(self.TENANT, 10)
+        bus.publish(self.TENANT, 'transaction', {"id": 1}, event_id=11)
+        assert bus.subscribe(self.TENANT, 11, last_event_id=11)[1] == []
+
+    def test_unpublished_change_requests_resync(self):
+        """Un cambio sin suscriptores no queda en la historia: el cliente recibe 'resync'"""
+        bus = events.EventBus()
+        q, _ = bus.subscribe(self.TENANT, 10)
+        bus.unsubscribe(self.TENANT, q)
+        assert not bus.has_subscribers(self.TENANT)
+        _, backlog = bus.subscribe(self.TENANT, 13, last_event_id=10)
+        assert backlog == [events.format_sse('resync', {"version": 13}, 13)]
+
+    def test_trimmed_history_requests_resync(self, monkeypatch):
+        """Si la historia ya descartó eventos posteriores a Last-Event-ID se pide resync"""
+        monkeypatch.setattr(events, 'HISTORY_SIZE', 2)
+        bus = events.EventBus()
+        bus.subscribe(self.TENANT, 10)
+        for version in (11, 12, 13):
+            bus.publish(self.TENANT, 'transaction', {"id": version}, event_id=version)
+        assert 'event: resync' in bus.subscribe(self.TENANT, 13, last_event_id=10)[1][0]
+        assert len(bus.subscribe(self.TENANT, 13, last_event_id=11)[1]) == 2
+
+    def test_unknown_event_id(self):
+        """Una cabecera que no es un id de este servidor se trata como conexión nueva"""
+        assert events.parse_event_id('abc') is None
+        assert events.parse_event_id(None) is None
+        assert events.parse_event_id('42') == 42
+
+
+# ==================== TESTS DE LA APP EN PROCESO ====================
+
+@pytest.fixture
+def app_client(tmp_path, monkeypatch):
+    """main y su test client, con el almacenamiento en un directorio temporal y sin tareas de fondo"""
+    monkeypatch.setenv('FINSIGHT_SCHEDULER', '0')
+    monkeypatch.chdir(tmp_path)
+    import main
+    main.response_cache.clear()
+    return main, main.app.test_client()
+
+
+def post_sample(client, tenant_id):
+    for kind, amount, description in (('ingreso', 2000.0, 'Salario'), ('gasto', 120.0, 'Supermercado'),
+                                      ('gasto', 35.0, 'Taxi')):
+        response = client.post('/transaction', headers={'X-Tenant-ID': tenant_id},
+                               json={'type': kind, 'amount': amount, 'description': description,
+                                     'date': '2025-10-06'})
+        assert response.status_code == 201
+
+
+class TestNestedRequests:
+    """Tests para las peticiones internas hechas dentro de otra petición"""
+
+    def test_pdf_report_checks_tenant_in(self, app_client):
+        """/reports/pdf devuelve el tenant al registro aunque arme el PDF con peticiones internas"""
+        main, client = app_client
+        post_sample(client, 'pytest-pdf')
+        response = client.get('/reports/pdf', headers={'X-Tenant-ID': 'pytest-pdf'})
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/pdf'
+        assert 'render;dur=' in response.headers['Server-Timing']
+        assert main.tenants._tenants['pytest-pdf'].active == 0
+
+    def test_jobs_in_request_keep_checkouts(self, app_client):
+        """Las tareas ejecutadas dentro de POST /jobs/<nombre>/run no alteran el tenant de la petición"""
+        main, client = app_client
+        post_sample(client, 'pytest-jobs')
+        for name in ('rollover', 'precompute', 'compact'):
+            response = client.post(f'/jobs/{name}/run', headers={'X-Tenant-ID': 'pytest-jobs-caller'})
+            assert response.status_code == 200
+            assert response.get_json()['last_error'] is None
+        assert {tenant_id: state.active for tenant_id, state in main.tenants._tenants.items()
+                if tenant_id.startswith('pytest-jobs')} == {'pytest-jobs': 0, 'pytest-jobs-caller': 0}
+
+
+class TestWarmCaches:
+    """Tests para el precálculo de respuestas al cambiar el día"""
+
+    def test_pie_without_expenses(self, app_client):
+        """Un tenant con solo ingresos no tiene gráfica de gastos: 404 en lugar de un error"""
+        _, client = app_client
+        response = client.post('/transaction', headers={'X-Tenant-ID': 'pytest-income'},
+                                json={'type': 'ingreso', 'amount': 900.0, 'description': 'Venta', 'date': '2025-10-06'})
+        assert response.status_code == 201
+        assert client.get('/graphs/pie', headers={'X-Tenant-ID': 'pytest-income'}).status_code == 404
+
+    def test_failing_path_does_not_stop_warm_up(self, app_client, monkeypatch):
+        """Una ruta que falla se cuenta y el resto de rutas y tenants se sigue calentando"""
+        main, client = app_client
+        for tenant_id in ('pytest-warm-a', 'pytest-warm-b'):
+            post_sample(client, tenant_id)
+        internal_get = main.internal_get
+
+        def failing_get(tenant_id, path):
+            if path == '/graphs/line':
+                raise ValueError('render failed')
+            return internal_get(tenant_id, path)
+
+        monkeypatch.setattr(main, 'internal_get', failing_get)
+        warmed, failures = main.warm_caches(['pytest-warm-a', 'pytest-warm-b'])
+        assert warmed == 2 * (len(main.WARM_PATHS) - 1)
+        assert [(f['tenant'], f['path']) for f in failures] == [
+            ('pytest-warm-a', '/graphs/line'), ('pytest-warm-b', '/graphs/line')]
+
+
+class TestSchedulerStart:
+    """Tests para el inicio del hilo de tareas"""
+
+    def test_status_when_disabled(self, app_client):
+        """Con FINSIGHT_SCHEDULER=0 /jobs y /metrics indican que el hilo no corre"""
+        main, client = app_client
+        status = client.get('/jobs').get_json()
+        assert (status['enabled'], status['running']) == (False, False)
+        assert 'finsight_scheduler_running 0' in client.get('/metrics').get_data(as_text=True)
+
+    def test_first_request_starts_thread(self, app_client, monkeypatch):
+        """Sin python src/main.py (otro servidor WSGI) la primera petición inicia el hilo"""
+        main, client = app_client
+        monkeypatch.setattr(main, 'SCHEDULER_ENABLED', True)
+        try:
+            client.get('/jobs')
+            assert main.scheduler.alive
+            assert 'finsight_scheduler_running 1' in client.get('/metrics').get_data(as_text=True)
+        finally:
+            main.scheduler.stop()
+
+
+class TestTenantMemory:
+    """Tests para el presupuesto de memoria de los tenants"""
+
+    def test_indexes_count_in_budget(self, app_client):
+        """Construir un índice suma su tamaño estimado a la memoria del tenant"""
+        main, client = app_client
+        post_sample(client, 'pytest-memory')
+        state = main.tenants._tenants['pytest-memory']
+        before = state.memory_bytes
+        indexes = len(state.indexes)
+        assert client.get('/transactions/search?q=taxi', headers={'X-Tenant-ID': 'pytest-memory'}).status_code == 200
+        assert len(state.indexes) == indexes + 1
+        assert state.index_bytes > 0
+        assert state.memory_bytes == state.frame_bytes + state.index_bytes + state.aggregate_bytes
+        assert state.memory_bytes > before
+
+    def test_index_memory_evicts_other_tenants(self, app_client, monkeypatch):
+        """Con un presupuesto que solo alcanza para el ledger, los índices fuerzan la expulsión"""
+        main, client = app_client
+        post_sample(client, 'pytest-memory-a')
+        post_sample(client, 'pytest-memory-b')
+        state = main.tenants._tenants['pytest-memory-b']
+        monkeypatch.setattr(main.tenants, 'max_bytes', main.tenants.total_bytes())
+        evictions = main.tenants.evictions
+        client.get('/alerts', headers={'X-Tenant-ID': 'pytest-memory-b'})
+        assert main.tenants.evictions > evictions
+        assert 'pytest-memory-b' in main.tenants._tenants and state.df is not None
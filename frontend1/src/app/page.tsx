@@ -22,10 +22,10 @@ async function fetchDashboardData() {
 
   try {
     const [analysisRes, predictionRes] = await Promise.all([
-      fetch(`${API_BASE}/analysis`, { cache: 'no-store' }).then((res) =>
+      fetch(`${API_BASE}/analysis`, { cache: 'no-cache' }).then((res) =>
         res.ok ? res.json() : null
       ),
-      fetch(`${API_BASE}/prediction`, { cache: 'no-store' }).then((res) =>
+      fetch(`${API_BASE}/prediction`, { cache: 'no-cache' }).then((res) =>
         res.ok ? res.json() : null
       ),
     ]);
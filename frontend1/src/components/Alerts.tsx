@@ -14,7 +14,7 @@ const Alerts: React.FC = () => {
     const fetchAlerts = async () => {
       setLoading(true);
       try {
-        const res = await fetch('http://localhost:5000/alerts', { cache: 'no-store' });
+        const res = await fetch('http://localhost:5000/alerts', { cache: 'no-cache' });
         if (res.ok) {
           const data = await res.json();
           setAlerts(data.alerts || []);
@@ -68,9 +68,9 @@ const ReportsClient: React.FC = () => {
     
     try {
       const [monthlyRes, comparativeRes, habitsRes] = await Promise.all([
-        fetch(`${API_BASE}/reports/monthly`, { cache: 'no-store' }).then(res => res.json()).catch(() => ({ income: 0, expense: 0, savings: 0, top_category: 'N/A' })),
-        fetch(`${API_BASE}/reports/comparative`, { cache: 'no-store' }).then(res => res.json()).catch(() => ({ current_expense: 0, prev_expense: 0, difference: 0 })),
-        fetch(`${API_BASE}/reports/habits`, { cache: 'no-store' }).then(res => res.json()).catch(() => ({ top_days: [], repeated_expenses: {} }))
+        fetch(`${API_BASE}/reports/monthly`, { cache: 'no-cache' }).then(res => res.json()).catch(() => ({ income: 0, expense: 0, savings: 0, top_category: 'N/A' })),
+        fetch(`${API_BASE}/reports/comparative`, { cache: 'no-cache' }).then(res => res.json()).catch(() => ({ current_expense: 0, prev_expense: 0, difference: 0 })),
+        fetch(`${API_BASE}/reports/habits`, { cache: 'no-cache' }).then(res => res.json()).catch(() => ({ top_days: [], repeated_expenses: {} }))
       ]);
 
       setMonthly(monthlyRes);
@@ -88,7 +88,7 @@ const ReportsClient: React.FC = () => {
     try {
       switch (reportType) {
         case 'monthly':
-          const response = await fetch(`${API_BASE}/reports/monthly-12`, { cache: 'no-store' });
+          const response = await fetch(`${API_BASE}/reports/monthly-12`, { cache: 'no-cache' });
           const data = await response.json();
           await generateMonthlyPDF(data);
           break;
@@ -380,7 +380,7 @@ const ReportsClient: React.FC = () => {
             onClick={async () => {
               setDownloadingPDF('all');
               try {
-                const monthlyResponse = await fetch(`${API_BASE}/reports/monthly-12`, { cache: 'no-store' });
+                const monthlyResponse = await fetch(`${API_BASE}/reports/monthly-12`, { cache: 'no-cache' });
                 const monthlyData = await monthlyResponse.json();
                 await generateMonthlyPDF(monthlyData);
                 if (comparative) await generateComparativePDF(comparative);
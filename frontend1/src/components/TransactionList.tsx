@@ -33,7 +33,7 @@ const TransactionList: React.FC = () => {
       setLoading(true);
       setError(null);
       try {
-        const res = await fetch(`${API_BASE}/transactions`, { cache: 'no-store' });
+        const res = await fetch(`${API_BASE}/transactions`, { cache: 'no-cache' });
         if (!res.ok) throw new Error('Failed to fetch');
         const data = await res.json();
         const sortedTransactions = data.sort((a: any, b: any) => new Date(b.date).getTime() - new Date(a.date).getTime());
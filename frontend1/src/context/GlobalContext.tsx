@@ -35,7 +35,7 @@ export const GlobalProvider: React.FC<{ children: React.ReactNode }> = ({ childr
   useEffect(() => {
     const fetchTransactions = async () => {
       try {
-        const res = await fetch('http://localhost:5000/transactions', { cache: 'no-store' });
+        const res = await fetch('http://localhost:5000/transactions', { cache: 'no-cache' });
         if (res.ok) {
           const data = await res.json();
           setTransactions(data);
@@ -1,6 +1,7 @@
-import { Component, inject, OnInit } from '@angular/core';
+import { Component, effect, inject, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { signal } from '@angular/core';
+import { TransactionService } from '../../services/transaction';
 
 interface Alert {
   type: string;
@@ -27,6 +28,8 @@ interface SeverityConfig {
   styleUrl: './alerts.css',
 })
 export class AlertsComponent implements OnInit {
+  private transactionService = inject(TransactionService);
+
   alerts = signal<Alert[]>([]);
   isOpen = signal(true);
   loading = signal(true);
@@ -70,13 +73,22 @@ export class AlertsComponent implements OnInit {
     }
   };
 
+  constructor() {
+    // El canal SSE avisó de alertas nuevas o resueltas: se vuelven a pedir
+    effect(() => {
+      if (this.transactionService.alertsChanged() > 0) {
+        this.fetchAlerts();
+      }
+    });
+  }
+
   ngOnInit(): void {
     this.fetchAlerts();
   }
 
   fetchAlerts(): void {
     this.loading.set(true);
-    fetch('http://localhost:5000/alerts', { cache: 'no-store' })
+    fetch('http://localhost:5000/alerts', { cache: 'no-cache' })
       .then(res => res.ok ? res.json() : { alerts: [] })
       .then(data => {
         this.alerts.set(data.alerts || []);
@@ -51,9 +51,18 @@ export class TransactionService {
   
   isLoading = signal<boolean>(false);
   error = signal<string | null>(null);
+  // Cambia cada vez que el backend avisa de alertas nuevas o resueltas
+  alertsChanged = signal<number>(0);
+
+  // Canal SSE del backend; reemplaza el refresco completo después de cada POST
+  private events: EventSource | null = null;
+  // Id del último evento recibido; el navegador lo reenvía como Last-Event-ID al reconectar
+  private lastEventId = '';
+  private reconnecting = false;
 
   constructor() {
     this.initializeData();
+    this.subscribeToEvents();
   }
 
   /**
@@ -64,6 +73,61 @@ export class TransactionService {
     this.fetchDashboardData();
   }
 
+  /**
+   * Escucha los cambios que publica el backend en /events
+   */
+  private subscribeToEvents(): void {
+    if (typeof EventSource === 'undefined') {
+      return;
+    }
+    this.events = new EventSource(`${this.API_BASE}/events`);
+    this.listen('transaction', row => {
+      this.transactions.update(list => [...list, row]);
+    });
+    this.listen('transaction_updated', row => {
+      this.transactions.update(list => list.map(t => (String(t.id) === String(row.id) ? row : t)));
+    });
+    this.listen('transaction_deleted', ({ id }) => {
+      this.transactions.update(list => list.filter(t => String(t.id) !== String(id)));
+    });
+    // El resumen mensual cambió: el dashboard se revalida (responde 304 si no hay cambios)
+    this.listen('monthly', () => this.fetchDashboardData());
+    this.listen('alerts', () => this.alertsChanged.update(n => n + 1));
+    // El backend no pudo reenviar lo que se perdió durante la reconexión
+    this.listen('resync', () => this.refresh());
+
+    this.events.addEventListener('error', () => {
+      this.reconnecting = true;
+    });
+    this.events.addEventListener('open', () => {
+      // Sin un id previo el backend no sabe qué eventos faltan: se vuelve a pedir todo
+      if (this.reconnecting && !this.lastEventId) {
+        this.refresh();
+      }
+      this.reconnecting = false;
+    });
+  }
+
+  /**
+   * Registra un manejador para un evento del backend y guarda su id
+   */
+  private listen(name: string, handler: (data: any) => void): void {
+    this.events?.addEventListener(name, event => {
+      const message = event as MessageEvent;
+      if (message.lastEventId) {
+        this.lastEventId = message.lastEventId;
+      }
+      handler(JSON.parse(message.data));
+    });
+  }
+
+  /**
+   * Si el canal SSE está conectado y entregará los cambios como eventos
+   */
+  private eventsOpen(): boolean {
+    return this.events !== null && this.events.readyState === EventSource.OPEN;
+  }
+
   /**
    * Obtiene todas las transacciones del servidor
    */
@@ -71,7 +135,7 @@ export class TransactionService {
     this.isLoading.set(true);
     this.error.set(null);
 
-    fetch(`${this.API_BASE}/transactions`, { cache: 'no-store' })
+    fetch(`${this.API_BASE}/transactions`, { cache: 'no-cache' })
       .then(res => res.json())
       .then(data => {
         this.transactions.set(data);
@@ -92,10 +156,10 @@ export class TransactionService {
     this.error.set(null);
 
     Promise.all([
-      fetch(`${this.API_BASE}/analysis`, { cache: 'no-store' }).then(res => 
+      fetch(`${this.API_BASE}/analysis`, { cache: 'no-cache' }).then(res => 
         res.ok ? res.json() : null
       ),
-      fetch(`${this.API_BASE}/prediction`, { cache: 'no-store' }).then(res => 
+      fetch(`${this.API_BASE}/prediction`, { cache: 'no-cache' }).then(res => 
         res.ok ? res.json() : null
       ),
     ])
@@ -141,8 +205,10 @@ export class TransactionService {
     })
       .then(res => res.json())
       .then(() => {
-        this.fetchTransactions();
-        this.fetchDashboardData();
+        // Con el canal SSE conectado los cambios llegan como eventos
+        if (!this.eventsOpen()) {
+          this.refresh();
+        }
       })
       .catch(err => {
         console.error('Error adding transaction:', err);
@@ -170,5 +236,6 @@ export class TransactionService {
   refresh(): void {
     this.fetchTransactions();
     this.fetchDashboardData();
+    this.alertsChanged.update(n => n + 1);
   }
 }